@@ -1,3 +1,6 @@
+# Taken before anything else is imported, for the startup timing mode
+import time
+STARTED = time.perf_counter()
 # tkinter is a module used to product the graphical user interface (GUI)
 import tkinter as tk
 from tkinter import ttk
@@ -5,22 +8,84 @@ from tkinter import ttk
 from tkinter import messagebox
 # simpledialog is a messagebox that allows for input
 from tkinter import simpledialog
-# pandas and numpy are data analysis packages; the two most-common packages in Python, likely
-import pandas as pd
-import numpy as np
-# openpyxl allows for reading/writing from/to Excel files, rather than CSV, which restricts formatting options
-from openpyxl import Workbook
-# from openpyxl.utils import get_column_letter
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Alignment
-# Very standard math module, used only for the floor function
-from math import floor
+# pandas, numpy and openpyxl are imported when first used (see LazyModule below), so the window appears without waiting on them
+import importlib
 # datetime module for converting strings to dates, and calculating the difference between times entered in the fields
 from datetime import datetime, timedelta
 # For accessing the text logs folder
 import os
 from os import listdir  # , getcwd
-from os.path import isfile, join
+from os.path import join
+# csv writes the append-only master store, one line per incident; argparse handles the command-line tools
+import csv
+import argparse
+import sys
+# json writes the incident journal, and threading lets it be compacted into the Excel files in the background
+import json
+import threading
+import queue
+# sqlite3 is the optional database backend for incidents (see STORAGE_BACKEND)
+import sqlite3
+# random spreads out the retries of workstations waiting on each other (see backoff)
+import random
+# re splits service call types into words for the search index
+import re
+# hashlib checksums the master file and its copy, and io lets the master be serialized to memory once
+import hashlib
+import io
+# gzip compresses the full segments of the incident log; math works out how many of them to keep, and the timing percentiles
+import gzip
+import shutil
+import math
+# OrderedDict keeps the cached dataframes in least-recently-used order, and functools the unusually entered times
+from collections import OrderedDict
+import functools
+# For the lock file on the shared drive: which computer holds it, and a unique token for each lock; multiprocessing checks the
+# rows of an import in parallel
+import socket
+import uuid
+import multiprocessing
+
+
+class LazyModule:
+    '''Stands in for a module, and imports it the first time one of its attributes is used. pandas, numpy and openpyxl take
+       seconds to import on the hospital computers, and the entry window doesn't need them until Submit, Save or Load.'''
+
+    def __init__(self, module_name):
+
+        self.module_name = module_name
+        self.module = None
+
+    def load_module(self):
+
+        if self.module is None:
+            self.module = importlib.import_module(self.module_name)
+
+        return self.module
+
+    def __getattr__(self, attribute):
+
+        return getattr(self.load_module(), attribute)
+
+
+# pandas and numpy are data analysis packages; the two most-common packages in Python, likely
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+# openpyxl allows for reading/writing from/to Excel files, rather than CSV, which restricts formatting options
+openpyxl = LazyModule('openpyxl')
+openpyxl_dataframe = LazyModule('openpyxl.utils.dataframe')
+openpyxl_styles = LazyModule('openpyxl.styles')
+openpyxl_cell = LazyModule('openpyxl.cell')
+
+HEAVY_MODULES = [pd, np, openpyxl, openpyxl_dataframe, openpyxl_styles, openpyxl_cell]
+
+
+def import_heavy_modules():
+    '''Import everything in HEAVY_MODULES now, rather than on first use.'''
+
+    for module in HEAVY_MODULES:
+        module.load_module()
+
 
 CURRENT_YEAR = str(datetime.now().year)
 MONTH_ENTERED = ''
@@ -31,346 +96,3232 @@ PATH_MASTER_COPY = ''
 PATH_DRAFTS = ''
 PATH_LOGS = ''
 PATH_IMAGE = ''
-
+# Append-only backing store that the master workbook is produced from
+PATH_MASTER_STORE = os.path.splitext(PATH_MASTER)[0] + ' - Store.csv'
+# Used instead of the store above when STORAGE_BACKEND is 'sqlite'. The master and monthly files are then exports of the database
+PATH_DATABASE = os.path.splitext(PATH_MASTER)[0] + '.sqlite3'
+# Typed, columnar copy of the master for analysis, rewritten only when the master file is exported (see MASTER_EXPORT_SECONDS),
+# not on every Submit. Needs pyarrow; without it, it's skipped
+PATH_MASTER_MIRROR = os.path.splitext(PATH_MASTER)[0] + '.parquet'
+# With the 'partitioned' backend: the row count, date range and checksum of every monthly file
+PATH_MANIFEST = PATH_MONTHLY + 'Manifest.json'
+# Running totals per day, shift and service call type, kept up to date as incidents are saved, for quick summaries
+PATH_ROLLUPS = os.path.splitext(PATH_MASTER)[0] + ' - Rollups.sqlite3'
+# Full-text index of the Notes, Requested By, Contact Information and Service Call Type of every incident, for the search window
+PATH_SEARCH_INDEX = os.path.splitext(PATH_MASTER)[0] + ' - Search.sqlite3'
+# Lock file held by a workstation while it writes to the shared files
+PATH_SHARED_LOCK = os.path.splitext(PATH_MASTER)[0] + '.lock'
+# Files kept on this computer only. The journal is written before anything else when Submit is clicked
+PATH_LOCAL = os.path.join(os.path.expanduser('~'), 'Incident Entry Tool')
+PATH_JOURNAL = os.path.join(PATH_LOCAL, 'Incident Journal.jsonl')
+PATH_JOURNAL_CHECKPOINT = os.path.join(PATH_LOCAL, 'Incident Journal Checkpoint.json')
+# The form as it was last autosaved, so an entry being typed survives a crash
+PATH_AUTOSAVE = os.path.join(PATH_LOCAL, 'Autosave.json')
+# How long each stage of every Submit took, one line per Submit (and per background save), for the submit-timings command
+PATH_SUBMIT_TIMINGS = os.path.join(PATH_LOCAL, 'Submit Timings.jsonl')
+# One small file per saved draft. The drafts workbook (PATH_DRAFTS) is only written on request, as a view of them
+PATH_DRAFT_FOLDER = os.path.splitext(PATH_DRAFTS)[0] + ' - Drafts'
+
+# The incident log (a readable receipt of each Submit) keeps at least this many of the most recent incidents. The log is written
+# to one file per computer, which is compressed into a numbered segment every LOG_SEGMENT_RECORDS incidents
 MAX_TEXT_FILES = 50
+LOG_SEGMENT_RECORDS = 25
 
+# Saving a draft beyond this many deletes the oldest one
+MAX_DRAFTS = 500
 
-class App(tk.Tk):
+# How often the form is checked for changes, and autosaved if it changed
+AUTOSAVE_MS = 5000
 
-    def __init__(self):
-        '''The class initialization function first instantiates some data structures that are referenced later, like the list of
-           service call types. The errors dictionary below tracks the data validity when the Submit button is clicked. After
-           instantiation, functions are called that create the GUI elements, like labels, entry boxes, and buttons. Then, window
-           settings are set, and the image for the application icon is imported.'''
+# How often the window checks on the background writer, and how long the writer waits before retrying a failed save
+SUBMISSION_POLL_MS = 250
+SAVE_RETRY_SECONDS = 60
 
-        tk.Tk.__init__(self)
+# The whole master file (and its Parquet mirror) is exported from the store at most this often while the tool is open, and when
+# it's closed, rather than after every Submit; the store and the monthly files are still saved every time. Anything else reading
+# the master file (other workstations' reports, people opening it in Excel) may be up to this long behind the store
+MASTER_EXPORT_SECONDS = 300
 
-        self.service_call_type_list = ['NONE', 'Access', 'Alarm', 'Arrest', 'Assist Police/EMS', 'By Law', 'Camera Audit',
-                                       'Camera Footage Review', 'Camera Malfunction', 'Code Red', 'Daily Lock/Unlock',
-                                       'Elevator Kirkwood', 'Emergency Card Swipe Testing', 'Escort Delivery', 'Evidence/Contraband',
-                                       'Facility Maintenance', 'Fall No Injuries', 'Fall Unknown Injuries', 'Fall With Injuries',
-                                       'Guard Duties - Other', 'Information', 'Lock/Unlock Door', 'Monitor Camera',
-                                       'Motor Vehicle Accident', 'Off-Site Checks', 'Off-Site Checks Cancelled',
-                                       'Off-Site Service Calls', 'One-to-One', 'Other Service Calls', 'Parking',
-                                       'Patrol Duties', 'POI', 'Search Room', 'Side Room Entry', 'Staff Falls',
-                                       'Visitor - Security Presence/Assistance', 'Weekly Audits']
+# The submit timings file keeps at least this many of the most recent records. If True, the status line also says how long the
+# last save took, and its slowest stage
+MAX_SUBMIT_TIMINGS = 1000
+SHOW_SUBMIT_TIMINGS = False
 
-        self.errors = {'date': 1,
-                       'call_received': 1,
-                       'arrival_time': 1,
-                       'completion_time': 1,
-                       'service_call_type': 1, }
+# Number of monthly files kept loaded in memory; the least recently used month is dropped first
+MAX_CACHED_MONTHS = 12
 
-        self.months = {'1': '01 - January', '2': '02 - February', '3': '03 - March', '4': '04 - April', '5': '05 - May', '6': '06 - June',
-                       '7': '07 - July', '8': '08 - August', '9': '09 - September', '10': '10 - October', '11': '11 - November', '12': '12 - December'}
+# A lock file older than this is assumed to be left by a crashed workstation. Waiting for the lock, or retrying after another
+# workstation wrote first, backs off exponentially (with some randomness) up to the cap, for a bounded number of attempts
+LOCK_LEASE_SECONDS = 60
+LOCK_ATTEMPTS = 40
+CONFLICT_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_CAP_SECONDS = 2
 
-        self.handle_label_creation()
-        self.handle_radio_button_creation()
-        self.handle_entry_creation()
-        self.handle_listbox_creation()
-        self.handle_checkbox_creation()
-        self.handle_second_entry_creation()
-        self.handle_textbox_creation()
-        self.handle_second_checkbox_creation()
-        self.handle_button_creation()
+# Old spreadsheets are imported in chunks of this many rows, each checked by one of the import processes
+IMPORT_CHUNK_ROWS = 10000
 
-        # Index of draft, if opened. If submitted, draft will be deleted
-        self.draft_opened_index = None
+# 'csv' keeps the monthly files as they are and appends to the master store; 'sqlite' keeps every incident in PATH_DATABASE;
+# 'partitioned' makes the monthly files the store, listed in PATH_MANIFEST, and the master file an export made on request
+STORAGE_BACKEND = 'csv'
 
-        # Window settings
-        self.resizable(False, False)
-        self.winfo_toplevel().title('Incident Entry Tool')
-        self.window = None  # This is to check later if a toplevel window already exists
+INCIDENT_COLUMNS = ['Date', 'Time Entered', 'Shift', 'Call Received Time', 'Arrival Time', 'Completion Time', 'Service Call Type',
+                    'Physical Intervention', 'Restraint Used', 'Police Involved', 'Requested By', 'Contact Information',
+                    'Notes', 'Time Taken to Arrive', 'Time Taken From Call to Completion', 'Time Taken From Arrival to Completion',
+                    'Time Taken to Arrive (mins.)', 'Time Taken From Call to Completion (mins.)', 'Time Taken From Arrival to Completion (mins.)']
 
-        try:
-            self.iconbitmap(PATH_IMAGE)
-        except:
-            pass
+MINUTE_COLUMNS = INCIDENT_COLUMNS[16:]
+INVOLVEMENT_COLUMNS = ['Physical Intervention', 'Restraint Used', 'Police Involved']
 
-    def get_dataframe(self):
-        '''Load the monthly dataframe. If it doesn't exist, create an empty one.'''
+# How each column is held when incidents are typed (see typed_incident_dataframe): 'date' and 'datetime' as datetimes, 'flag'
+# (Yes/No) as booleans, 'minutes' as integers, 'category' for columns that repeat a limited set of values, and 'text' for free text
+INCIDENT_SCHEMA = {'Date': 'date', 'Time Entered': 'datetime', 'Shift': 'category', 'Call Received Time': 'category',
+                   'Arrival Time': 'category', 'Completion Time': 'category', 'Service Call Type': 'category',
+                   'Physical Intervention': 'flag', 'Restraint Used': 'flag', 'Police Involved': 'flag',
+                   'Requested By': 'category', 'Contact Information': 'category', 'Notes': 'text',
+                   'Time Taken to Arrive': 'category', 'Time Taken From Call to Completion': 'category',
+                   'Time Taken From Arrival to Completion': 'category', 'Time Taken to Arrive (mins.)': 'minutes',
+                   'Time Taken From Call to Completion (mins.)': 'minutes', 'Time Taken From Arrival to Completion (mins.)': 'minutes'}
 
-        try:
-            self.df = pd.read_excel(PATH_MONTHLY + CURRENT_YEAR + '\\' + MONTH_ENTERED +
-                                    '\\Incident Reports - ' + CURRENT_YEAR + ' ' + MONTH_ENTERED[5:] + '.xlsx')
+MONTHS = {'1': '01 - January', '2': '02 - February', '3': '03 - March', '4': '04 - April', '5': '05 - May', '6': '06 - June',
+          '7': '07 - July', '8': '08 - August', '9': '09 - September', '10': '10 - October', '11': '11 - November', '12': '12 - December'}
 
-        except:
-            self.df = pd.DataFrame(columns=['Date', 'Time Entered', 'Shift', 'Call Received Time', 'Arrival Time', 'Completion Time', 'Service Call Type',
-                                            'Physical Intervention', 'Restraint Used', 'Police Involved', 'Requested By', 'Contact Information',
-                                            'Notes', 'Time Taken to Arrive', 'Time Taken From Call to Completion', 'Time Taken From Arrival to Completion',
-                                            'Time Taken to Arrive (mins.)', 'Time Taken From Call to Completion (mins.)', 'Time Taken From Arrival to Completion (mins.)'])
+INCIDENT_COLUMN_WIDTHS = {'A': 15, 'B': 17, 'C': 16, 'D': 21, 'E': 16, 'F': 21, 'G': 40, 'H': 24, 'I': 18, 'J': 19,
+                          'K': 25, 'L': 25, 'M': 44, 'N': 30, 'O': 43, 'P': 43, 'Q': 30, 'R': 43, 'S': 45}
 
-    def get_master_dataframe(self):
-        '''Load the master dataframe. If it doesn't exist, DON'T create an empty one...display a error message.'''
+DRAFT_COLUMNS = ['Identifier', 'Date', 'Shift', 'Call Received Time', 'Arrival Time', 'Completion Time', 'Service Call Type',
+                 'Physical Intervention', 'Restraint Used', 'Police Involved', 'Requested By', 'Contact Information',
+                 'Notes', 'Time Over 24 Hours']
 
-        try:
-            self.master_df = pd.read_excel(PATH_MASTER)
+DRAFT_COLUMN_WIDTHS = {'A': 20, 'B': 15, 'C': 16, 'D': 21, 'E': 16, 'F': 21, 'G': 40, 'H': 24, 'I': 18, 'J': 19,
+                       'K': 25, 'L': 23, 'M': 44, 'N': 30}
 
-        except:
-            tk.messagebox.showinfo(
-                'Data Load Error', 'The Master file can not be found.')
+SERVICE_CALL_TYPES = ['NONE', 'Access', 'Alarm', 'Arrest', 'Assist Police/EMS', 'By Law', 'Camera Audit',
+                      'Camera Footage Review', 'Camera Malfunction', 'Code Red', 'Daily Lock/Unlock',
+                      'Elevator Kirkwood', 'Emergency Card Swipe Testing', 'Escort Delivery', 'Evidence/Contraband',
+                      'Facility Maintenance', 'Fall No Injuries', 'Fall Unknown Injuries', 'Fall With Injuries',
+                      'Guard Duties - Other', 'Information', 'Lock/Unlock Door', 'Monitor Camera',
+                      'Motor Vehicle Accident', 'Off-Site Checks', 'Off-Site Checks Cancelled',
+                      'Off-Site Service Calls', 'One-to-One', 'Other Service Calls', 'Parking',
+                      'Patrol Duties', 'POI', 'Search Room', 'Side Room Entry', 'Staff Falls',
+                      'Visitor - Security Presence/Assistance', 'Weekly Audits']
+
+# Typing in the service call type search redraws the list once the user pauses for this long, not on every keystroke
+SEARCH_DEBOUNCE_MS = 120
+# The incident search window lists this many results at a time; the next page is only read when it's asked for
+SEARCH_PAGE_ROWS = 50
+
+# Percentiles of each response time reported by the analytics command
+REPORT_PERCENTILES = [50, 90, 99]
+# The percentiles kept in the rollups are approximate: each time is counted in a bucket within this fraction of it
+SKETCH_ACCURACY = 0.02
+
+# Every exported cell uses this one named style (centred, wrapped text), rather than each cell getting its own Alignment
+CELL_STYLE_NAME = 'Incident Cell'
+
+
+def monthly_file_path(year, month_folder):
+    '''Build the path of the monthly file, e.g. PATH_MONTHLY + 2020\\03 - March\\Incident Reports - 2020 March.xlsx'''
+
+    return (PATH_MONTHLY + year + '\\' + month_folder +
+            '\\Incident Reports - ' + year + ' ' + month_folder[5:] + '.xlsx')
+
+
+def monthly_file_path_for_date(date_string):
+    '''Get the monthly file that a row belongs in from its 'Date' value, which is always formatted as yyyy/mm/dd.'''
+
+    return monthly_file_path(date_string[:4], MONTHS[str(int(date_string[5:7]))])
+
+
+class RowAccumulator:
+    '''Collects rows to add to a dataframe without copying the dataframe each time (DataFrame.append copied the whole frame on
+       every call, and no longer exists in pandas 2). New rows are buffered in one list per column; to_frame() combines them
+       with the existing rows in a single concat, only when a dataframe is actually needed, so appending N rows is O(N). The
+       exporter can also stream the rows straight out of it with iter_rows(), without building a dataframe at all. It collects
+       rows to be saved, so the existing rows are given as the text the files hold (see untyped_incident_dataframe()).'''
+
+    def __init__(self, columns, base=None):
+
+        self.columns = list(columns)
+
+        if base is not None and list(base.columns) != self.columns:
+            base = base.reindex(columns=self.columns)
+
+        self.base = base
+        self.buffer = {column: [] for column in self.columns}
+        self.buffered = 0
+
+    def append(self, row):
+
+        for column in self.columns:
+            self.buffer[column].append(row.get(column, ''))
+
+        self.buffered += 1
 
-    def get_saves_dataframe(self):
-        '''Load the drafts dataframe. If it doesn't exist, create an empty one. Values aren't validated, so integers can come in as
-           floats. Use the converters argument to read_excel to turn the integers into strings.'''
+    def extend(self, rows):
+
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+
+        return (0 if self.base is None else self.base.shape[0]) + self.buffered
+
+    def to_frame(self):
+        '''Combine the buffered rows with the existing ones. The result is kept, so calling this again is free.'''
+
+        if self.buffered or self.base is None:
+            new_rows = pd.DataFrame(self.buffer, columns=self.columns)
+            self.base = new_rows if self.base is None else pd.concat([self.base, new_rows], ignore_index=True)
+            self.buffer = {column: [] for column in self.columns}
+            self.buffered = 0
+
+        return self.base
+
+    def iter_rows(self):
+        '''Yield the header, then every row as a tuple of values, in the form dataframe_to_rows produces.'''
+
+        if self.base is None:
+            yield self.columns
+        else:
+            yield from openpyxl_dataframe.dataframe_to_rows(self.base, index=False)
+
+        yield from zip(*[self.buffer[column] for column in self.columns])
+
+
+class DataFrameCache:
+    '''Keeps loaded files in memory, keyed on the path, and only reads a file again if its modification time or size has changed,
+       i.e. something outside this process wrote to it. The rows are kept typed (see typed_incident_dataframe()), which takes a
+       fraction of the memory of the text read from the file. When this process writes a file itself, put() records the rows
+       it wrote, so it isn't read straight back; rows it appends are set aside by extend(), and only typed and added to the
+       rest by the next get(). At most max_entries files are kept, dropping the least recently used. The hits and misses
+       (reads from disk) are counted so it can be checked that the repeated reads are gone.'''
+
+    def __init__(self, max_entries):
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def signature(path):
 
         try:
-            self.saves_df = pd.read_excel(PATH_DRAFTS, converters={
-                                          0: str, 2: str, 3: str, 4: str, 9: str, 10: str, 11: str})
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
 
-        except:
-            self.saves_df = pd.DataFrame(columns=['Identifier', 'Date', 'Shift', 'Call Received Time', 'Arrival Time', 'Completion Time', 'Service Call Type',
-                                                  'Physical Intervention', 'Restraint Used', 'Police Involved', 'Requested By', 'Contact Information',
-                                                  'Notes', 'Time Over 24 Hours'])
+    def get(self, path, loader):
+        '''Return the cached dataframe for path if the file hasn't changed, otherwise load it with loader(path) and cache it.
+           Either way it's typed. Callers get a shallow copy, so dropping or adding rows doesn't change the cached one.'''
 
-    def handle_label_creation(self):
-        '''Create the text labels that accompany the widgets. Also, create some horizontal lines for aesthetics and spacing.'''
+        signature = self.signature(path)
 
-        self.shift_label = tk.Label(self, font=('Calibri', 12), text='SHIFT:').grid(
-            row=0, column=0, pady=(10, 0))
-        self.date_label = tk.Label(self, font=(
-            'Calibri', 12), text='Date (mm/dd):').grid(row=2, column=0, sticky='e')
-        self.call_received_time_label = tk.Label(self, font=(
-            'Calibri', 12), text='Call Received (24hr.):').grid(row=3, column=0, sticky='e')
-        self.arrival_time_label = tk.Label(self, font=(
-            'Calibri', 12), text='Arrival Time (24hr.):').grid(row=4, column=0, sticky='e')
-        self.completion_time_label = tk.Label(self, font=(
-            'Calibri', 12), text='Completion Time (24hr.):').grid(row=5, column=0, sticky='e', padx=(10, 0))
-        self.service_call_type_label = tk.Label(self, font=(
-            'Calibri', 12), text='Service Call Type:').grid(row=7, column=0, padx=(17, 0))
-        self.physical_intervention_label = tk.Label(self, font=(
-            'Calibri', 12), text='Physical Intervention:').grid(row=9, column=0, sticky='e')
-        self.restraint_used_label = tk.Label(self, font=(
-            'Calibri', 12), text='Restraint Used:').grid(row=10, column=0, sticky='e')
-        self.police_involved_label = tk.Label(self, font=(
-            'Calibri', 12), text='Police Involved:').grid(row=11, column=0, sticky='e')
-        self.requested_by_label = tk.Label(self, font=('Calibri', 12), text='Requested By:').grid(
-            row=12, column=0, sticky='e', pady=(15, 0))
-        self.contact_information_label = tk.Label(self, font=(
-            'Calibri', 12), text='Contact Information:').grid(row=13, column=0, sticky='e')
-        self.notes_label = tk.Label(self, font=('Calibri', 14), text='Notes:').grid(
-            columnspan=2, row=14, pady=(15, 3))
-        self.completion_time = tk.Label(self, font=('Calibri', 11), text='Was Time From Call to Completion >24 Hours?').grid(
-            columnspan=2, row=17, column=0, sticky='w', padx=(20, 0), pady=(5, 3))
+        with self.lock:
+            entry = self.entries.get(path)
 
-        # Horizontal Lines
-        self.h_line = ttk.Separator(self, orient='horizontal')
-        self.h_line_2 = ttk.Separator(self, orient='horizontal')
-        self.h_line_3 = ttk.Separator(self, orient='horizontal')
+            if entry is not None and signature is not None and entry[0] == signature:
+                self.entries.move_to_end(path)
+                self.hits += 1
 
-        self.h_line.grid(row=1, column=0, sticky='we',
-                         columnspan=2, pady=10, padx=12)
-        self.h_line_2.grid(row=6, column=0, sticky='we',
-                           columnspan=2, pady=10, padx=12)
-        self.h_line_3.grid(row=18, column=0, sticky='we',
-                           columnspan=2, pady=10, padx=12)
+                # Rows appended since the last get() are typed and added now, all at once
+                if entry[2]:
+                    entry[1] = concat_typed_incident_dataframes(
+                        [entry[1], typed_incident_dataframe(pd.DataFrame(entry[2], columns=INCIDENT_COLUMNS))])
+                    entry[2] = []
 
-    def handle_radio_button_creation(self):
-        '''Create the single set of radio buttons for selecting the shift.'''
+                return entry[1].copy(deep=False)
 
-        self.var = tk.StringVar()
-        self.var.set('7:30 - 19:30')
+            self.misses += 1
 
-        self.date_morning_radio = tk.Radiobutton(
-            self, text='7:30 - 19:30', padx=20, variable=self.var, value='7:30 - 19:30')
-        self.date_morning_radio.grid(row=0, column=1, sticky='w', pady=(10, 0))
+        dataframe = typed_incident_dataframe(loader(path))
 
-        self.date_night_radio = tk.Radiobutton(
-            self, text='19:30 - 7:30', padx=20, variable=self.var, value='19:30 - 7:30')
-        self.date_night_radio.grid(
-            row=0, column=1, padx=(110, 0), pady=(10, 0))
+        if signature is not None:
+            self.store(path, signature, dataframe)
 
-    def handle_entry_creation(self):
-        '''Create the first set of entry widgets, for date and the three times.'''
+        return dataframe.copy(deep=False)
 
-        self.date_entry = tk.Entry(self, width=5)
-        self.date_entry.bind('<FocusOut>', self.focus_date_validation)
-        self.date_entry.grid(row=2, column=1)
+    def put(self, path, rows):
+        '''Record the rows (a dataframe, typed or not, or a RowAccumulator) this process has just written to path.'''
 
-        self.call_received_entry = tk.Entry(self, width=5)
-        self.call_received_entry.bind(
-            '<FocusOut>', self.focus_call_received_validation)
-        self.call_received_entry.grid(row=3, column=1)
+        signature = self.signature(path)
 
-        self.arrival_time_entry = tk.Entry(self, width=5)
-        self.arrival_time_entry.bind(
-            '<FocusOut>', self.focus_arrival_time_validation)
-        self.arrival_time_entry.grid(row=4, column=1)
+        if signature is not None:
+            self.store(path, signature, typed_incident_dataframe(rows.to_frame() if isinstance(rows, RowAccumulator) else rows))
 
-        self.completion_time_entry = tk.Entry(self, width=5)
-        self.completion_time_entry.bind(
-            '<FocusOut>', self.focus_completion_time_validation)
-        self.completion_time_entry.grid(row=5, column=1)
+    def extend(self, path, signature_before, new_rows):
+        '''This process appended new_rows (a list of dictionaries of text) to the file at path. If the cached rows were the file
+           as it was before (nobody else had written to it), set the new rows aside to add to them; otherwise drop them so the
+           file is read again next time. Nothing is typed until the next get().'''
 
-    def handle_second_entry_creation(self):
-        '''Create the two non-validated entry fields for Requested By and Contact Information'''
+        with self.lock:
+            entry = self.entries.pop(path, None)
 
-        self.requested_by_entry = tk.Entry(self, width=30)
-        self.requested_by_entry.grid(row=12, column=1, pady=(20, 0))
+        signature = self.signature(path)
 
-        self.contact_information_entry = tk.Entry(self, width=30)
-        self.contact_information_entry.grid(row=13, column=1)
+        if entry is not None and entry[0] == signature_before and signature is not None:
+            self.store(path, signature, entry[1], entry[2] + list(new_rows))
 
-    def handle_checkbox_creation(self):
-        '''Create the checkboxes for Physical Intervention, Restraint Used, and Police Involved.'''
+    def store(self, path, signature, dataframe, pending_rows=None):
 
-        self.physical_intervention_checkbox = ttk.Checkbutton(self, text='Yes')
-        self.physical_intervention_checkbox.grid(row=9, column=1)
-        self.physical_intervention_checkbox.state(['!alternate'])
+        with self.lock:
+            # The signature, the typed rows, and the rows appended since they were typed
+            self.entries[path] = [signature, dataframe, pending_rows or []]
+            self.entries.move_to_end(path)
 
-        self.restraint_used_checkbox = ttk.Checkbutton(self, text='Yes')
-        self.restraint_used_checkbox.grid(row=10, column=1)
-        self.restraint_used_checkbox.state(['!alternate'])
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
 
-        self.police_involved_checkbox = ttk.Checkbutton(self, text='Yes')
-        self.police_involved_checkbox.grid(row=11, column=1)
-        self.police_involved_checkbox.state(['!alternate'])
+    def stats(self):
 
-    def handle_second_checkbox_creation(self):
-        '''Create the checkbox for the Over 24 Hour indicator.'''
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'cached': len(self.entries)}
 
-        self.time_over_24_hours_checkbox = ttk.Checkbutton(self, text='Yes')
-        self.time_over_24_hours_checkbox.grid(
-            columnspan=2, row=17, column=0, sticky='e', padx=(0, 45), pady=(5, 2))
-        self.time_over_24_hours_checkbox.state(['!alternate'])
+    def clear(self):
+        '''Forget every cached file, so the next get() of each reads it from disk.'''
 
-    def handle_textbox_creation(self):
-        '''Create the textbox for Notes.'''
+        with self.lock:
+            self.entries.clear()
 
-        self.notes_textbox = tk.Text(
-            self, font=('Calibri', 9), height=3, width=60)
-        self.notes_textbox.grid(columnspan=2, row=15, padx=10)
 
-    def handle_button_creation(self):
-        '''Create the Submit, Save Draft, and Load Saved Entry buttons.'''
+MONTHLY_CACHE = DataFrameCache(MAX_CACHED_MONTHS)
+MASTER_CACHE = DataFrameCache(1)
 
-        self.submit_button = tk.Button(self, font=(
-            'Arial', 16, 'bold'), text="SUBMIT", command=self.on_submit_button)
-        self.submit_button.grid(columnspan=2, row=16, pady=10)
 
-        self.save_button = tk.Button(self, font=(
-            'Arial', 11), fg='blue', text="Save Draft and Exit", command=self.on_save_button)
-        self.save_button.grid(row=19, column=0, padx=(
-            10, 0), pady=(0, 10), sticky='w')
+def read_incident_file(path):
 
-        self.load_button = tk.Button(self, font=(
-            'Arial', 11), fg='blue', text="Load Saved Entry", command=self.on_load_button)
-        self.load_button.grid(row=19, column=1, padx=(
-            0, 10), pady=(0, 10), sticky='e')
+    return pd.read_excel(path, dtype=str, keep_default_na=False)
 
-    def handle_listbox_creation(self):
-        '''Create the variable for the Entry field. Bind a function to it that updates the listbox based on the search query.
-           Create the Entry, and also a vertical scrollbar to use with the listbox. Bind a function to the listbox that will
-           validate the contents of the Entry field when focus leaves the listbox.'''
 
-        self.search_var = tk.StringVar()
-        # Bind function to the variable in the tray name entry field
-        self.search_var.trace('w', self.update_list)
+def load_incident_dataframe(path):
+    '''Load a monthly file, typed (from memory if it hasn't changed). If it doesn't exist, create an empty dataframe with the
+       incident columns. If it exists but can't be read, the error is raised: treating it as empty would overwrite its rows.'''
 
-        self.service_call_type_entry = tk.Entry(
-            self, textvariable=self.search_var, width=30)
-        self.service_call_type_entry.grid(
-            row=7, column=1, padx=(5, 32))  # ENTRY WIDGET
+    if not os.path.isfile(path):
+        return typed_incident_dataframe(pd.DataFrame(columns=INCIDENT_COLUMNS))
 
-        self.scrollbar = tk.Scrollbar(self, orient='vertical')
-        self.scrollbar.grid(row=8, column=1, pady=10, sticky='nes')
+    return MONTHLY_CACHE.get(path, read_incident_file)
 
-        self.service_call_type_listbox = tk.Listbox(
-            self, width=55, height=5, activestyle='none', yscrollcommand=self.scrollbar.set)
-        self.service_call_type_listbox.bind(
-            '<FocusOut>', self.focus_service_call_type_validation)
-        self.service_call_type_listbox.grid(
-            columnspan=2, row=8, padx=10, pady=(10, 15))
 
-        self.scrollbar.config(
-            command=self.service_call_type_listbox.yview)  # move two up
+def render_workbook(rows, column_widths, title=None):
+    '''Stream rows (the header first) into a write-only workbook, serialized in memory. Each row is written out as soon as it's
+       appended, and every cell shares the one named style instead of allocating its own Alignment. Return the bytes of the
+       .xlsx file, along with a checksum of the rows themselves. The bytes differ on every save (the file records when it was
+       saved), so the content checksum is what tells whether two exports hold the same data.'''
 
-        # Function for updating the list/doing the search. It needs to be called here to populate the listbox.
-        self.update_list()
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title)
+    content_checksum = hashlib.sha256()
 
-    def update_list(self, *args):
-        '''First, clear any background coloring of the Entry field. Get the Entry field query, and delete all listbox entries.
-           For each item in the Service Call Type list, if the query is a substirng of that item, insert the item into the listbox.'''
+    workbook.add_named_style(openpyxl_styles.NamedStyle(
+        name=CELL_STYLE_NAME, alignment=openpyxl_styles.Alignment(horizontal='center', vertical='center', wrapText=True)))
 
-        self.service_call_type_entry.config(
-            {'background': 'White'})  # Reset the text box
+    # Column widths have to be set before the first row is written
+    for column_letter, width in column_widths.items():
+        worksheet.column_dimensions[column_letter].width = width
 
-        search_term = self.search_var.get()
-        self.service_call_type_listbox.delete(0, 'end')
+    for row in rows:
+        cells = []
 
-        for item in self.service_call_type_list:
-            if search_term.lower().strip() in item.lower():
-                self.service_call_type_listbox.insert('end', '  ' + item)
+        for value in row:
+            cell = openpyxl_cell.WriteOnlyCell(worksheet, value)
+            cell.style = CELL_STYLE_NAME
+            cells.append(cell)
 
-#########################################################################################################
+        worksheet.append(cells)
+        content_checksum.update(repr(tuple(row)).encode('utf-8'))
 
-    def focus_date_validation(self, event=None):
-        '''See if the date can be parsed from the Entry field. If so, change the background color to green.
-           If the date can't be parsed, if the Entry is blank, make the background color white, otherwise red.'''
+    buffer = io.BytesIO()
+    workbook.save(buffer)
 
-        try:
-            datetime.strptime(self.date_entry.get().strip(), '%m/%d')
-            self.date_entry.config({'background': '#00cc2c'})
-        except:
-            if self.date_entry.get().strip() != '':
-                self.date_entry.config({'background': 'Red'})
-            else:
-                self.date_entry.config({'background': 'White'})
+    return buffer.getvalue(), content_checksum.hexdigest()
 
-    def focus_call_received_validation(self, event=None):
-        '''If the time string length is less than 4, make the background color red. Otherwise, try to parse the time.
-           It doesn't matter if a colon was used. Otherwise, if the Entry is blank, make the background color white. If
-           not blank, then make the background color red.'''
 
-        try:
-            if len(self.call_received_entry.get().strip()) < 4:
-                raise Exception
-            datetime.strptime(
-                self.call_received_entry.get().strip().replace(':', ''), '%H%M')
-            self.call_received_entry.config({'background': '#00cc2c'})
-        except:
-            if self.call_received_entry.get().strip() != '':
-                self.call_received_entry.config({'background': 'Red'})
-            else:
-                self.call_received_entry.config({'background': 'White'})
-                self.call_received_entry.delete(0, 'end')
+def write_file_atomically(path, data):
+    '''Write to a temporary file first and then move it over the old one, so a save that is interrupted can't leave a
+       half-written file behind. The temporary name is unique, since other workstations may be saving the same file.'''
 
-    def focus_arrival_time_validation(self, event=None):
-        '''Same logic as above.'''
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        try:
-            if len(self.arrival_time_entry.get().strip()) < 4:
-                fail = 1/0
-            datetime.strptime(
-                self.arrival_time_entry.get().strip().replace(':', ''), '%H%M')
-            self.arrival_time_entry.config({'background': '#00cc2c'})
-        except:
-            if self.arrival_time_entry.get().strip() != '':
-                self.arrival_time_entry.config({'background': 'Red'})
-            else:
-                self.arrival_time_entry.config({'background': 'White'})
-                self.arrival_time_entry.delete(0, 'end')
+    path_saving = path + '.' + uuid.uuid4().hex[:8] + '.saving'
 
-    def focus_completion_time_validation(self, event=None):
-        '''Same logic as above.'''
+    try:
+        with open(path_saving, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
 
-        try:
-            if len(self.completion_time_entry.get().strip()) < 4:
-                fail = 1/0
-            datetime.strptime(
-                self.completion_time_entry.get().strip().replace(':', ''), '%H%M')
-            self.completion_time_entry.config({'background': '#00cc2c'})
-        except:
-            if self.completion_time_entry.get().strip() != '':
-                self.completion_time_entry.config({'background': 'Red'})
-            else:
-                self.completion_time_entry.config({'background': 'White'})
-                self.completion_time_entry.delete(0, 'end')
+        os.replace(path_saving, path)
+    finally:
+        if os.path.exists(path_saving):
+            os.remove(path_saving)
 
-    def focus_service_call_type_validation(self, event=None):
-        '''If an item in the listbox is selected, insert it into the Entry field and set the background color to green.
-           Otherwise, if the entry field value matches an item in the service call type list or is blank, make the background green.
-           Otherwise, make the background red.'''
+
+def write_workbook(path, rows, column_widths, title=None):
+    '''Render the rows into a workbook and save it. Return the bytes and content checksum, e.g. for making a copy.'''
+
+    data, content_checksum = render_workbook(rows, column_widths, title)
+    write_file_atomically(path, data)
+
+    return data, content_checksum
+
+
+def render_incident_workbook(rows):
+    '''Render monthly or master rows, either a dataframe (typed or not) or a RowAccumulator, with the incident column widths.'''
+
+    if isinstance(rows, RowAccumulator):
+        return render_workbook(rows.iter_rows(), INCIDENT_COLUMN_WIDTHS)
+
+    return render_workbook(openpyxl_dataframe.dataframe_to_rows(untyped_incident_dataframe(rows), index=False),
+                           INCIDENT_COLUMN_WIDTHS)
+
+
+def save_incident_workbook(rows, path):
+    '''Save monthly or master rows, either a dataframe or a RowAccumulator, with the incident column widths.'''
+
+    data, content_checksum = render_incident_workbook(rows)
+    write_file_atomically(path, data)
+
+    return data, content_checksum
+
+
+##########################################################################################################
+# ENTRY CHECKS: the rules the entry window applies to each field, also used when importing old spreadsheets
+
+# Every minute of the day as HH:MM, and every way a valid time is usually entered (0930, 09:30 or 9:30) mapped to its minutes
+# since midnight. A time is then read with one dictionary lookup, rather than strptime() each time it's checked or used
+TIME_TEXT = [str(hour).zfill(2) + ':' + str(minute).zfill(2) for hour in range(24) for minute in range(60)]
+TIME_ENTRIES = {}
+
+for minutes, text in enumerate(TIME_TEXT):
+    TIME_ENTRIES[text] = TIME_ENTRIES[text.replace(':', '')] = minutes
+    if text[0] == '0':
+        TIME_ENTRIES[text[1:]] = minutes
+
+# How many entries in any other form are remembered once parsed (see parse_unusual_time_entry)
+UNUSUAL_TIME_ENTRIES_CACHED = 1024
+
+
+@functools.lru_cache(maxsize=UNUSUAL_TIME_ENTRIES_CACHED)
+def parse_unusual_time_entry(entered_time):
+    '''Read an entry that isn't in TIME_ENTRIES, valid or not (None). Only the most recently used entries are kept, as an
+       import of a messy spreadsheet could otherwise fill the cache with every typo in it.'''
+
+    try:
+        parsed = datetime.strptime(entered_time.replace(':', ''), '%H%M')
+    except ValueError:
+        return None
+
+    # Read as it's saved (format_time), as the durations always have been, if that can be read
+    try:
+        parsed = datetime.strptime(format_time(entered_time), '%H:%M')
+    except ValueError:
+        pass
+
+    return parsed.hour * 60 + parsed.minute
+
+
+def parse_time_entry(entered_time):
+    '''Read a time as entered into minutes since midnight, or None if it isn't valid. A time must be at least 4 characters long,
+       and parse as a 24-hour time. It doesn't matter if a colon was used.'''
+
+    entered_time = entered_time.strip()
+    minutes = TIME_ENTRIES.get(entered_time)
+
+    if minutes is not None or len(entered_time) < 4:
+        return minutes
+
+    return parse_unusual_time_entry(entered_time)
+
+
+def is_valid_time(time):
+    '''A time must be at least 4 characters long, and parse as a 24-hour time. It doesn't matter if a colon was used.'''
+
+    return parse_time_entry(time) is not None
+
+
+def format_time(time):
+    '''Adds a colon to the entered time if not present.'''
+
+    if ':' not in time:
+        time = time[:-2] + ':' + time[-2:]
+
+    return time
+
+
+def is_valid_service_call_type(service_call_type):
+    '''The service call type must be one of the types in the list.'''
+
+    return service_call_type.strip() in SERVICE_CALL_TYPES
+
+
+def parse_import_date(date, default_year):
+    '''Read a date from an old spreadsheet as 'yyyy/mm/dd'. It can be written as on the form (mm/dd, in default_year), or with the
+       year as yyyy/mm/dd or yyyy-mm-dd (which is how Excel dates are read, possibly with a time of 00:00:00). None if invalid.'''
+
+    date = date.strip()
+
+    if date.endswith(' 00:00:00'):
+        date = date[:-9]
+
+    for text, date_format in ((date, '%Y/%m/%d'), (date, '%Y-%m-%d'), (default_year + '/' + date, '%Y/%m/%d')):
+        try:
+            return datetime.strptime(text, date_format).strftime('%Y/%m/%d')
+        except ValueError:
+            pass
+
+    return None
+
+
+def parse_import_time_entered(time_entered):
+    '''Read when an incident was entered, from an old spreadsheet, as 'yyyy-mm-dd HH:MM' as the entry window saves it. It can be
+       written that way, with seconds (which is how Excel times are read), with slashes in the date, or as mm/dd/yyyy HH:MM.
+       None if invalid.'''
+
+    time_entered = time_entered.strip()
+
+    for entered_format in ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S', '%m/%d/%Y %H:%M'):
+        try:
+            return datetime.strptime(time_entered, entered_format).strftime('%Y-%m-%d %H:%M')
+        except ValueError:
+            pass
+
+    return None
+
+
+##########################################################################################################
+# SERVICE CALL TYPE SEARCH
+
+class ServiceCallTypeIndex:
+    '''Search index over the service call types, built once. Each type is lowercased and split into words, and every prefix of
+       every word maps to the types containing it, so a query is answered with a few dictionary lookups. Results are ranked:
+       types starting with the query first, then types with words starting with each word of the query, then any other types
+       containing the query. Within each group, the types used most often come first, then the order of the list.'''
+
+    def __init__(self, service_call_types, usage_counts=None):
+
+        self.service_call_types = list(service_call_types)
+        self.lowercase_types = [service_call_type.lower() for service_call_type in self.service_call_types]
+        self.usage_counts = dict(usage_counts or {})
+
+        # Word prefix -> positions of the types with a word starting with it
+        self.prefixes = {}
+
+        for position, lowercase_type in enumerate(self.lowercase_types):
+            for word in re.findall(r'[0-9a-z]+', lowercase_type):
+                for length in range(1, len(word) + 1):
+                    self.prefixes.setdefault(word[:length], set()).add(position)
+
+    def set_usage_counts(self, usage_counts):
+        '''Replace the counts of how often each type has been used, e.g. once they've been counted from the master.'''
+
+        self.usage_counts = dict(usage_counts)
+
+    def record_use(self, service_call_type):
+
+        self.usage_counts[service_call_type] = self.usage_counts.get(service_call_type, 0) + 1
+
+    def search(self, query):
+        '''Return the matching service call types, best match first. An empty query matches every type.'''
+
+        query = query.lower().strip()
+        words = re.findall(r'[0-9a-z]+', query)
+
+        if not query:
+            ranked = [(0, position) for position in range(len(self.service_call_types))]
+
+        else:
+            word_matches = set.intersection(*[self.prefixes.get(word, set()) for word in words]) if words else set()
+            ranked = []
+
+            for position, lowercase_type in enumerate(self.lowercase_types):
+                if lowercase_type.startswith(query):
+                    ranked.append((0, position))
+                elif position in word_matches:
+                    ranked.append((1, position))
+                elif query in lowercase_type:
+                    ranked.append((2, position))
+
+        ranked.sort(key=lambda match: (match[0], -self.usage_counts.get(self.service_call_types[match[1]], 0), match[1]))
+
+        return [self.service_call_types[position] for rank, position in ranked]
+
+
+##########################################################################################################
+# DURATIONS: the six "Time Taken" columns, for one row or for whole columns at once
+
+DURATION_COLUMNS = INCIDENT_COLUMNS[13:]
+
+# A time as entered (0930 or 09:30) or as read back from Excel (09:30:00)
+TIME_PATTERN = r'^(\d{1,2}):?(\d{2})(?::\d{2})?$'
+
+
+def format_duration(minutes):
+    '''Write a number of minutes out as e.g. '1 hour, 5 minutes', '26 hours' or '0 minutes'.'''
+
+    hours, minutes = divmod(int(minutes), 60)
+
+    minutes_string = str(minutes) + (' minute' if minutes == 1 else ' minutes')
+
+    if hours == 0:
+        return minutes_string
+
+    hours_string = str(hours) + (' hour' if hours == 1 else ' hours')
+
+    return hours_string if minutes == 0 else hours_string + ', ' + minutes_string
+
+
+def parse_time_text(text):
+    '''Minutes since midnight of one time from a file, or NaN if it can't be read. Looked up in TIME_ENTRIES, or failing that
+       matched against TIME_PATTERN (e.g. 930, or 09:30:00 as read back from Excel).'''
+
+    text = text.strip()
+    minutes = TIME_ENTRIES.get(text)
+
+    if minutes is not None:
+        return minutes
+
+    match = re.match(TIME_PATTERN, text)
+
+    if match is not None and int(match.group(1)) < 24 and int(match.group(2)) < 60:
+        return int(match.group(1)) * 60 + int(match.group(2))
+
+    return np.nan
+
+
+def parse_time_column(values):
+    '''Convert a column of times to minutes since midnight, as a float array with NaN wherever a time can't be read. Each
+       distinct time is only read once, however many rows have it. Times already read into minutes (a numeric array) are
+       returned as they are.'''
+
+    values = np.asarray(values)
+
+    if values.dtype.kind in 'iuf':
+        return values.astype(float)
+
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).astype(str))
+
+    return np.array([parse_time_text(text) for text in uniques] + [np.nan], dtype=float)[codes]
+
+
+def duration_minutes(start_minutes, end_minutes, over_24_hours=False):
+    '''Minutes from one time to another (each in minutes since midnight), wrapping past midnight, plus a day if over_24_hours.'''
+
+    return (end_minutes - start_minutes) % 1440 + (1440 if over_24_hours else 0)
+
+
+def format_duration_column(minutes):
+    '''format_duration() for a whole array of minutes at once. NaN gives an empty string.'''
+
+    minutes = np.asarray(minutes, dtype=float)
+    valid = ~np.isnan(minutes)
+
+    hours, minutes_past = np.divmod(np.where(valid, minutes, 0).astype(np.int64), 60)
+
+    hours_text = np.char.add(hours.astype(str), np.where(hours == 1, ' hour', ' hours'))
+    minutes_text = np.char.add(minutes_past.astype(str), np.where(minutes_past == 1, ' minute', ' minutes'))
+    both_text = np.char.add(np.char.add(hours_text, ', '), minutes_text)
+
+    text = np.where(hours == 0, minutes_text, np.where(minutes_past == 0, hours_text, both_text))
+
+    return np.where(valid, text, '').astype(object)
+
+
+def compute_duration_columns(call_received, arrival, completion, over_24_hours):
+    '''Compute the six "Time Taken" columns for whole columns of Call Received, Arrival and Completion times (as text, or
+       already read into minutes since midnight). over_24_hours is a
+       boolean array: the call took more than 24 hours to complete, so a day is added to the two durations that end at
+       completion (not to the time taken to arrive). Times that go past midnight wrap around, as they always have. Returns a
+       dictionary of column name to array; rows with a time that can't be read get an empty string.'''
+
+    call_received = parse_time_column(call_received)
+    arrival = parse_time_column(arrival)
+    completion = parse_time_column(completion)
+    extra_day = np.where(np.asarray(over_24_hours, dtype=bool), 1440, 0)
+
+    to_arrive = duration_minutes(call_received, arrival)
+    call_to_completion = duration_minutes(call_received, completion) + extra_day
+    arrival_to_completion = duration_minutes(arrival, completion) + extra_day
+
+    columns = {}
+
+    for column, text_column, minutes in zip(DURATION_COLUMNS[3:], DURATION_COLUMNS[:3],
+                                            (to_arrive, call_to_completion, arrival_to_completion)):
+        columns[text_column] = format_duration_column(minutes)
+        columns[column] = np.where(np.isnan(minutes), '', np.nan_to_num(minutes).astype(np.int64).astype(str)).astype(object)
+
+    return columns
+
+
+def infer_over_24_hours(dataframe):
+    '''The master file doesn't keep the ">24 Hours" answer, so work it out from the durations already recorded: a call to
+       completion of 24 hours (1440 minutes) or more can only have been entered with it checked.'''
+
+    recorded_minutes = pd.to_numeric(dataframe['Time Taken From Call to Completion (mins.)'], errors='coerce')
+    recorded_hours = pd.to_numeric(dataframe['Time Taken From Call to Completion'].astype(str).str.extract(r'^(\d+) hour')[0],
+                                   errors='coerce')
+
+    return ((recorded_minutes >= 1440) | (recorded_hours >= 24)).to_numpy()
+
+
+def repair_duration_columns(dataframe):
+    '''Recompute the six "Time Taken" columns for every row in one pass. A duration is left as it was if either of the two times
+       it's worked out from can't be read, so a blank Completion Time doesn't wipe out the recorded completion durations (and
+       the time taken to arrive is still repaired). The dataframe can be typed; the repaired one holds the text the files do.
+       Return the repaired dataframe and the number of rows that changed.'''
+
+    dataframe = untyped_incident_dataframe(dataframe)
+    repaired = dataframe.copy()
+    columns = compute_duration_columns(dataframe['Call Received Time'], dataframe['Arrival Time'],
+                                       dataframe['Completion Time'], infer_over_24_hours(dataframe))
+    changed = np.zeros(dataframe.shape[0], dtype=bool)
+
+    for column in DURATION_COLUMNS:
+        existing = dataframe[column].astype(object)
+        existing = existing.where(existing.notna(), '').astype(str).to_numpy()
+        # compute_duration_columns() leaves a duration empty exactly when one of its own two times can't be read
+        new = np.where(columns[column] != '', columns[column], existing)
+
+        changed |= new != existing
+        repaired[column] = new
+
+    return repaired, int(changed.sum())
+
+
+##########################################################################################################
+# INCIDENT SCHEMA: incidents held with real types in memory, and turned back into the text the files hold to save them
+
+def typed_incident_dataframe(dataframe, coerce=False):
+    '''Hold the incident columns as INCIDENT_SCHEMA says: the date and time entered as datetimes, the Yes/No columns as (nullable)
+       booleans, the minute columns as (nullable) 32-bit integers, the columns that repeat a limited set of values (the shift,
+       the service call type, the times and who requested it) as categories, and the notes as text. Each value repeated in a
+       category column is then stored once, rather than as a Python string per row, so a master of several years takes a small
+       fraction of the memory, and filtering or grouping on these columns compares integer codes. Columns that already have
+       their type are left alone, so a typed dataframe can be passed again.
+
+       The rows are saved again from the typed columns (see untyped_incident_dataframe()), so typing mustn't change what the
+       files hold. If any value of a date, flag or minutes column wouldn't be turned back into the same text (a date entered
+       as 3/4/2020, a flag of "yes", 12.5 minutes), the column is held as text (a category) instead, unless coerce, when
+       those values become blanks, as the statistics want.'''
+
+    typed = {}
+
+    for column in INCIDENT_COLUMNS:
+        values = dataframe[column] if column in dataframe.columns else pd.Series('', index=dataframe.index)
+        kind = INCIDENT_SCHEMA[column]
+
+        if kind in ('date', 'datetime', 'flag', 'minutes') and not is_typed_incident_column(values, kind):
+            # Each distinct value is typed once, and checked that it's turned back into the same text
+            text = values.astype(object).fillna('').astype(str)
+            codes, uniques = pd.factorize(text)
+            typed_uniques = type_incident_column(pd.Series(uniques, dtype=object), kind)
+            untyped_uniques = untyped_incident_dataframe(pd.DataFrame({column: typed_uniques}))[column]
+
+            if coerce or np.array_equal(untyped_uniques.to_numpy(dtype=object), np.asarray(uniques, dtype=object)):
+                values = pd.Series(typed_uniques.array.take(codes), index=values.index)
+            elif not isinstance(values.dtype, pd.CategoricalDtype):
+                values = text.astype('category')
+
+        elif kind == 'category':
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.fillna('').astype(str).astype('category')
+
+        elif kind == 'text' and not pd.api.types.is_string_dtype(values):
+            values = values.fillna('').astype(str)
+
+        typed[column] = values
+
+    return pd.DataFrame(typed, index=dataframe.index)
+
+
+def is_typed_incident_column(values, kind):
+    '''Whether a date, flag or minutes column already holds its type.'''
+
+    if kind in ('date', 'datetime'):
+        return pd.api.types.is_datetime64_any_dtype(values)
+
+    return values.dtype == ('boolean' if kind == 'flag' else 'Int32')
+
+
+def type_incident_column(text, kind):
+    '''A date, flag or minutes column of text as its type, with blanks (NaT or NA) wherever a value can't be read as one.'''
+
+    if kind in ('date', 'datetime'):
+        return pd.to_datetime(text, format='%Y/%m/%d' if kind == 'date' else 'ISO8601', errors='coerce')
+
+    if kind == 'flag':
+        return text.map({'Yes': True, 'No': False}).astype('boolean')
+
+    minutes = pd.to_numeric(text, errors='coerce').round()
+
+    return minutes.where(minutes.abs() < 2 ** 31).astype('Int32')
+
+
+def untyped_incident_dataframe(dataframe):
+    '''The reverse of typed_incident_dataframe(): every typed column turned back into the text the Excel files and the master
+       store hold (dates as yyyy/mm/dd, Yes/No, whole minutes, blank where there's no value). Columns that are already text
+       are left alone, so rows that were never typed cost nothing to pass through here.'''
+
+    untyped = {}
+
+    for column in dataframe.columns:
+        values = dataframe[column]
+        kind = INCIDENT_SCHEMA.get(column)
+
+        if kind in ('date', 'datetime') and pd.api.types.is_datetime64_any_dtype(values):
+            # Each distinct date is formatted once; there are far fewer of them than rows
+            codes, uniques = pd.factorize(values)
+            formatted = np.append(np.asarray(uniques.strftime('%Y/%m/%d' if kind == 'date' else '%Y-%m-%d %H:%M'), dtype=object), '')
+            values = pd.Series(formatted[codes], index=values.index)
+
+        elif kind == 'flag' and pd.api.types.is_bool_dtype(values):
+            values = values.map({True: 'Yes', False: 'No'}).fillna('')
+
+        elif kind == 'minutes' and pd.api.types.is_numeric_dtype(values):
+            values = values.astype('Int64').astype(str).where(values.notna(), '')
+
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(str)
+
+        untyped[column] = values
+
+    return pd.DataFrame(untyped, index=dataframe.index)
+
+
+def concat_typed_incident_dataframes(frames):
+    '''pd.concat() for typed incident dataframes. The category columns are combined with union_categoricals(), so they stay
+       categories; pd.concat() turns any whose categories differ back into a column of Python strings. A date, flag or minutes
+       column held as text in any of the frames (see typed_incident_dataframe()) is held as text in all of them first.'''
+
+    for column in INCIDENT_COLUMNS:
+        held_as_text = [isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames]
+
+        if INCIDENT_SCHEMA[column] != 'category' and any(held_as_text) and not all(held_as_text):
+            frames = [frame.assign(**{column: untyped_incident_dataframe(frame[[column]])[column].astype(str).astype('category')})
+                      for frame in frames]
+
+    combined = pd.concat(frames, ignore_index=True)
+
+    for column in INCIDENT_COLUMNS:
+        if all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            combined[column] = pd.api.types.union_categoricals([frame[column] for frame in frames])
+
+    return combined
+
+
+def rows_are_at(dataframe, position, rows):
+    '''Whether rows (dictionaries, as submitted) are the rows of an incident dataframe (typed or not) from position on,
+       compared as the text the files hold.'''
+
+    found = untyped_incident_dataframe(dataframe.iloc[position:position + len(rows)]).reindex(columns=INCIDENT_COLUMNS)
+    expected = pd.DataFrame(rows, columns=INCIDENT_COLUMNS).fillna('')
+
+    return len(found) == len(rows) and found.fillna('').astype(str).reset_index(drop=True).equals(expected.astype(str))
+
+
+def select_date_range(dataframe, start_date, end_date):
+    '''The rows of an incident dataframe (typed or not) dated between two dates given as yyyy/mm/dd, inclusive. Each distinct
+       date is compared once, as the text the files hold, so '0000/00/00' and '9999/99/99' still work as open ends.'''
+
+    codes, uniques = pd.factorize(dataframe['Date'])
+
+    if pd.api.types.is_datetime64_any_dtype(uniques):
+        uniques = uniques.strftime('%Y/%m/%d')
+
+    uniques = np.asarray(uniques, dtype=object).astype(str)
+    # Rows without a date (code -1) pick the last entry, which is never in range
+    in_range = np.append((uniques >= start_date) & (uniques <= end_date), False)
+
+    return dataframe[in_range[codes]]
+
+
+def count_service_call_types(dataframe):
+    '''How many incidents of each service call type a dataframe (typed or not) holds. Types that don't occur are left out, as a
+       category column counts each of its categories, even with no rows.'''
+
+    counts = dataframe['Service Call Type'].value_counts()
+
+    return counts[counts > 0].to_dict()
+
+
+##########################################################################################################
+# MASTER MIRROR: a typed Parquet copy of the master, for analysis
+
+def write_master_mirror(master_df, path):
+    '''Write the typed copy of the master to a Parquet file. Return False (and write nothing) if pyarrow isn't installed.'''
+
+    buffer = io.BytesIO()
+
+    try:
+        typed_incident_dataframe(master_df).to_parquet(buffer, index=False)
+    except ImportError:
+        return False
+
+    write_file_atomically(path, buffer.getvalue())
+
+    return True
+
+
+def load_master(path_workbook=None, path_mirror=None):
+    '''Load the master for analysis, with typed columns. The Parquet copy is read if it was written since the master file was
+       (and pyarrow is installed); otherwise the master file is read, and typed the same way.
+
+       For scripts and notebooks outside the tool, which can't read the store: both files are only as new as the last export,
+       so they can be up to MASTER_EXPORT_SECONDS behind. The tool's own reports (the analytics command) read the store.'''
+
+    path_workbook = path_workbook or PATH_MASTER
+    path_mirror = path_mirror or PATH_MASTER_MIRROR
+
+    try:
+        if os.path.getmtime(path_mirror) >= os.path.getmtime(path_workbook):
+            # Typed again in case it was written before a column's type changed
+            return typed_incident_dataframe(pd.read_parquet(path_mirror))
+    except (OSError, ImportError):
+        pass
+
+    return typed_incident_dataframe(pd.read_excel(path_workbook, dtype=str, keep_default_na=False))
+
+
+##########################################################################################################
+# SHARED FILES: several workstations write to the same master and monthly files
+
+class WriteConflictError(Exception):
+    '''Raised when the shared files stay locked or keep changing underneath us after every retry.'''
+
+
+def backoff(attempt):
+    '''Sleep before retrying: exponentially longer each attempt, up to the cap, randomized so workstations don't retry in step.'''
+
+    time.sleep(min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+class LeaseLock:
+    '''A lock file next to the master file, created with O_EXCL so only one workstation can hold it. The file records who holds
+       it. If a workstation crashes while holding it, the lock expires after LOCK_LEASE_SECONDS and the next workstation breaks
+       it. Most writes hold it briefly, but some work under it can take longer than the lease: seeding a new store from the
+       master, or writing the master workbook of the partitioned store. So while the lock is held, a heartbeat thread touches
+       the file every third of the lease, and only a holder that has stopped running lets it expire.'''
+
+    def __init__(self, path, lease_seconds=None, attempts=None):
+
+        self.path = path
+        self.lease_seconds = LOCK_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.attempts = LOCK_ATTEMPTS if attempts is None else attempts
+        self.token = None
+        self.waits = 0
+        # Set to stop the heartbeat thread of the lock currently held
+        self.heartbeat_stopped = None
+        self.heartbeat = None
+
+    def read_token(self, path):
+
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file).get('token')
+        except (OSError, ValueError):
+            return None
+
+    def try_acquire(self):
+
+        token = uuid.uuid4().hex
+
+        try:
+            descriptor = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump({'token': token, 'host': socket.gethostname(), 'pid': os.getpid(), 'acquired': time.time()}, file)
+
+        self.token = token
+        return True
+
+    def break_if_expired(self):
+        '''Remove the lock file if its holder hasn't touched it within the lease. It is renamed away first, so that only one
+           workstation can break it; if the file renamed turns out to be a fresh lock (someone else broke the old one first),
+           it's put back.'''
+
+        try:
+            if time.time() - os.path.getmtime(self.path) < self.lease_seconds:
+                return
+        except OSError:
+            return
+
+        expired_token = self.read_token(self.path)
+        path_expired = self.path + '.expired-' + uuid.uuid4().hex
+
+        try:
+            os.rename(self.path, path_expired)
+        except OSError:
+            return
+
+        if self.read_token(path_expired) != expired_token and not os.path.exists(self.path):
+            os.rename(path_expired, self.path)
+        else:
+            os.remove(path_expired)
+
+    def acquire(self):
+
+        for attempt in range(self.attempts):
+            if self.try_acquire():
+                self.start_heartbeat()
+                return
+
+            self.waits += 1
+            self.break_if_expired()
+            backoff(attempt)
+
+        raise WriteConflictError('The shared files are locked by another workstation (' + self.path + ').')
+
+    def start_heartbeat(self):
+
+        self.heartbeat_stopped = threading.Event()
+        self.heartbeat = threading.Thread(target=self.renew, args=(self.token, self.heartbeat_stopped), daemon=True)
+        self.heartbeat.start()
+
+    def renew(self, token, stopped):
+        '''Runs on the heartbeat thread. Touch the lock file every third of the lease until the lock is released, so work that
+           takes longer than the lease isn't taken for a crashed holder. Stops if the lock was broken after all.'''
+
+        while not stopped.wait(self.lease_seconds / 3):
+            if self.read_token(self.path) != token:
+                return
+
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def release(self):
+
+        if self.heartbeat is not None:
+            self.heartbeat_stopped.set()
+            self.heartbeat.join()
+            self.heartbeat = None
+
+        if self.token is not None and self.read_token(self.path) == self.token:
+            os.remove(self.path)
+
+        self.token = None
+
+    def __enter__(self):
+
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.release()
+
+
+class MasterReplicator:
+    '''Keeps PATH_MASTER_COPY up to date in the background, from the bytes the master was just saved as, rather than serializing
+       the master a second time. A checksum file next to the copy records the content it holds; if a new export has the same
+       content, the copy is left alone. Otherwise the copy is written, read back and compared to the expected checksum. While
+       a copy is waiting, in progress, or has failed, is_stale() is True so the window can say so. If exports come in faster
+       than copies can be made, only the newest is copied.'''
+
+    def __init__(self, path_copy):
+
+        self.path_copy = path_copy
+        self.path_checksum = path_copy + '.sha256.json'
+        self.lock = threading.Lock()
+        self.pending = None
+        self.thread = None
+        self.status = 'current'
+        self.error = None
+        # Where to record how long each copy took, if anywhere (a SubmitTimings)
+        self.timings = None
+
+    def is_stale(self):
+
+        return self.status != 'current'
+
+    def replicate(self, data, content_checksum):
+        '''Queue the newest master bytes to be copied, and start the copying thread if it isn't running.'''
+
+        with self.lock:
+            self.pending = (data, content_checksum)
+            self.status = 'pending'
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def run(self):
+
+        while True:
+            with self.lock:
+                if self.pending is None:
+                    self.thread = None
+                    return
+                data, content_checksum = self.pending
+                self.pending = None
+                self.status = 'copying'
+
+            timer = StageTimer()
+
+            try:
+                self.copy(data, content_checksum)
+                status, error = 'current', None
+            except Exception as exception:
+                status, error = 'failed', str(exception)
+
+            if self.timings is not None:
+                timer.lap('master copy')
+                self.timings.append('copy', timer.stages, 0, 'saved' if status == 'current' else 'failed')
+
+            with self.lock:
+                # A newer export may have been queued while this one was copying
+                if self.pending is None:
+                    self.status = status
+                self.error = error
+
+    def read_recorded_checksum(self):
+
+        try:
+            with open(self.path_checksum, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def copy(self, data, content_checksum):
+        '''Write the copy unless it already holds this content, then verify it. Return True if it was written.'''
+
+        recorded = self.read_recorded_checksum()
+
+        if (recorded.get('content') == content_checksum and os.path.isfile(self.path_copy) and
+                os.path.getsize(self.path_copy) == recorded.get('size')):
+            return False
+
+        expected = hashlib.sha256(data).hexdigest()
+
+        write_file_atomically(self.path_copy, data)
+
+        with open(self.path_copy, 'rb') as file:
+            if hashlib.sha256(file.read()).hexdigest() != expected:
+                raise IOError('The copy of the master file does not match the master file after writing it.')
+
+        with open(self.path_checksum, 'w', encoding='utf-8') as file:
+            json.dump({'content': content_checksum, 'sha256': expected, 'size': len(data)}, file)
+
+        return True
+
+    def wait(self):
+        '''Wait for any queued copy to finish.'''
+
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+
+class MasterStore:
+    '''The master workbook used to be read in full and rewritten on every Submit, so each click cost time proportional to every
+       incident ever recorded. Instead, submitted rows are appended to a CSV file with the same 19 columns, which takes the same
+       time no matter how large the history is. The master workbook is produced from this store by export_workbook(), which is run
+       when the application closes (or from the command line), rather than on every Submit.'''
+
+    def __init__(self, path_store, path_workbook, replicator=None, path_mirror=None):
+
+        self.path_store = path_store
+        self.path_workbook = path_workbook
+        self.replicator = replicator
+        # The typed Parquet copy of the master, written with it, if wanted
+        self.path_mirror = path_mirror
+
+    def exists(self):
+
+        return os.path.isfile(self.path_store)
+
+    def ensure_initialized(self):
+        '''If the store doesn't exist yet, seed it once from the existing master workbook. Return False if there is neither a store
+           nor a master workbook, so the caller can report that the Master file can't be found.'''
+
+        if self.exists():
+            return True
+
+        if not os.path.isfile(self.path_workbook):
+            return False
+
+        seed_df = pd.read_excel(self.path_workbook, dtype=str, keep_default_na=False)
+        seed_df.reindex(columns=INCIDENT_COLUMNS, fill_value='').to_csv(
+            self.path_store + '.creating', index=False, encoding='utf-8')
+        os.replace(self.path_store + '.creating', self.path_store)
+
+        return True
+
+    def append_row(self, row):
+        '''Append a single incident to the end of the store and flush it to disk. Only the new line is written.'''
+
+        self.append_rows([row])
+
+    @staticmethod
+    def render_rows(rows):
+        '''The lines of the store for rows, as bytes.'''
+
+        text = io.StringIO(newline='')
+        csv.writer(text).writerows([[str(row.get(column, '')) for column in INCIDENT_COLUMNS] for row in rows])
+
+        return text.getvalue().encode('utf-8')
+
+    def append_rows(self, rows):
+        '''Append a batch of incidents with a single write and flush.'''
+
+        signature_before = DataFrameCache.signature(self.path_store)
+
+        with open(self.path_store, 'ab') as file:
+            file.write(self.render_rows(rows))
+            file.flush()
+            os.fsync(file.fileno())
+
+        MASTER_CACHE.extend(self.path_store, signature_before,
+                            [{column: str(row.get(column, '')) for column in INCIDENT_COLUMNS} for row in rows])
+
+    def append_position(self, rows):
+        '''Where rows appended now will start: the size of the store. See rows_not_appended().'''
+
+        return os.path.getsize(self.path_store)
+
+    def rows_not_appended(self, position, rows):
+        '''The rows that aren't in the store from position (an append_position()) on, e.g. as the tool stopped before it
+           could record that it had appended them. They were written at once, so either all of them are there or none.'''
+
+        data = self.render_rows(rows)
+
+        with open(self.path_store, 'rb') as file:
+            file.seek(position)
+            return [] if file.read(len(data)) == data else rows
+
+    @staticmethod
+    def read_store_file(path):
+
+        return pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8')
+
+    def read_dataframe(self):
+        '''Read the whole store (from memory if nothing else has written to it), typed. The file keeps every value as the text
+           that was entered.'''
+
+        return MASTER_CACHE.get(self.path_store, self.read_store_file)
+
+    def version(self):
+        '''Changes whenever a row is added to the store.'''
+
+        return DataFrameCache.signature(self.path_store)
+
+    def rewrite(self, dataframe):
+        '''Replace every row in the store, e.g. after repairing them. Used while holding the shared lock.'''
+
+        untyped_incident_dataframe(dataframe).reindex(columns=INCIDENT_COLUMNS).to_csv(
+            self.path_store + '.rewriting', index=False, encoding='utf-8')
+        os.replace(self.path_store + '.rewriting', self.path_store)
+        MASTER_CACHE.put(self.path_store, dataframe)
+
+    def service_call_type_counts(self):
+        '''How many incidents there have been of each service call type.'''
+
+        return count_service_call_types(self.read_dataframe())
+
+    def read_range(self, start_date, end_date):
+        '''Read the incidents between two dates (inclusive), given as yyyy/mm/dd.'''
+
+        return select_date_range(self.read_dataframe(), start_date, end_date)
+
+    # With this backend, each monthly file holds its own rows, and pending rows are added to it by the compactor
+    monthly_files_are_exports = False
+
+    def read_month(self, year, month_number):
+        '''The monthly file is the source for a month with this backend.'''
+
+        return load_incident_dataframe(monthly_file_path(year, MONTHS[str(int(month_number))]))
+
+    def workbook_is_stale(self):
+        '''The master workbook needs to be re-exported if the store has been written to since the workbook was last saved.'''
+
+        if not self.exists():
+            return False
+
+        try:
+            return os.path.getmtime(self.path_store) > os.path.getmtime(self.path_workbook)
+        except OSError:
+            return True
+
+    def export_workbook(self):
+        '''Produce the master workbook from the store, with the same column widths, alignment and text wrapping as the monthly
+           file. Blank values are written as empty cells, as pandas would have left them. The copy is made in the background
+           from the same bytes.'''
+
+        master_df = self.read_dataframe()
+        export_df = untyped_incident_dataframe(master_df)
+
+        data, content_checksum = save_incident_workbook(export_df.where(export_df != '', None), self.path_workbook)
+
+        if self.replicator is not None:
+            self.replicator.replicate(data, content_checksum)
+
+        # Written after the master file, so it's never older than the master it was made with
+        if self.path_mirror:
+            write_master_mirror(master_df, self.path_mirror)
+
+
+class SQLiteIncidentStore:
+    '''Optional database backend, used when STORAGE_BACKEND is 'sqlite'. Incidents are kept in one table with the same columns as
+       the Excel files, with the minute columns as integers and indexes on date, shift and service call type, so inserting a row
+       or looking up a date range doesn't depend on how many years are stored. The master and monthly files are exports that
+       are regenerated from the database. It has the same methods as MasterStore, so the rest of the tool can use either.'''
+
+    # Database column for each column of the Excel files, in the same order
+    SQL_COLUMNS = ['date', 'time_entered', 'shift', 'call_received_time', 'arrival_time', 'completion_time', 'service_call_type',
+                   'physical_intervention', 'restraint_used', 'police_involved', 'requested_by', 'contact_information',
+                   'notes', 'time_taken_to_arrive', 'time_taken_from_call_to_completion', 'time_taken_from_arrival_to_completion',
+                   'minutes_to_arrive', 'minutes_from_call_to_completion', 'minutes_from_arrival_to_completion']
+
+    MINUTE_COLUMNS = ['minutes_to_arrive', 'minutes_from_call_to_completion', 'minutes_from_arrival_to_completion']
+
+    monthly_files_are_exports = True
+
+    def __init__(self, path_database, path_workbook, replicator=None, path_seed_store=None, path_mirror=None):
+
+        self.path_database = path_database
+        self.path_workbook = path_workbook
+        self.replicator = replicator
+        self.path_seed_store = path_seed_store
+        self.path_mirror = path_mirror
+        # SQLite connections can't be shared between threads, and the compactor uses the store from its own thread
+        self.connections = threading.local()
+
+    def open_connection(self, path):
+
+        connection = sqlite3.connect(path, timeout=30)
+        # The database is on the shared drive, where WAL mode isn't safe (its shared memory file needs every computer on the same
+        # host), so each write is journaled to a file that's deleted once it's committed, and synced before it counts as written
+        connection.execute('PRAGMA journal_mode=DELETE')
+        connection.execute('PRAGMA synchronous=FULL')
+        self.create_schema(connection)
+        return connection
+
+    def connect(self):
+        '''Return this thread's connection, opening it the first time.'''
+
+        connection = getattr(self.connections, 'connection', None)
+
+        if connection is None:
+            connection = self.connections.connection = self.open_connection(self.path_database)
+
+        return connection
+
+    def exists(self):
+
+        return os.path.isfile(self.path_database)
+
+    def create_schema(self, connection):
+
+        columns = ', '.join(column + (' INTEGER' if column in self.MINUTE_COLUMNS else ' TEXT')
+                            for column in self.SQL_COLUMNS)
+
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS incidents (id INTEGER PRIMARY KEY, ' + columns + ')')
+            connection.execute('CREATE INDEX IF NOT EXISTS incidents_date ON incidents (date)')
+            connection.execute('CREATE INDEX IF NOT EXISTS incidents_shift ON incidents (shift, date)')
+            connection.execute('CREATE INDEX IF NOT EXISTS incidents_service_call_type ON incidents (service_call_type, date)')
+
+    def ensure_initialized(self):
+        '''Create the database the first time, seeding it from the CSV master store if there is one, or else the master workbook.
+           Return False if there is nothing to start from, so the caller can report that the Master file can't be found.'''
+
+        if self.exists():
+            return True
+
+        if self.path_seed_store and os.path.isfile(self.path_seed_store):
+            seed_df = pd.read_csv(self.path_seed_store, dtype=str, keep_default_na=False, encoding='utf-8')
+        elif os.path.isfile(self.path_workbook):
+            seed_df = pd.read_excel(self.path_workbook, dtype=str, keep_default_na=False)
+        else:
+            return False
+
+        seed_df = seed_df.reindex(columns=INCIDENT_COLUMNS, fill_value='')
+
+        # Build it under a temporary name so an interrupted seed isn't mistaken for a finished database
+        path_creating = self.path_database + '.creating'
+
+        if os.path.isfile(path_creating):
+            os.remove(path_creating)
+
+        connection = self.open_connection(path_creating)
+
+        try:
+            self.insert_rows(connection, seed_df.to_dict('records'))
+        finally:
+            connection.close()
+
+        os.replace(path_creating, self.path_database)
+
+        return True
+
+    def to_record(self, row):
+        '''Convert a row keyed by the Excel column names into a tuple for the incidents table.'''
+
+        record = []
+
+        for column, sql_column in zip(INCIDENT_COLUMNS, self.SQL_COLUMNS):
+            value = row.get(column, '')
+
+            if sql_column in self.MINUTE_COLUMNS:
+                try:
+                    value = int(float(value))
+                except (TypeError, ValueError):
+                    value = None
+
+            record.append(value)
+
+        return tuple(record)
+
+    def append_row(self, row):
+
+        self.append_rows([row])
+
+    def append_rows(self, rows):
+        '''Insert a batch of incidents in a single transaction.'''
+
+        self.insert_rows(self.connect(), rows)
+
+    def insert_rows(self, connection, rows):
+
+        with connection:
+            connection.executemany('INSERT INTO incidents (' + ', '.join(self.SQL_COLUMNS) + ') VALUES (' +
+                                   ', '.join('?' * len(self.SQL_COLUMNS)) + ')', [self.to_record(row) for row in rows])
+
+    def query_dataframe(self, where='', parameters=()):
+        '''Run a select on the incidents table and return the rows in entry order, with the Excel column names.'''
+
+        dataframe = pd.read_sql_query('SELECT ' + ', '.join(self.SQL_COLUMNS) + ' FROM incidents ' + where + ' ORDER BY id',
+                                      self.connect(), params=parameters)
+
+        dataframe.columns = INCIDENT_COLUMNS
+
+        for column in INCIDENT_COLUMNS[16:]:
+            dataframe[column] = dataframe[column].astype('Int64')
+
+        return dataframe
+
+    def read_dataframe(self):
+
+        return self.query_dataframe()
+
+    def version(self):
+        '''Changes whenever a row is added to the database.'''
+
+        return self.connect().execute('SELECT max(id) FROM incidents').fetchone()[0]
+
+    def append_position(self, rows):
+        '''The id of the last row in the database; rows appended now come after it. See rows_not_appended().'''
+
+        return self.version() or 0
+
+    def rows_not_appended(self, position, rows):
+        '''The rows that aren't the rows after position (an append_position()), e.g. as the tool stopped before it could record
+           that it had appended them. They were inserted in one transaction, so either all of them are there or none.'''
+
+        appended = self.connect().execute('SELECT ' + ', '.join(self.SQL_COLUMNS) + ' FROM incidents WHERE id > ? ORDER BY id '
+                                          'LIMIT ?', (position, len(rows))).fetchall()
+
+        return [] if appended == [self.to_record(row) for row in rows] else rows
+
+    def rewrite(self, dataframe):
+        '''Replace every row in the database in one transaction, e.g. after repairing them. Used while holding the shared lock.'''
+
+        dataframe = untyped_incident_dataframe(dataframe)
+        connection = self.connect()
+
+        with connection:
+            connection.execute('DELETE FROM incidents')
+            connection.executemany('INSERT INTO incidents (' + ', '.join(self.SQL_COLUMNS) + ') VALUES (' +
+                                   ', '.join('?' * len(self.SQL_COLUMNS)) + ')',
+                                   [self.to_record(row) for row in dataframe.to_dict('records')])
+
+    def service_call_type_counts(self):
+        '''How many incidents there have been of each service call type, counted with the (service_call_type, date) index.'''
+
+        return dict(self.connect().execute('SELECT service_call_type, count(*) FROM incidents GROUP BY service_call_type'))
+
+    def read_range(self, start_date, end_date):
+        '''Read the incidents between two dates (inclusive), given as yyyy/mm/dd. Uses the index on date.'''
+
+        return self.query_dataframe('WHERE date BETWEEN ? AND ?', (start_date, end_date))
+
+    def read_month(self, year, month_number):
+
+        month_prefix = year + '/' + str(int(month_number)).zfill(2)
+        return self.read_range(month_prefix + '/01', month_prefix + '/31')
+
+    def export_dataframe(self, dataframe):
+        '''Blank values and missing minutes are written as empty cells.'''
+
+        dataframe = dataframe.astype(object)
+        return dataframe.where(dataframe.notna() & (dataframe != ''), None)
+
+    def workbook_is_stale(self):
+
+        if not self.exists():
+            return False
+
+        try:
+            return os.path.getmtime(self.path_database) > os.path.getmtime(self.path_workbook)
+        except OSError:
+            return True
+
+    def export_workbook(self):
+        '''Produce the master workbook from the database. The copy is made in the background from the same bytes.'''
+
+        master_df = self.read_dataframe()
+
+        data, content_checksum = save_incident_workbook(self.export_dataframe(master_df), self.path_workbook)
+
+        if self.replicator is not None:
+            self.replicator.replicate(data, content_checksum)
+
+        if self.path_mirror:
+            write_master_mirror(master_df, self.path_mirror)
+
+    def export_month(self, year, month_number):
+        '''Regenerate one monthly file from the database.'''
+
+        save_incident_workbook(self.export_dataframe(self.read_month(year, month_number)),
+                               monthly_file_path(year, MONTHS[str(int(month_number))]))
+
+
+class PartitionedIncidentStore:
+    '''Optional backend, used when STORAGE_BACKEND is 'partitioned'. The monthly files are the store: each month's incidents are
+       only in its monthly file, so adding a row rewrites that month alone, and a query for some months only reads those months.
+       The manifest lists every monthly file with its row count, first and last date, and checksum; the partitions a date range
+       needs are picked from it without opening the others. The master file is no longer kept up to date on every Submit: it is
+       an export of all the months, made by the export-master command. It has the same methods as MasterStore.'''
+
+    # Rows are added to the monthly file by append_rows(), so there's nothing more for the compactor to do for it
+    monthly_files_are_exports = True
+
+    def __init__(self, path_manifest, path_workbook, replicator=None, path_mirror=None):
+
+        self.path_manifest = path_manifest
+        self.path_workbook = path_workbook
+        self.replicator = replicator
+        self.path_mirror = path_mirror
+
+    @staticmethod
+    def partition_path(month):
+        '''The monthly file for a month given as yyyy/mm.'''
+
+        return monthly_file_path(month[:4], MONTHS[str(int(month[5:7]))])
+
+    @staticmethod
+    def partition_years():
+        '''The years with a folder in the monthly folder, oldest first, so only those are looked in for monthly files when the
+           manifest is first made. (Once it exists, the manifest lists the months.)'''
+
+        try:
+            names = listdir(PATH_MONTHLY)
+        except OSError:
+            return []
+
+        return sorted({name[:4] for name in names if name[:4].isdigit()})
+
+    def exists(self):
+
+        return os.path.isfile(self.path_manifest)
+
+    def read_manifest(self):
+
+        with open(self.path_manifest, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def write_manifest(self, manifest):
+
+        write_file_atomically(self.path_manifest, json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+    @staticmethod
+    def describe_partition(dataframe, data):
+        '''The manifest entry for a monthly file with these rows and these bytes.'''
+
+        dates = untyped_incident_dataframe(dataframe[['Date']])['Date']
+
+        return {'rows': int(dataframe.shape[0]), 'first_date': dates.min() if dataframe.shape[0] else '',
+                'last_date': dates.max() if dataframe.shape[0] else '', 'sha256': hashlib.sha256(data).hexdigest()}
+
+    def ensure_initialized(self):
+        '''Create the manifest the first time, from the monthly files that exist. If there are none, the master workbook is split
+           into monthly files first. Return False if there is neither, so the caller can report that the Master file can't be
+           found.'''
+
+        if self.exists():
+            return True
+
+        manifest = {}
+
+        for year in self.partition_years():
+            for month_number in range(1, 13):
+                month = year + '/' + str(month_number).zfill(2)
+                path = self.partition_path(month)
+
+                if os.path.isfile(path):
+                    with open(path, 'rb') as file:
+                        manifest[month] = self.describe_partition(load_incident_dataframe(path), file.read())
+
+        if not manifest:
+            if not os.path.isfile(self.path_workbook):
+                return False
+
+            seed_df = pd.read_excel(self.path_workbook, dtype=str, keep_default_na=False).reindex(columns=INCIDENT_COLUMNS, fill_value='')
+
+            for month, month_df in seed_df.groupby(seed_df['Date'].str[:7]):
+                manifest[month] = self.write_partition(month, month_df.reset_index(drop=True))
+
+        self.write_manifest(manifest)
+
+        return True
+
+    def write_partition(self, month, rows):
+        '''Write a month's rows (a dataframe or a RowAccumulator) to its monthly file, and return its manifest entry.'''
+
+        path = self.partition_path(month)
+        accumulator = rows if isinstance(rows, RowAccumulator) else RowAccumulator(INCIDENT_COLUMNS, rows)
+        data, content_checksum = render_incident_workbook(accumulator)
+
+        write_file_atomically(path, data)
+        MONTHLY_CACHE.put(path, accumulator)
+
+        return self.describe_partition(accumulator.to_frame(), data)
+
+    def append_row(self, row):
+
+        self.append_rows([row])
+
+    def append_rows(self, rows):
+        '''Add rows to their monthly files, one write per month, and update the manifest. Used while holding the shared lock.'''
+
+        manifest = self.read_manifest()
+        months = {}
+
+        for row in rows:
+            months.setdefault(row['Date'][:7], []).append(row)
+
+        for month, month_rows in months.items():
+            accumulator = RowAccumulator(INCIDENT_COLUMNS, untyped_incident_dataframe(self.read_partition(month)))
+            accumulator.extend(month_rows)
+            manifest[month] = self.write_partition(month, accumulator)
+
+        self.write_manifest(manifest)
+
+    def append_position(self, rows):
+        '''The number of rows in each month rows would be added to; they come after them. See rows_not_appended().'''
+
+        manifest = self.read_manifest()
+
+        return {row['Date'][:7]: manifest[row['Date'][:7]]['rows'] if row['Date'][:7] in manifest else 0 for row in rows}
+
+    def rows_not_appended(self, position, rows):
+        '''The rows that aren't in their monthly files after the rows counted by position (an append_position()), e.g. as the
+           tool stopped before it could record that it had appended them. Each month is written at once, but the tool may have
+           stopped between months, or before the manifest was updated; the manifest is brought up to date for the months
+           found written.'''
+
+        manifest = self.read_manifest()
+        months = {}
+        missing = []
+
+        for row in rows:
+            months.setdefault(row['Date'][:7], []).append(row)
+
+        for month, month_rows in months.items():
+            path = self.partition_path(month)
+            partition = self.read_partition(month)
+
+            if not rows_are_at(partition, position[month], month_rows):
+                missing.extend(month_rows)
+            elif manifest.get(month, {}).get('rows') != partition.shape[0]:
+                with open(path, 'rb') as file:
+                    manifest[month] = self.describe_partition(partition, file.read())
+
+        self.write_manifest(manifest)
+
+        return missing
+
+    def read_partition(self, month):
+
+        return load_incident_dataframe(self.partition_path(month))
+
+    def prune(self, start_date, end_date):
+        '''The months (yyyy/mm) with any incidents between two dates (yyyy/mm/dd, inclusive), from the manifest alone.'''
+
+        return sorted(month for month, entry in self.read_manifest().items()
+                      if entry['rows'] and entry['first_date'] <= end_date and entry['last_date'] >= start_date)
+
+    def read_range(self, start_date, end_date):
+        '''Read the incidents between two dates (inclusive), given as yyyy/mm/dd, opening only the months that have any.'''
+
+        months = self.prune(start_date, end_date)
+
+        if not months:
+            return typed_incident_dataframe(pd.DataFrame(columns=INCIDENT_COLUMNS))
+
+        range_df = concat_typed_incident_dataframes([self.read_partition(month) for month in months])
+
+        return select_date_range(range_df, start_date, end_date).reset_index(drop=True)
+
+    def read_dataframe(self):
+
+        months = sorted(self.read_manifest())
+
+        if not months:
+            return typed_incident_dataframe(pd.DataFrame(columns=INCIDENT_COLUMNS))
+
+        return concat_typed_incident_dataframes([self.read_partition(month) for month in months])
+
+    def read_month(self, year, month_number):
+
+        return self.read_partition(year + '/' + str(month_number).zfill(2))
+
+    def version(self):
+        '''Changes whenever a row is added to any month.'''
+
+        return DataFrameCache.signature(self.path_manifest)
+
+    def rewrite(self, dataframe):
+        '''Replace every row, month by month, e.g. after repairing them. Used while holding the shared lock.'''
+
+        manifest = self.read_manifest()
+        dataframe = untyped_incident_dataframe(dataframe).reset_index(drop=True)
+
+        for month, month_df in dataframe.groupby(dataframe['Date'].astype(str).str[:7]):
+            manifest[month] = self.write_partition(month, month_df.reset_index(drop=True))
+
+        self.write_manifest(manifest)
+
+    def verify(self):
+        '''Check every monthly file against its checksum in the manifest. Return the months that don't match.'''
+
+        mismatched = []
+
+        for month, entry in sorted(self.read_manifest().items()):
+            try:
+                with open(self.partition_path(month), 'rb') as file:
+                    checksum = hashlib.sha256(file.read()).hexdigest()
+            except OSError:
+                checksum = None
+
+            if checksum != entry['sha256']:
+                mismatched.append(month)
+
+        return mismatched
+
+    def service_call_type_counts(self):
+
+        return count_service_call_types(self.read_dataframe())
+
+    def workbook_is_stale(self):
+        '''The master file is only exported on request with this backend.'''
+
+        return False
+
+    def export_month(self, year, month_number):
+        '''The monthly file is the partition itself, already written by append_rows().'''
+
+    def export_workbook(self):
+        '''Combine every month into the master workbook (and its copy and Parquet mirror).'''
+
+        master_df = self.read_dataframe()
+        export_df = untyped_incident_dataframe(master_df)
+
+        data, content_checksum = save_incident_workbook(export_df.where(export_df != '', None), self.path_workbook)
+
+        if self.replicator is not None:
+            self.replicator.replicate(data, content_checksum)
+
+        if self.path_mirror:
+            write_master_mirror(master_df, self.path_mirror)
+
+
+def create_incident_store():
+    '''Create the store selected by STORAGE_BACKEND.'''
+
+    replicator = MasterReplicator(PATH_MASTER_COPY) if PATH_MASTER_COPY else None
+
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteIncidentStore(PATH_DATABASE, PATH_MASTER, replicator, PATH_MASTER_STORE, PATH_MASTER_MIRROR)
+
+    if STORAGE_BACKEND == 'partitioned':
+        return PartitionedIncidentStore(PATH_MANIFEST, PATH_MASTER, replicator, PATH_MASTER_MIRROR)
+
+    return MasterStore(PATH_MASTER_STORE, PATH_MASTER, replicator, PATH_MASTER_MIRROR)
+
+
+class IncidentJournal:
+    '''Append-only write-ahead journal of submitted incidents, kept on this computer. Each submitted row is written as one line
+       of JSON with an increasing sequence number and flushed to disk before Submit returns, so the journal is the source of
+       truth for anything that hasn't made it into the Excel files yet. The checkpoint file records the last sequence number
+       folded into the master store and into each monthly file, so entries can be replayed after a crash or a failed save.
+       It also holds a random id for the journal, which tells it apart from the other workstations' journals.'''
+
+    def __init__(self, path_journal, path_checkpoint):
+
+        self.path_journal = path_journal
+        self.path_checkpoint = path_checkpoint
+        self.lock = threading.Lock()
+        self.last_seq = None
+
+    def read_checkpoint(self):
+
+        try:
+            with open(self.path_checkpoint, 'r', encoding='utf-8') as file:
+                checkpoint = json.load(file)
+        except (OSError, ValueError):
+            checkpoint = {}
+
+        checkpoint.setdefault('last_seq', 0)
+        checkpoint.setdefault('master', 0)
+        checkpoint.setdefault('rollups', 0)
+        checkpoint.setdefault('search', 0)
+        checkpoint.setdefault('monthly', {})
+        # Where entries were being added to each target when the checkpoint was last saved (see JournalCompactor.record_attempt)
+        checkpoint.setdefault('attempts', {})
+
+        return checkpoint
+
+    def journal_id(self):
+        '''The id of this journal, made the first time it's asked for.'''
+
+        with self.lock:
+            checkpoint = self.read_checkpoint()
+
+            if 'journal_id' not in checkpoint:
+                checkpoint['journal_id'] = uuid.uuid4().hex
+                self.write_checkpoint(checkpoint)
+
+            return checkpoint['journal_id']
+
+    def write_checkpoint(self, checkpoint):
+
+        os.makedirs(os.path.dirname(self.path_checkpoint) or '.', exist_ok=True)
+
+        with open(self.path_checkpoint + '.saving', 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(self.path_checkpoint + '.saving', self.path_checkpoint)
+
+    def read_entries(self):
+        '''Return every entry in the journal, oldest first. A last line that was only partly written (the computer lost power
+           mid-write) can't be parsed and is skipped; nothing after it was ever acknowledged.'''
+
+        entries = []
+
+        try:
+            with open(self.path_journal, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+
+        return entries
+
+    def append(self, row):
+        '''Write the row as one line at the end of the journal and flush it to disk. Return its sequence number.'''
+
+        with self.lock:
+            if self.last_seq is None:
+                entries = self.read_entries()
+                self.last_seq = max([self.read_checkpoint()['last_seq']] + [entry['seq'] for entry in entries])
+
+            os.makedirs(os.path.dirname(self.path_journal) or '.', exist_ok=True)
+
+            with open(self.path_journal, 'a+b') as file:
+                # Make sure a partly-written line from a crash doesn't swallow this entry
+                if file.tell() > 0:
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b'\n':
+                        file.write(b'\n')
+
+                self.last_seq += 1
+                file.write((json.dumps({'seq': self.last_seq, 'row': row}) + '\n').encode('utf-8'))
+                file.flush()
+                os.fsync(file.fileno())
+
+            return self.last_seq
+
+    def discard_through(self, seq):
+        '''Remove entries up to and including seq, once they are in every Excel file. Anything appended since is kept.'''
+
+        with self.lock:
+            remaining = [entry for entry in self.read_entries() if entry['seq'] > seq]
+
+            checkpoint = self.read_checkpoint()
+            checkpoint['last_seq'] = max(checkpoint['last_seq'], seq)
+            checkpoint['monthly'] = {path: applied for path, applied in checkpoint['monthly'].items() if applied > seq}
+            self.write_checkpoint(checkpoint)
+
+            with open(self.path_journal + '.saving', 'w', encoding='utf-8') as file:
+                for entry in remaining:
+                    file.write(json.dumps(entry) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(self.path_journal + '.saving', self.path_journal)
+
+
+# Kept in each database the compactor adds journal entries to: the last entry of each workstation's journal added to it. It's
+# recorded in the same transaction as the rows, so an entry is never added twice, even if the tool stops before saving its
+# checkpoint
+JOURNAL_SEQS_TABLE = 'CREATE TABLE IF NOT EXISTS journal_seqs (journal_id TEXT PRIMARY KEY, seq INTEGER)'
+
+
+def record_journal_seq(connection, journal_id, seq):
+    '''Record, in the caller's transaction, that a journal's entries up to seq have been added to the database.'''
+
+    connection.execute('INSERT INTO journal_seqs VALUES (?, ?) ON CONFLICT (journal_id) DO UPDATE SET '
+                       'seq = max(seq, excluded.seq)', (journal_id, seq))
+
+
+def read_journal_seq(path, journal_id):
+    '''The last entry of a journal added to the database at path, or 0 if none has been (or there's no database yet).'''
+
+    if not os.path.exists(path):
+        return 0
+
+    connection = sqlite3.connect(path, timeout=30)
+
+    try:
+        connection.execute(JOURNAL_SEQS_TABLE)
+        applied = connection.execute('SELECT seq FROM journal_seqs WHERE journal_id = ?', (journal_id,)).fetchone()
+    finally:
+        connection.close()
+
+    return applied[0] if applied else 0
+
+
+class JournalCompactor:
+    '''Folds pending journal entries into the master store, the monthly files and the master workbook. Everything pending is
+       applied in one pass, so the Excel files are written once per batch rather than once per Submit. Exporting the master
+       workbook takes longer the more years it holds, so it's only done every MASTER_EXPORT_SECONDS (or when asked to).'''
+
+    def __init__(self, journal, master_store, shared_lock=None, rollups=None, search_index=None):
+
+        self.journal = journal
+        self.master_store = master_store
+        # Running totals and the search index to add each row to, if kept
+        self.rollups = rollups
+        self.search_index = search_index
+        self.lock = threading.Lock()
+        # Held while writing to the shared files, which other workstations write to as well
+        self.shared_lock = shared_lock if shared_lock is not None else LeaseLock(PATH_SHARED_LOCK)
+        # Times another workstation wrote a file between us reading and writing it, and the rows had to be merged again
+        self.conflicts = 0
+        # When the master workbook was last exported (time.monotonic()), and whether an export has been put off since
+        self.last_export = time.monotonic()
+        self.export_deferred = False
+
+    def compact(self, timer=None, export_master=False):
+        '''Apply every pending entry to each target, recording the checkpoint after each one, then export the master workbook if
+           it's due (or now, if export_master). Return the number of entries. The time each target took is added to timer (a
+           StageTimer), if given.
+
+           The tool can stop after adding entries to a target but before saving the checkpoint, so a target is never trusted
+           to be missing the entries after its checkpoint: the databases record the last entry they were given in the same
+           transaction as the rows, and for the files, where the entries were being added is noted in the checkpoint first
+           (see record_attempt()) and looked at before adding them again.'''
+
+        timer = timer if timer is not None else StageTimer()
+
+        with self.lock:
+            entries = self.journal.read_entries()
+
+            if not entries:
+                self.export_master_if_due(timer, export_master)
+                return 0
+
+            journal_id = self.journal.journal_id()
+            checkpoint = self.journal.read_checkpoint()
+            timer.lap('journal read')
+
+            master_pending = [entry for entry in entries if entry['seq'] > checkpoint['master']]
+            search_pending = []
+
+            if self.search_index is not None:
+                search_applied = max(checkpoint['search'], self.search_index.applied_through(journal_id))
+                search_pending = [entry for entry in entries if entry['seq'] > search_applied]
+
+            if master_pending or search_pending:
+                with self.shared_lock:
+                    if master_pending:
+                        if not self.master_store.ensure_initialized():
+                            raise FileNotFoundError('The Master file can not be found.')
+
+                        master_pending = self.unapplied(checkpoint, 'master', master_pending, self.master_store.rows_not_appended)
+
+                    if master_pending:
+                        master_rows = [entry['row'] for entry in master_pending]
+                        self.record_attempt(checkpoint, 'master', master_pending, self.master_store.append_position(master_rows))
+                        self.master_store.append_rows(master_rows)
+
+                        checkpoint['master'] = master_pending[-1]['seq']
+                        checkpoint['attempts'].pop('master', None)
+                        self.journal.write_checkpoint(checkpoint)
+                        timer.lap('master store')
+
+                    # Indexed in the same hold of the lock as they're added to the master, so the first build of the index
+                    # (which holds it too, see IncidentSearchIndex.ensure_built) finds each row either in the master it reads,
+                    # or added to the index after it's built, never neither or both
+                    if search_pending:
+                        self.search_index.add_rows([entry['row'] for entry in search_pending], journal_id, search_pending[-1]['seq'])
+
+                        checkpoint['search'] = search_pending[-1]['seq']
+                        self.journal.write_checkpoint(checkpoint)
+                        timer.lap('search index')
+
+            if self.rollups is not None:
+                rollups_applied = max(checkpoint['rollups'], self.rollups.applied_through(journal_id))
+                rollups_pending = [entry for entry in entries if entry['seq'] > rollups_applied]
+
+                if rollups_pending:
+                    self.rollups.add_rows([entry['row'] for entry in rollups_pending], journal_id, rollups_pending[-1]['seq'])
+
+                    checkpoint['rollups'] = rollups_pending[-1]['seq']
+                    self.journal.write_checkpoint(checkpoint)
+                    timer.lap('rollups')
+
+            monthly_pending = {}
+
+            for entry in entries:
+                path = monthly_file_path_for_date(entry['row']['Date'])
+                if entry['seq'] > checkpoint['monthly'].get(path, 0):
+                    monthly_pending.setdefault(path, []).append(entry)
+
+            for path, month_entries in monthly_pending.items():
+                date = month_entries[0]['row']['Date']
+
+                if self.master_store.monthly_files_are_exports:
+                    # The store already has these rows, so the monthly file is regenerated from it
+                    self.export_until_current(lambda: self.master_store.export_month(date[:4], date[5:7]))
+                else:
+                    unapplied = self.unapplied(checkpoint, path, month_entries, lambda position, rows: [] if rows_are_at(
+                        load_incident_dataframe(path), position, rows) else rows)
+
+                    if unapplied:
+                        self.merge_into_monthly_file(path, [entry['row'] for entry in unapplied],
+                                                     lambda position: self.record_attempt(checkpoint, path, unapplied, position))
+
+                checkpoint['monthly'][path] = month_entries[-1]['seq']
+                checkpoint['attempts'].pop(path, None)
+                self.journal.write_checkpoint(checkpoint)
+                timer.lap('monthly file')
+
+            self.journal.discard_through(entries[-1]['seq'])
+            timer.lap('journal cleanup')
+
+            self.export_master_if_due(timer, export_master)
+
+            return len(entries)
+
+    def record_attempt(self, checkpoint, target, entries, position):
+        '''Save in the checkpoint, just before entries are added to a file (or the master store), where in it they're being
+           added (position, from the store's append_position(), or the number of rows in a monthly file). If the tool stops
+           before the checkpoint is saved again, unapplied() looks there to see whether they were added.'''
+
+        checkpoint['attempts'][target] = {'seq': entries[-1]['seq'], 'position': position}
+        self.journal.write_checkpoint(checkpoint)
+
+    def unapplied(self, checkpoint, target, entries, rows_not_appended):
+        '''The entries still to be added to a target. If the tool stopped while adding some of them (see record_attempt()),
+           rows_not_appended(position, rows) returns those of their rows that it doesn't find where they were being added; the
+           rest are skipped.'''
+
+        attempt = checkpoint['attempts'].pop(target, None)
+
+        if attempt is None:
+            return entries
+
+        attempted = [entry for entry in entries if entry['seq'] <= attempt['seq']]
+        missing = rows_not_appended(attempt['position'], [entry['row'] for entry in attempted]) if attempted else []
+
+        return [entry for entry in attempted if entry['row'] in missing] + entries[len(attempted):]
+
+    def export_master_if_due(self, timer, force=False):
+        '''Export the master workbook if the store has changed since it was, and MASTER_EXPORT_SECONDS have passed since the last
+           export (or force). Otherwise the export is put off, and export_due_in() says when to try again.'''
+
+        if not force and time.monotonic() - self.last_export < MASTER_EXPORT_SECONDS:
+            self.export_deferred = self.export_deferred or self.master_store.workbook_is_stale()
+            return
+
+        if self.master_store.workbook_is_stale():
+            self.export_until_current(self.master_store.export_workbook)
+            timer.lap('master file')
+
+        self.last_export = time.monotonic()
+        self.export_deferred = False
+
+    def export_due_in(self):
+        '''Seconds until a put-off export of the master workbook is due (0 if it's overdue), or None if none was put off.'''
+
+        if not self.export_deferred:
+            return None
+
+        return max(0.0, self.last_export + MASTER_EXPORT_SECONDS - time.monotonic())
+
+    def merge_into_monthly_file(self, path, rows, before_write=None):
+        '''Add rows to a monthly file that other workstations may be writing to. The file is read and the new workbook is built
+           without holding the lock. Then, holding the lock, it's only written if the file is still the version that was read.
+           If another workstation wrote it in the meantime, the rows are merged into the new version and it's tried again.
+           before_write, if given, is called with the number of rows the file held just before it's written.'''
+
+        for attempt in range(CONFLICT_ATTEMPTS):
+            signature = DataFrameCache.signature(path)
+
+            monthly_rows = RowAccumulator(INCIDENT_COLUMNS, untyped_incident_dataframe(load_incident_dataframe(path)))
+            position = len(monthly_rows)
+            monthly_rows.extend(rows)
+            data, content_checksum = render_incident_workbook(monthly_rows)
+
+            with self.shared_lock:
+                if DataFrameCache.signature(path) == signature:
+                    if before_write is not None:
+                        before_write(position)
+                    write_file_atomically(path, data)
+                    MONTHLY_CACHE.put(path, monthly_rows)
+                    return
+
+            self.conflicts += 1
+            backoff(attempt)
+
+        raise WriteConflictError('The monthly file kept being changed by other workstations: ' + path)
+
+    def export_until_current(self, export):
+        '''Exports are built from the store, which other workstations add to. If a row was added while exporting, another
+           workstation may have exported before us, so export again until the store didn't change during the export.'''
+
+        for attempt in range(CONFLICT_ATTEMPTS):
+            version = self.master_store.version()
+            export()
+
+            if self.master_store.version() == version:
+                return
+
+            self.conflicts += 1
+            backoff(attempt)
+
+        raise WriteConflictError('The master store kept being changed by other workstations while exporting.')
+
+
+class SubmissionWriter:
+    '''Background thread that does the slow part of a Submit, so the window never waits on the network share. Each submitted row
+       (already in the journal) is queued; the thread writes it to the incident log, then compacts the journal into the Excel files. Rows
+       queued while it's busy are handled together in the next batch. The outcome of each batch, and how long each stage of it
+       took, is put on the results queue, which the window polls with after(), since Tk widgets can only be touched from the main thread. If a save fails, the
+       entries stay in the journal and the thread tries again after SAVE_RETRY_SECONDS. If the compactor put off exporting the
+       master workbook, the thread wakes up to export it when it's due, and exports it before stopping.'''
+
+    STOP = 'stop'
+
+    def __init__(self, compactor, log_row=None, timings=None):
+
+        self.compactor = compactor
+        self.log_row = log_row
+        # Where to record how long each stage of each batch took, if anywhere (a SubmitTimings)
+        self.timings = timings
+        self.submissions = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+
+        self.thread.start()
+
+    def submit(self, row, stages=None):
+        '''Queue a row to be saved. stages, if given, are how long each stage of the Submit in the window took; they're recorded
+           in the submit timings file here, so the window never waits on writing it.'''
+
+        self.submissions.put((row, stages))
+
+    def request_compaction(self):
+        '''Compact without a new row, e.g. to replay entries left in the journal when the tool was last closed.'''
+
+        self.submissions.put(None)
+
+    def stop(self):
+        '''Finish everything queued, then stop the thread.'''
+
+        self.submissions.put(self.STOP)
+        self.thread.join()
+
+    def run(self):
+
+        failed = False
+
+        while True:
+            timeout = SAVE_RETRY_SECONDS if failed else self.compactor.export_due_in()
+
+            try:
+                batch = [self.submissions.get(timeout=timeout)]
+            except queue.Empty:
+                batch = [None]
+
+            while True:
+                try:
+                    batch.append(self.submissions.get_nowait())
+                except queue.Empty:
+                    break
+
+            submitted = [item for item in batch if isinstance(item, tuple)]
+            rows = [row for row, stages in submitted]
+
+            if self.timings is not None:
+                for row, stages in submitted:
+                    if stages:
+                        self.timings.append('submit', stages)
+
+            timer = StageTimer()
+
+            if self.log_row is not None:
+                for row in rows:
+                    try:
+                        self.log_row(row, timer)
+                    except:
+                        pass
+
+            try:
+                compacted = self.compactor.compact(timer, export_master=self.STOP in batch)
+                self.results.put(('committed', len(rows), None, timer.stages))
+                failed = False
+            except Exception as error:
+                compacted = None
+                self.results.put(('failed', len(rows), str(error), timer.stages))
+                failed = True
+
+            if self.timings is not None and (rows or compacted != 0):
+                self.timings.append('save', timer.stages, len(rows), 'saved' if compacted is not None else 'failed')
+
+            if self.STOP in batch:
+                return
+
+
+##########################################################################################################
+# SUBMIT TIMINGS: how long each stage of a Submit took, kept so "Submit took forever" can be looked into
+
+class StageTimer:
+    '''Times stages that run one after another: lap(stage) adds the time since the last lap (or since the timer was made) to
+       that stage. Costs a perf_counter() call and a dictionary update per stage, so it's always on.'''
+
+    def __init__(self):
+
+        self.stages = {}
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+
+class SubmitTimings:
+    '''The stage timings of the most recent Submits, one line of JSON each, in a file on this computer. There are three kinds
+       of record: 'submit', the stages run in the window when Submit is clicked; 'save', the stages the background writer ran to
+       save a batch of submitted rows; and 'copy', the copy of the master file made after a save. Once the file holds twice
+       keep_records records, it's rewritten with the newest keep_records, so it stays small without being rewritten every time.'''
+
+    # The stages, in the order they run
+    STAGES = ['validation', 'journal write', 'incident log', 'log cleanup', 'journal read', 'master store', 'rollups',
+              'search index', 'monthly file', 'master file', 'journal cleanup', 'master copy']
+
+    def __init__(self, path, keep_records=None):
+
+        self.path = path
+        self.keep_records = keep_records or MAX_SUBMIT_TIMINGS
+        self.lock = threading.Lock()
+        # Counted on the first append
+        self.records = None
+
+    def append(self, kind, stages, rows=1, outcome='saved'):
+        '''Record how long each stage took, in milliseconds. Never raises: losing a timing mustn't lose a Submit.'''
+
+        record = {'time': str(datetime.now())[0:19], 'kind': kind, 'rows': rows, 'outcome': outcome,
+                  'stages': {stage: round(milliseconds, 2) for stage, milliseconds in stages.items()}}
+
+        try:
+            with self.lock:
+                if self.records is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    self.records = len(self.read())
+
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(record) + '\n')
+
+                self.records += 1
+
+                if self.records >= 2 * self.keep_records:
+                    kept = self.read()[-self.keep_records:]
+                    write_file_atomically(self.path, ''.join(json.dumps(kept_record) + '\n'
+                                                             for kept_record in kept).encode('utf-8'))
+                    self.records = len(kept)
+        except:
+            pass
+
+    def read(self):
+        '''Every record kept, oldest first. A line only partly written is skipped.'''
+
+        records = []
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+
+        return records
+
+    def summary(self, last=None):
+        '''For each stage, over the last records of each kind (or all of them, if last is None): how many times it ran, and
+           the median (p50), 95th percentile (p95) and longest time it took, in milliseconds.'''
+
+        by_kind = {}
+
+        for record in self.read():
+            by_kind.setdefault(record['kind'], []).append(record)
+
+        times = {}
+
+        for records in by_kind.values():
+            for record in records[-last:] if last else records:
+                for stage, milliseconds in record['stages'].items():
+                    times.setdefault(stage, []).append(milliseconds)
+
+        summary_rows = []
+
+        for stage in self.STAGES + sorted(set(times) - set(self.STAGES)):
+            if stage in times:
+                ordered = sorted(times[stage])
+                summary_rows.append({'Stage': stage, 'Count': len(ordered),
+                                     'p50 (ms)': ordered[math.ceil(len(ordered) * 50 / 100) - 1],
+                                     'p95 (ms)': ordered[math.ceil(len(ordered) * 95 / 100) - 1],
+                                     'Max (ms)': ordered[-1]})
+
+        return summary_rows
+
+
+##########################################################################################################
+# INCIDENT LOG
+
+# The columns on a receipt, before the notes, in order
+RECEIPT_COLUMNS = ['Date', 'Shift', 'Call Received Time', 'Arrival Time', 'Completion Time', 'Service Call Type',
+                   'Physical Intervention', 'Restraint Used', 'Police Involved', 'Requested By', 'Contact Information']
+RECEIPT_HEADER = '  Below is the information for the record submitted on: '
+
+
+def format_receipt(row, submitted):
+    '''The readable copy of a submitted row, as each incident's text file used to contain.'''
+
+    receipt = '\n' + RECEIPT_HEADER + submitted + '\n'
+
+    for column in RECEIPT_COLUMNS:
+        receipt += ('\n  ' + column + ': ').ljust(28) + row[column]
+
+    receipt += '\n\n  Notes:'.ljust(28) + '\n\n   ' + row['Notes'].replace('\n', '\n   ')
+
+    return receipt
+
+
+def parse_receipt(text):
+    '''The (submitted, row) a receipt was made from (see format_receipt()), e.g. from one of the text files the tool used to
+       write for each incident, or None if it can't be read. Columns that aren't on a receipt are left blank.'''
+
+    lines = text.split('\n')
+
+    if len(lines) < 17 or not lines[1].startswith(RECEIPT_HEADER):
+        return None
+
+    row = dict.fromkeys(INCIDENT_COLUMNS, '')
+
+    for line, column in zip(lines[3:], RECEIPT_COLUMNS):
+        label = ('  ' + column + ': ').ljust(27)
+
+        if not line.startswith(label):
+            return None
+
+        row[column] = line[len(label):]
+
+    if lines[15].rstrip() != '  Notes:':
+        return None
+
+    row['Notes'] = '\n'.join(line[3:] for line in lines[17:])
+
+    return lines[1][len(RECEIPT_HEADER):], row
+
+
+class IncidentLog:
+    '''Log of every submitted row, replacing the text file per incident. Each row is appended to this computer's log file as a
+       line of JSON, with the time it was submitted. Every segment_records rows, the file is compressed into the next numbered
+       segment, and the segment that takes the log past keep_records rows is deleted, by name; the folder is only listed once,
+       to find the last segment number. format_receipt() turns a logged row back into the readable receipt. The text files
+       the log replaces are moved into it when it's first made.'''
+
+    def __init__(self, path_prefix, segment_records=None, keep_records=None):
+
+        self.path_prefix = path_prefix
+        self.path_current = path_prefix + '.jsonl'
+        self.segment_records = segment_records or LOG_SEGMENT_RECORDS
+        self.keep_records = keep_records or MAX_TEXT_FILES
+        self.lock = threading.Lock()
+        # Found on the first append
+        self.current_records = None
+        self.last_segment = None
+
+    def segment_path(self, number):
+
+        return self.path_prefix + '.' + str(number).zfill(6) + '.jsonl.gz'
+
+    def find_position(self):
+        '''Count the rows in the current file, and find the number of the last segment.'''
+
+        try:
+            with open(self.path_current, 'rb') as file:
+                self.current_records = sum(1 for line in file)
+        except OSError:
+            self.current_records = 0
+
+        folder, prefix = os.path.split(self.path_prefix)
+        numbers = [int(file_name[len(prefix) + 1:-9]) for file_name in listdir(folder or '.')
+                   if file_name.startswith(prefix + '.') and file_name.endswith('.jsonl.gz')
+                   and file_name[len(prefix) + 1:-9].isdigit()]
+
+        self.last_segment = max(numbers, default=0)
+
+    def append(self, row, timer=None):
+        '''Log a submitted row. Runs on the background writer thread. The time taken to write it, and to compress and delete
+           segments if it was time to, is added to timer (a StageTimer), if given.'''
+
+        timer = timer if timer is not None else StageTimer()
+
+        with self.lock:
+            if self.current_records is None:
+                os.makedirs(os.path.dirname(self.path_current) or '.', exist_ok=True)
+                self.find_position()
+
+                # The first time this computer's log is made, the text files it replaces are moved into it
+                if self.current_records == 0 and self.last_segment == 0:
+                    self.migrate_text_files()
+
+            with open(self.path_current, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'submitted': str(datetime.now())[0:19], 'row': row}) + '\n')
+
+            self.current_records += 1
+            timer.lap('incident log')
+
+            if self.current_records >= self.segment_records:
+                self.rotate()
+                timer.lap('log cleanup')
+
+    def migrate_text_files(self):
+        '''Move the text files the tool used to write for each incident, in the log's folder, into the current file, oldest
+           first, and delete them. A file that can't be read back (see parse_receipt()) is left where it is.'''
+
+        folder = os.path.dirname(self.path_prefix) or '.'
+        records = []
+
+        # The files are named after the time they were written, so they sort oldest first
+        for file_name in sorted(listdir(folder)):
+            if not file_name.endswith(' Incident Report Entry.txt'):
+                continue
+
+            path = join(folder, file_name)
+
+            try:
+                with open(path, 'r') as file:
+                    record = parse_receipt(file.read())
+
+                if record is None:
+                    continue
+
+                # Only logged by the computer that deletes it, if another is moving the same files into its own log
+                os.remove(path)
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            records.append(record)
+
+        if records:
+            with open(self.path_current, 'a', encoding='utf-8') as file:
+                for submitted, row in records:
+                    file.write(json.dumps({'submitted': submitted, 'row': row}) + '\n')
+
+            self.current_records += len(records)
+
+    def rotate(self):
+        '''Compress the current file into the next segment, and delete the segments no longer needed to keep keep_records rows.'''
+
+        number = self.last_segment + 1
+
+        with open(self.path_current, 'rb') as source, gzip.open(self.segment_path(number) + '.saving', 'wb') as target:
+            shutil.copyfileobj(source, target)
+
+        os.replace(self.segment_path(number) + '.saving', self.segment_path(number))
+        os.remove(self.path_current)
+
+        self.last_segment = number
+        self.current_records = 0
+
+        # Enough whole segments to hold keep_records rows, even with the current file empty
+        old_number = number - math.ceil(self.keep_records / self.segment_records)
+
+        while old_number > 0 and os.path.exists(self.segment_path(old_number)):
+            os.remove(self.segment_path(old_number))
+            old_number -= 1
+
+    @staticmethod
+    def read_folder(folder):
+        '''Every logged row kept in a folder, from every computer's log, as (submitted, row), oldest first.'''
+
+        records = []
+
+        # Segments sort before the file they were compressed from, so each computer's rows are read in order
+        for file_name in sorted(listdir(folder or '.')):
+            path = join(folder or '.', file_name)
+
+            if not file_name.startswith('Incident Log - '):
+                continue
+
+            if file_name.endswith('.jsonl.gz'):
+                file = gzip.open(path, 'rt', encoding='utf-8')
+            elif file_name.endswith('.jsonl'):
+                file = open(path, 'r', encoding='utf-8')
+            else:
+                continue
+
+            with file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                        records.append((record['submitted'], record['row']))
+                    except (ValueError, KeyError):
+                        continue
+
+        return sorted(records, key=lambda record: record[0])
+
+
+##########################################################################################################
+# DRAFTS
+
+class AutosaveFile:
+    '''The form as it was last autosaved, kept on this computer. The window hands over the latest snapshot (already serialized)
+       and carries on; a background thread writes it. If snapshots come faster than they are written, only the newest is
+       written. Clearing deletes the file, through the same thread so it can't be overtaken by an older write.'''
+
+    # Handed over instead of a snapshot to delete the file
+    CLEAR = b''
+
+    def __init__(self, path):
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = None
+        self.stopping = False
+        self.thread = None
+
+    def save(self, data):
+
+        with self.lock:
+            self.pending = data
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+        self.wake.set()
+
+    def clear(self):
+
+        self.save(self.CLEAR)
+
+    def load(self):
+        '''The autosaved form, or None if there isn't one (or it can't be read).'''
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def stop(self):
+        '''Write whatever is pending, then end the thread.'''
+
+        if self.thread is not None:
+            self.stopping = True
+            self.wake.set()
+            self.thread.join()
+            self.thread = None
+            self.stopping = False
+
+    def run(self):
+
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+
+            with self.lock:
+                data, self.pending = self.pending, None
+
+            try:
+                if data == self.CLEAR:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                elif data is not None:
+                    write_file_atomically(self.path, data)
+            except OSError:
+                pass
+
+            if self.stopping and self.pending is None:
+                return
+
+
+def format_draft_row(index_number, draft):
+    '''The fixed-width line listing a draft in the Saved Drafts window, under the header made in handle_topbox_listbox_creation.'''
+
+    row_string = ('(' + str(index_number) + ')').rjust(4)
+    # Identifying Information
+    row_string += '  ' + str(draft.get('Identifier', ''))[:12].ljust(15)
+    # Date
+    row_string += str(draft.get('Date', ''))[:5].ljust(9)
+    row_string += str(draft.get('Shift', '')).ljust(15)  # Shift
+    # Call Received Time
+    row_string += str(draft.get('Call Received Time', ''))[:10].ljust(15)
+    # Arrival Time
+    row_string += str(draft.get('Arrival Time', ''))[:7].ljust(10)
+    # Service Call Type
+    row_string += str(draft.get('Service Call Type', ''))[:17].ljust(20)
+    # Physical Intervention
+    row_string += str(draft.get('Physical Intervention', '')).ljust(17)
+    # Restraint Used
+    row_string += str(draft.get('Restraint Used', '')).ljust(17)
+    # Police Involved
+    row_string += str(draft.get('Police Involved', '')).ljust(17)
+    # Requested By
+    row_string += str(draft.get('Requested By', ''))[:10].ljust(15)
+    # Contact Information
+    row_string += str(draft.get('Contact Information', ''))[:13]
+
+    return row_string
+
+
+class DraftStore:
+    '''Saved drafts, one JSON file each in the drafts folder, named by a draft id that sorts in the order they were saved.
+       Saving, loading or deleting a draft only touches that draft's file, however many other drafts there are. Listing them
+       reads each small file. The first time the folder is used, drafts in the old drafts workbook are moved into it.'''
+
+    def __init__(self, folder, path_workbook=None):
+
+        self.folder = folder
+        self.path_workbook = path_workbook
+
+    def draft_path(self, draft_id):
+
+        return os.path.join(self.folder, draft_id + '.json')
+
+    @staticmethod
+    def new_draft_id(prefix=None):
+
+        return (prefix or datetime.now().strftime('%Y%m%d-%H%M%S-%f')) + '-' + uuid.uuid4().hex[:8]
+
+    def ensure_initialized(self):
+        '''Create the drafts folder, moving in any drafts from the old workbook. The folder is filled under a temporary name
+           and renamed into place, so if two workstations do this at once, only one set of drafts is kept.'''
+
+        if os.path.isdir(self.folder):
+            return
+
+        folder_creating = self.folder + '.' + uuid.uuid4().hex[:8] + '.creating'
+        os.makedirs(folder_creating)
+
+        if self.path_workbook and os.path.exists(self.path_workbook):
+            drafts_df = pd.read_excel(self.path_workbook, dtype=str).fillna('')
+
+            # Values in the workbook weren't validated, so a number typed into a time or the contact information can come
+            # back as a float (930.0)
+            for column in ('Call Received Time', 'Arrival Time', 'Completion Time', 'Contact Information'):
+                if column in drafts_df.columns:
+                    drafts_df[column] = drafts_df[column].str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+
+            for number, draft in enumerate(drafts_df.to_dict('records')):
+                # Sorts before every draft saved since, in the workbook's order
+                draft_id = self.new_draft_id('00000000-' + str(number).zfill(6))
+                write_file_atomically(os.path.join(folder_creating, draft_id + '.json'), json.dumps(draft).encode('utf-8'))
+
+        try:
+            os.rename(folder_creating, self.folder)
+        except OSError:
+            # Another workstation created the folder first
+            for file_name in listdir(folder_creating):
+                os.remove(join(folder_creating, file_name))
+            os.rmdir(folder_creating)
+
+    def draft_ids(self):
+        '''Every draft id, oldest first. Only the folder is listed; no draft is read.'''
+
+        self.ensure_initialized()
+
+        return sorted(file_name[:-5] for file_name in listdir(self.folder) if file_name.endswith('.json'))
+
+    def save(self, draft):
+        '''Save a new draft and return its id. If there are now more than MAX_DRAFTS, the oldest are deleted.'''
+
+        self.ensure_initialized()
+
+        draft_id = self.new_draft_id()
+        write_file_atomically(self.draft_path(draft_id), json.dumps(draft).encode('utf-8'))
+
+        for old_draft_id in self.draft_ids()[:-MAX_DRAFTS]:
+            self.delete(old_draft_id)
+
+        return draft_id
+
+    def load(self, draft_id):
+
+        with open(self.draft_path(draft_id), 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def delete(self, draft_id):
+        '''Delete a draft. It may already have been deleted, by another workstation submitting it.'''
+
+        try:
+            os.remove(self.draft_path(draft_id))
+        except FileNotFoundError:
+            pass
+
+    def list_drafts(self):
+        '''Every draft as (draft id, draft), oldest first. A draft deleted or unreadable while listing is left out.'''
+
+        drafts = []
+
+        for draft_id in self.draft_ids():
+            try:
+                drafts.append((draft_id, self.load(draft_id)))
+            except (OSError, ValueError):
+                continue
+
+        return drafts
+
+    def export_workbook(self, path):
+        '''Write every draft to one workbook, laid out as the old drafts file was.'''
+
+        rows = RowAccumulator(DRAFT_COLUMNS)
+        rows.extend(draft for draft_id, draft in self.list_drafts())
+
+        write_workbook(path, rows.iter_rows(), DRAFT_COLUMN_WIDTHS, 'Drafts')
+
+
+class App(tk.Tk):
+
+    def __init__(self):
+        '''The class initialization function first instantiates some data structures that are referenced later, like the list of
+           service call types. The errors dictionary below tracks the data validity when the Submit button is clicked. After
+           instantiation, functions are called that create the GUI elements, like labels, entry boxes, and buttons. Then, window
+           settings are set, and the image for the application icon is imported.'''
+
+        tk.Tk.__init__(self)
+
+        self.service_call_type_list = SERVICE_CALL_TYPES
+        # Ranks the search results; how often each type has been used is counted from the master in the background
+        self.service_call_type_index = ServiceCallTypeIndex(self.service_call_type_list)
+        # Types currently in the listbox, and the pending redraw of it while the user is typing
+        self.listed_service_call_types = []
+        self.search_after_id = None
+
+        self.errors = {'date': 1,
+                       'call_received': 1,
+                       'arrival_time': 1,
+                       'completion_time': 1,
+                       'service_call_type': 1, }
+
+        # Each time entered, read into minutes since midnight when it's validated, for working out the durations
+        self.entered_minutes = {'call_received': None,
+                                'arrival_time': None,
+                                'completion_time': None, }
+
+        # Submitted rows are written to the journal, then folded into the master store and the Excel files in the background
+        self.master_store = create_incident_store()
+        self.journal = IncidentJournal(PATH_JOURNAL, PATH_JOURNAL_CHECKPOINT)
+        self.search_index = IncidentSearchIndex(PATH_SEARCH_INDEX)
+        self.compactor = JournalCompactor(self.journal, self.master_store, rollups=IncidentRollups(PATH_ROLLUPS),
+                                          search_index=self.search_index)
+        self.incident_log = IncidentLog(PATH_LOGS + 'Incident Log - ' + socket.gethostname())
+        # How long each stage of each Submit takes, in the window and in the background
+        self.submit_timings = SubmitTimings(PATH_SUBMIT_TIMINGS)
+        self.writer = SubmissionWriter(self.compactor, self.incident_log.append, self.submit_timings)
+
+        if self.master_store.replicator is not None:
+            self.master_store.replicator.timings = self.submit_timings
+
+        # Submissions handed to the writer that it hasn't reported back on yet
+        self.submissions_pending = 0
+        self.save_failed = False
+        # Stage timings of the last save the writer reported, for the status line when SHOW_SUBMIT_TIMINGS is set
+        self.last_save_stages = None
+
+        self.months = MONTHS
+
+        self.handle_label_creation()
+        self.handle_radio_button_creation()
+        self.handle_entry_creation()
+        self.handle_listbox_creation()
+        self.handle_checkbox_creation()
+        self.handle_second_entry_creation()
+        self.handle_textbox_creation()
+        self.handle_second_checkbox_creation()
+        self.handle_button_creation()
+
+        # Drafts are kept one per file; the id of the draft opened, if any. If submitted, the draft will be deleted
+        self.draft_store = DraftStore(PATH_DRAFT_FOLDER, PATH_DRAFTS)
+        self.draft_opened_id = None
+
+        # The form is autosaved every AUTOSAVE_MS, if it changed. This is the last snapshot autosaved
+        self.autosave_file = AutosaveFile(PATH_AUTOSAVE)
+        self.last_autosave = None
+
+        # Window settings
+        self.resizable(False, False)
+        self.winfo_toplevel().title('Incident Entry Tool')
+        self.window = None  # This is to check later if a toplevel window already exists
+        self.search_window = None
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        self.bind('<F12>', self.show_cache_stats)
+        self.bind('<Control-f>', self.on_search_button)
+
+        try:
+            self.iconbitmap(PATH_IMAGE)
+        except:
+            pass
+
+        # Replay anything left in the journal by a crash or a failed save
+        self.writer.start()
+        self.writer.request_compaction()
+        self.after(SUBMISSION_POLL_MS, self.poll_submission_results)
+
+        # Once the window is drawn, import pandas, numpy and openpyxl in the background, so the first Submit doesn't wait on them
+        self.warm_up_thread = None
+        self.after_idle(self.warm_up_heavy_modules)
+
+        # Offer to restore an entry left by a crash, then start autosaving
+        self.after_idle(self.offer_autosave_recovery)
+
+    def warm_up_heavy_modules(self):
+        '''Start importing the heavy modules (and counting service call type use) on a background thread.'''
+
+        self.warm_up_thread = threading.Thread(target=self.warm_up, daemon=True)
+        self.warm_up_thread.start()
+
+    def warm_up(self):
+        '''Runs on the warm-up thread. Import the heavy modules, then count how often each service call type has been used, to
+           rank the search results. The counts are only a ranking hint, so the search works the same without them. Last, build
+           the incident search index from the master if this is the first time the tool has been run with it.'''
+
+        import_heavy_modules()
+
+        try:
+            self.service_call_type_index.set_usage_counts(self.master_store.service_call_type_counts())
+        except:
+            pass
+
+        try:
+            # Its own lock, as the compactor's can't be shared with another thread
+            self.search_index.ensure_built(self.master_store, LeaseLock(PATH_SHARED_LOCK))
+        except:
+            pass
+
+    def show_cache_stats(self, event=None):
+        '''F12 shows how often the monthly and master data were served from memory instead of being read from disk.'''
+
+        lines = []
+
+        for name, cache in (('Monthly files', MONTHLY_CACHE), ('Master store', MASTER_CACHE)):
+            stats = cache.stats()
+            lines.append(name + ': ' + str(stats['hits']) + ' from memory, ' + str(stats['misses']) + ' read from disk, ' +
+                         str(stats['cached']) + ' cached')
+
+        tk.messagebox.showinfo('Cache Statistics', '\n'.join(lines))
+
+    def handle_label_creation(self):
+        '''Create the text labels that accompany the widgets. Also, create some horizontal lines for aesthetics and spacing.'''
+
+        self.shift_label = tk.Label(self, font=('Calibri', 12), text='SHIFT:').grid(
+            row=0, column=0, pady=(10, 0))
+        self.date_label = tk.Label(self, font=(
+            'Calibri', 12), text='Date (mm/dd):').grid(row=2, column=0, sticky='e')
+        self.call_received_time_label = tk.Label(self, font=(
+            'Calibri', 12), text='Call Received (24hr.):').grid(row=3, column=0, sticky='e')
+        self.arrival_time_label = tk.Label(self, font=(
+            'Calibri', 12), text='Arrival Time (24hr.):').grid(row=4, column=0, sticky='e')
+        self.completion_time_label = tk.Label(self, font=(
+            'Calibri', 12), text='Completion Time (24hr.):').grid(row=5, column=0, sticky='e', padx=(10, 0))
+        self.service_call_type_label = tk.Label(self, font=(
+            'Calibri', 12), text='Service Call Type:').grid(row=7, column=0, padx=(17, 0))
+        self.physical_intervention_label = tk.Label(self, font=(
+            'Calibri', 12), text='Physical Intervention:').grid(row=9, column=0, sticky='e')
+        self.restraint_used_label = tk.Label(self, font=(
+            'Calibri', 12), text='Restraint Used:').grid(row=10, column=0, sticky='e')
+        self.police_involved_label = tk.Label(self, font=(
+            'Calibri', 12), text='Police Involved:').grid(row=11, column=0, sticky='e')
+        self.requested_by_label = tk.Label(self, font=('Calibri', 12), text='Requested By:').grid(
+            row=12, column=0, sticky='e', pady=(15, 0))
+        self.contact_information_label = tk.Label(self, font=(
+            'Calibri', 12), text='Contact Information:').grid(row=13, column=0, sticky='e')
+        self.notes_label = tk.Label(self, font=('Calibri', 14), text='Notes:').grid(
+            columnspan=2, row=14, pady=(15, 3))
+        self.completion_time = tk.Label(self, font=('Calibri', 11), text='Was Time From Call to Completion >24 Hours?').grid(
+            columnspan=2, row=17, column=0, sticky='w', padx=(20, 0), pady=(5, 3))
+
+        # Horizontal Lines
+        self.h_line = ttk.Separator(self, orient='horizontal')
+        self.h_line_2 = ttk.Separator(self, orient='horizontal')
+        self.h_line_3 = ttk.Separator(self, orient='horizontal')
+
+        self.h_line.grid(row=1, column=0, sticky='we',
+                         columnspan=2, pady=10, padx=12)
+        self.h_line_2.grid(row=6, column=0, sticky='we',
+                           columnspan=2, pady=10, padx=12)
+        self.h_line_3.grid(row=19, column=0, sticky='we',
+                           columnspan=2, pady=10, padx=12)
+
+    def handle_radio_button_creation(self):
+        '''Create the single set of radio buttons for selecting the shift.'''
+
+        self.var = tk.StringVar()
+        self.var.set('7:30 - 19:30')
+
+        self.date_morning_radio = tk.Radiobutton(
+            self, text='7:30 - 19:30', padx=20, variable=self.var, value='7:30 - 19:30')
+        self.date_morning_radio.grid(row=0, column=1, sticky='w', pady=(10, 0))
+
+        self.date_night_radio = tk.Radiobutton(
+            self, text='19:30 - 7:30', padx=20, variable=self.var, value='19:30 - 7:30')
+        self.date_night_radio.grid(
+            row=0, column=1, padx=(110, 0), pady=(10, 0))
+
+    def handle_entry_creation(self):
+        '''Create the first set of entry widgets, for date and the three times.'''
+
+        self.date_entry = tk.Entry(self, width=5)
+        self.date_entry.bind('<FocusOut>', self.focus_date_validation)
+        self.date_entry.grid(row=2, column=1)
+
+        self.call_received_entry = tk.Entry(self, width=5)
+        self.call_received_entry.bind(
+            '<FocusOut>', self.focus_call_received_validation)
+        self.call_received_entry.grid(row=3, column=1)
+
+        self.arrival_time_entry = tk.Entry(self, width=5)
+        self.arrival_time_entry.bind(
+            '<FocusOut>', self.focus_arrival_time_validation)
+        self.arrival_time_entry.grid(row=4, column=1)
+
+        self.completion_time_entry = tk.Entry(self, width=5)
+        self.completion_time_entry.bind(
+            '<FocusOut>', self.focus_completion_time_validation)
+        self.completion_time_entry.grid(row=5, column=1)
+
+    def handle_second_entry_creation(self):
+        '''Create the two non-validated entry fields for Requested By and Contact Information'''
+
+        self.requested_by_entry = tk.Entry(self, width=30)
+        self.requested_by_entry.grid(row=12, column=1, pady=(20, 0))
+
+        self.contact_information_entry = tk.Entry(self, width=30)
+        self.contact_information_entry.grid(row=13, column=1)
+
+    def handle_checkbox_creation(self):
+        '''Create the checkboxes for Physical Intervention, Restraint Used, and Police Involved.'''
+
+        self.physical_intervention_checkbox = ttk.Checkbutton(self, text='Yes')
+        self.physical_intervention_checkbox.grid(row=9, column=1)
+        self.physical_intervention_checkbox.state(['!alternate'])
+
+        self.restraint_used_checkbox = ttk.Checkbutton(self, text='Yes')
+        self.restraint_used_checkbox.grid(row=10, column=1)
+        self.restraint_used_checkbox.state(['!alternate'])
+
+        self.police_involved_checkbox = ttk.Checkbutton(self, text='Yes')
+        self.police_involved_checkbox.grid(row=11, column=1)
+        self.police_involved_checkbox.state(['!alternate'])
+
+    def handle_second_checkbox_creation(self):
+        '''Create the checkbox for the Over 24 Hour indicator.'''
+
+        self.time_over_24_hours_checkbox = ttk.Checkbutton(self, text='Yes')
+        self.time_over_24_hours_checkbox.grid(
+            columnspan=2, row=17, column=0, sticky='e', padx=(0, 45), pady=(5, 2))
+        self.time_over_24_hours_checkbox.state(['!alternate'])
+
+    def handle_textbox_creation(self):
+        '''Create the textbox for Notes.'''
+
+        self.notes_textbox = tk.Text(
+            self, font=('Calibri', 9), height=3, width=60)
+        self.notes_textbox.grid(columnspan=2, row=15, padx=10)
+
+    def handle_button_creation(self):
+        '''Create the Submit, Search Past Incidents, Save Draft, and Load Saved Entry buttons.'''
+
+        self.submit_button = tk.Button(self, font=(
+            'Arial', 16, 'bold'), text="SUBMIT", command=self.on_submit_button)
+        self.submit_button.grid(columnspan=2, row=16, pady=10)
+
+        self.search_button = tk.Button(self, font=(
+            'Arial', 9), fg='blue', text="Search Past Incidents (Ctrl+F)", command=self.on_search_button)
+        self.search_button.grid(columnspan=2, row=18, pady=(0, 10))
+
+        self.save_button = tk.Button(self, font=(
+            'Arial', 11), fg='blue', text="Save Draft and Exit", command=self.on_save_button)
+        self.save_button.grid(row=20, column=0, padx=(
+            10, 0), pady=(0, 10), sticky='w')
+
+        self.load_button = tk.Button(self, font=(
+            'Arial', 11), fg='blue', text="Load Saved Entry", command=self.on_load_button)
+        self.load_button.grid(row=20, column=1, padx=(
+            0, 10), pady=(0, 10), sticky='e')
+
+        # Shows whether submitted entries have been saved to the Excel files yet
+        self.status_label = tk.Label(self, font=('Calibri', 9), fg='grey', text='')
+        self.status_label.grid(columnspan=2, row=21, pady=(0, 5))
+
+        # Only shown while the copy of the master file (PATH_MASTER_COPY) is behind the master file
+        self.replica_label = tk.Label(self, font=('Calibri', 9), fg='red', text='')
+        self.replica_label.grid(columnspan=2, row=22)
+
+    def handle_listbox_creation(self):
+        '''Create the variable for the Entry field. Bind a function to it that updates the listbox based on the search query.
+           Create the Entry, and also a vertical scrollbar to use with the listbox. Bind a function to the listbox that will
+           validate the contents of the Entry field when focus leaves the listbox.'''
+
+        self.search_var = tk.StringVar()
+        # Bind function to the variable in the tray name entry field
+        self.search_var.trace('w', self.update_list)
+
+        self.service_call_type_entry = tk.Entry(
+            self, textvariable=self.search_var, width=30)
+        self.service_call_type_entry.grid(
+            row=7, column=1, padx=(5, 32))  # ENTRY WIDGET
+
+        self.scrollbar = tk.Scrollbar(self, orient='vertical')
+        self.scrollbar.grid(row=8, column=1, pady=10, sticky='nes')
+
+        self.service_call_type_listbox = tk.Listbox(
+            self, width=55, height=5, activestyle='none', yscrollcommand=self.scrollbar.set)
+        self.service_call_type_listbox.bind(
+            '<FocusOut>', self.focus_service_call_type_validation)
+        self.service_call_type_listbox.grid(
+            columnspan=2, row=8, padx=10, pady=(10, 15))
+
+        self.scrollbar.config(
+            command=self.service_call_type_listbox.yview)  # move two up
+
+        # Function for updating the list/doing the search. It needs to be called here to populate the listbox.
+        self.refresh_service_call_type_listbox()
+
+    def update_list(self, *args):
+        '''First, clear any background coloring of the Entry field. Then redraw the listbox once typing pauses: each keystroke
+           cancels the redraw scheduled by the one before.'''
+
+        self.service_call_type_entry.config(
+            {'background': 'White'})  # Reset the text box
+
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+
+        self.search_after_id = self.after(SEARCH_DEBOUNCE_MS, self.refresh_service_call_type_listbox)
+
+    def refresh_service_call_type_listbox(self):
+        '''Search the index for the Entry field query. Only the listbox entries after the first one that differs from the
+           new results are deleted and re-inserted.'''
+
+        self.search_after_id = None
+
+        matches = self.service_call_type_index.search(self.search_var.get())
+
+        unchanged = 0
+        for listed, match in zip(self.listed_service_call_types, matches):
+            if listed != match:
+                break
+            unchanged += 1
+
+        self.service_call_type_listbox.delete(unchanged, 'end')
+
+        if matches[unchanged:]:
+            self.service_call_type_listbox.insert('end', *['  ' + item for item in matches[unchanged:]])
+
+        self.listed_service_call_types = matches
+
+    def flush_service_call_type_search(self):
+        '''If a redraw of the listbox is still waiting for typing to pause, do it now, before the listbox is read.'''
+
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.refresh_service_call_type_listbox()
+
+#########################################################################################################
+
+    def focus_date_validation(self, event=None):
+        '''See if the date can be parsed from the Entry field. If so, change the background color to green.
+           If the date can't be parsed, if the Entry is blank, make the background color white, otherwise red.'''
+
+        try:
+            datetime.strptime(self.date_entry.get().strip(), '%m/%d')
+            self.date_entry.config({'background': '#00cc2c'})
+        except:
+            if self.date_entry.get().strip() != '':
+                self.date_entry.config({'background': 'Red'})
+            else:
+                self.date_entry.config({'background': 'White'})
+
+    def focus_call_received_validation(self, event=None):
+        '''If the time can be read (see parse_time_entry: at least 4 characters, with or without a colon), make the background
+           color green. Otherwise, if the Entry is blank, make the background color white. If not blank, then make the
+           background color red.'''
+
+        try:
+            if parse_time_entry(self.call_received_entry.get()) is None:
+                raise Exception
+            self.call_received_entry.config({'background': '#00cc2c'})
+        except:
+            if self.call_received_entry.get().strip() != '':
+                self.call_received_entry.config({'background': 'Red'})
+            else:
+                self.call_received_entry.config({'background': 'White'})
+                self.call_received_entry.delete(0, 'end')
+
+    def focus_arrival_time_validation(self, event=None):
+        '''Same logic as above.'''
+
+        try:
+            if parse_time_entry(self.arrival_time_entry.get()) is None:
+                fail = 1/0
+            self.arrival_time_entry.config({'background': '#00cc2c'})
+        except:
+            if self.arrival_time_entry.get().strip() != '':
+                self.arrival_time_entry.config({'background': 'Red'})
+            else:
+                self.arrival_time_entry.config({'background': 'White'})
+                self.arrival_time_entry.delete(0, 'end')
+
+    def focus_completion_time_validation(self, event=None):
+        '''Same logic as above.'''
+
+        try:
+            if parse_time_entry(self.completion_time_entry.get()) is None:
+                fail = 1/0
+            self.completion_time_entry.config({'background': '#00cc2c'})
+        except:
+            if self.completion_time_entry.get().strip() != '':
+                self.completion_time_entry.config({'background': 'Red'})
+            else:
+                self.completion_time_entry.config({'background': 'White'})
+                self.completion_time_entry.delete(0, 'end')
+
+    def focus_service_call_type_validation(self, event=None):
+        '''If an item in the listbox is selected, insert it into the Entry field and set the background color to green.
+           Otherwise, if the entry field value matches an item in the service call type list or is blank, make the background green.
+           Otherwise, make the background red.'''
+
+        self.flush_service_call_type_search()
+
+        if self.service_call_type_listbox.get('active').strip() in self.service_call_type_list:
+            # Because when you delete tray_entry text, the 'anchor' becomes ''
+            temp_string = self.service_call_type_listbox.get('active').strip()
+            self.service_call_type_entry.delete(
+                0, 'end')  # This resets the 'anchor' text
+            self.service_call_type_entry.insert('end', ' ' + temp_string)
+            self.service_call_type_entry.config({"background": "#00cc2c"})
+
+        elif self.service_call_type_entry.get().strip() in self.service_call_type_list:
+            self.service_call_type_entry.config({"background": "#00cc2c"})
+
+        elif self.service_call_type_entry.get().strip() == '':
+            self.service_call_type_entry.config({"background": "White"})
+
+        else:
+            self.service_call_type_entry.config({"background": "Red"})
+
+#########################################################################################################
+
+    def date_validation(self, event=None):
+        '''See if the date can be parsed from the Entry field. If so, store it in a variable, and set the month for later.
+           Change the background color to green, and indicate that there is no error.
+           If the date can't be parsed, set the background color to red and leave the error marked in the dictionary.'''
+
+        try:
+            datetime.strptime(self.date_entry.get().strip(), '%m/%d')
+            # Make sure the date is in the proper format
+            entered_date = datetime.strptime(
+                self.date_entry.get().strip(), '%m/%d')
+            global MONTH_ENTERED
+            MONTH_ENTERED = self.months[str(entered_date.month)]
+
+            self.date_entry.config({'background': '#00cc2c'})
+            self.errors['date'] = 0
+        except:
+            self.date_entry.config({'background': 'Red'})
+            self.errors['date'] = 1
+
+    def call_received_validation(self, event=None):
+        '''Read the time into minutes since midnight, once (see parse_time_entry: at least 4 characters, with or without a colon),
+           and keep it for the durations. If valid, set the background color to green and set the errors dictionary value to 0.
+           If not valid, change the background color to red and set an error.'''
+
+        self.entered_minutes['call_received'] = parse_time_entry(self.call_received_entry.get())
+
+        if self.entered_minutes['call_received'] is not None:
+            self.call_received_entry.config({'background': '#00cc2c'})
+            self.errors['call_received'] = 0
+        else:
+            self.call_received_entry.config({'background': 'Red'})
+            self.errors['call_received'] = 1
+
+    def arrival_time_validation(self, event=None):
+        '''Same logic as above.'''
+
+        self.entered_minutes['arrival_time'] = parse_time_entry(self.arrival_time_entry.get())
+
+        if self.entered_minutes['arrival_time'] is not None:
+            self.arrival_time_entry.config({'background': '#00cc2c'})
+            self.errors['arrival_time'] = 0
+        else:
+            self.arrival_time_entry.config({'background': 'Red'})
+            self.errors['arrival_time'] = 1
+
+    def completion_time_validation(self, event=None):
+        '''Same logic as above.'''
+
+        self.entered_minutes['completion_time'] = parse_time_entry(self.completion_time_entry.get())
+
+        if self.entered_minutes['completion_time'] is not None:
+            self.completion_time_entry.config({'background': '#00cc2c'})
+            self.errors['completion_time'] = 0
+        else:
+            self.completion_time_entry.config({'background': 'Red'})
+            self.errors['completion_time'] = 1
+
+    def service_call_type_validation(self, event=None):
+        '''If an item in the listbox is selected, insert it into the Entry field and set the background color to green. Clear the error.
+           Otherwise, if the entry field value matches an item in the service call type list, make the background green and clear the error.
+           Otherwise, make the background red and set an error.'''
+
+        self.flush_service_call_type_search()
 
         if self.service_call_type_listbox.get('active').strip() in self.service_call_type_list:
             # Because when you delete tray_entry text, the 'anchor' becomes ''
@@ -379,686 +3330,1498 @@ class App(tk.Tk):
                 0, 'end')  # This resets the 'anchor' text
             self.service_call_type_entry.insert('end', ' ' + temp_string)
             self.service_call_type_entry.config({"background": "#00cc2c"})
+            self.errors['service_call_type'] = 0
+
+        elif is_valid_service_call_type(self.service_call_type_entry.get()):
+            self.service_call_type_entry.config({"background": "#00cc2c"})
+            self.errors['service_call_type'] = 0
+
+        else:
+            self.service_call_type_entry.config({"background": "Red"})
+            self.errors['service_call_type'] = 1
+
+##########################################################################################################
+
+    def get_checkbox_answers(self):
+        '''Preset the answers to be 'No'. The Checkboxes' state returns a tuple. 'selected' can be in index 0 or 1.
+           It depends on whether it is in focus. So, check at both tuple indices.'''
+
+        self.physical_intervention_answer = 'No'
+        self.restraint_used_answer = 'No'
+        self.police_involved_answer = 'No'
+        self.time_over_24_hours_answer = 'No'
+
+        try:
+            # Output will be one of: (), ('focus'), ('selected'), or ('focus', 'selected')
+            if (self.physical_intervention_checkbox.state()[0] == 'selected' or self.physical_intervention_checkbox.state()[1] == 'selected'):
+                self.physical_intervention_answer = 'Yes'
+        except:
+            pass
+
+        try:
+            if (self.restraint_used_checkbox.state()[0] == 'selected' or self.restraint_used_checkbox.state()[1] == 'selected'):
+                self.restraint_used_answer = 'Yes'
+        except:
+            pass
+
+        try:
+            if (self.police_involved_checkbox.state()[0] == 'selected' or self.police_involved_checkbox.state()[1] == 'selected'):
+                self.police_involved_answer = 'Yes'
+        except:
+            pass
+
+        try:
+            if (self.time_over_24_hours_checkbox.state()[0] == 'selected' or self.time_over_24_hours_checkbox.state()[1] == 'selected'):
+                self.time_over_24_hours_answer = 'Yes'
+        except:
+            pass
+
+    def format_date(self):
+        '''Ensures that the entered date has a '/' inside it.'''
+
+        month_substring, date_substring = self.date_entry.get().strip().split('/')
+
+        if len(month_substring) == 1:
+            month_substring = '0' + month_substring
+
+        if len(date_substring) == 1:
+            date_substring = '0' + date_substring
+
+        return (CURRENT_YEAR + '/' + month_substring + '/' + date_substring)
+
+    def format_time(self, time):
+        '''Adds a colon to the entered time if not present.'''
+
+        return format_time(time)
+
+    def get_time_difference_numeric(self, minutes_1, minutes_2, unit, check_24=None):
+        '''Find the difference in seconds between two times, as read into minutes since midnight when they were validated. Based
+           on the unit specified, calculate the time difference and return it.'''
+
+        seconds = duration_minutes(minutes_1, minutes_2) * 60
+
+        if unit == 'seconds':
+            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
+                return str(seconds + 86400)
+            else:
+                return str(seconds)
+        elif unit == 'minutes':
+            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
+                return str(round(seconds/60) + 1440)
+            else:
+                return str(round(seconds/60))
+        elif unit == 'hours':
+            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
+                return str(round(seconds/3600, 1) + 24)
+            else:
+                return str(round(seconds/3600, 1))
+
+    def get_time_difference(self, minutes_1, minutes_2, check_24=None):
+        '''Find the minutes between two times, as read into minutes since midnight when they were validated. Possibly add 24 hours
+           (check_24: time from call to arrival isn't increased by 24), and write it out as hours and minutes. The wording is the same
+           as compute_duration_columns() gives when the columns are repaired in bulk.'''
+
+        minutes = duration_minutes(minutes_1, minutes_2, (self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes'))
+
+        return format_duration(minutes)
+
+    def append_row_to_df(self):
+        '''Get validated entry values, and write the row to the journal. It is folded into the monthly file, the master store and the
+           master workbook by the compactor, so nothing needs to be loaded or saved here. The durations are worked out from the
+           times as they were read when validated, so no time is parsed again.'''
+
+        call_received = self.entered_minutes['call_received']
+        arrival = self.entered_minutes['arrival_time']
+        completion = self.entered_minutes['completion_time']
+
+        self.row_to_append = {
+            'Date': self.format_date(),
+            'Time Entered': str(datetime.now())[0:16],
+            'Shift': self.var.get(),
+            'Call Received Time': self.format_time(self.call_received_entry.get().strip()),
+            'Arrival Time': self.format_time(self.arrival_time_entry.get().strip()),
+            'Completion Time': self.format_time(self.completion_time_entry.get().strip()),
+            'Service Call Type': self.service_call_type_entry.get().strip(),
+            'Physical Intervention': self.physical_intervention_answer,
+            'Restraint Used': self.restraint_used_answer,
+            'Police Involved': self.police_involved_answer,
+            'Requested By': self.requested_by_entry.get().strip(),
+            'Contact Information': self.contact_information_entry.get().strip(),
+            'Notes': self.notes_textbox.get('1.0', 'end-1c'),
+            'Time Taken to Arrive': self.get_time_difference(call_received, arrival),
+            'Time Taken From Call to Completion': self.get_time_difference(call_received, completion, 'Yes'),
+            'Time Taken From Arrival to Completion': self.get_time_difference(arrival, completion, 'Yes'),
+            'Time Taken to Arrive (mins.)': self.get_time_difference_numeric(call_received, arrival, 'minutes'),
+            'Time Taken From Call to Completion (mins.)': self.get_time_difference_numeric(call_received, completion, 'minutes', 'Yes'),
+            'Time Taken From Arrival to Completion (mins.)': self.get_time_difference_numeric(arrival, completion, 'minutes', 'Yes')
+        }
+
+        self.journal.append(self.row_to_append)
+
+    def snapshot_form(self):
+        '''Get the current values of every widget, keyed by the draft columns (without the identifier).'''
+
+        self.get_checkbox_answers()
+
+        return {'Date': self.date_entry.get().strip(),
+                'Shift': self.var.get().strip(),
+                'Call Received Time': self.call_received_entry.get().strip(),
+                'Arrival Time': self.arrival_time_entry.get().strip(),
+                'Completion Time': self.completion_time_entry.get().strip(),
+                'Service Call Type': self.service_call_type_entry.get().strip(),
+                'Physical Intervention': self.physical_intervention_answer,
+                'Restraint Used': self.restraint_used_answer,
+                'Police Involved': self.police_involved_answer,
+                'Requested By': self.requested_by_entry.get().strip(),
+                'Contact Information': self.contact_information_entry.get().strip(),
+                'Notes': self.notes_textbox.get('1.0', 'end-1c'),
+                'Time Over 24 Hours': self.time_over_24_hours_answer
+                }
+
+    def form_is_blank(self, snapshot):
+        '''Nothing has been typed in (the shift and checkboxes don't count).'''
+
+        return all(snapshot[column] == '' for column in ('Date', 'Call Received Time', 'Arrival Time', 'Completion Time',
+                                                           'Service Call Type', 'Requested By', 'Contact Information', 'Notes'))
+
+    def autosave(self):
+        '''Snapshot the form, and if it changed since the last autosave, hand it to the autosave thread: serializing a dict of a
+           dozen strings is all the window does. A blank form (e.g. just after Submit) deletes the autosave. Runs every AUTOSAVE_MS.'''
+
+        try:
+            snapshot = self.snapshot_form()
+            data = AutosaveFile.CLEAR if self.form_is_blank(snapshot) else json.dumps(snapshot).encode('utf-8')
+
+            if data != self.last_autosave:
+                self.autosave_file.save(data)
+                self.last_autosave = data
+        except:
+            pass
+
+        self.after(AUTOSAVE_MS, self.autosave)
+
+    def offer_autosave_recovery(self):
+        '''If the app closed without clearing the autosave (a crash, or the computer was shut down), offer to put the entry back
+           in the form. Then start autosaving.'''
+
+        snapshot = self.autosave_file.load()
+
+        if snapshot:
+            if tk.messagebox.askyesno('Recover Entry', 'An entry was being typed when the program last closed unexpectedly.\n\n'
+                                                       'Would you like to restore it?'):
+                self.fill_form([snapshot.get(column, '') for column in DRAFT_COLUMNS])
+            else:
+                self.autosave_file.clear()
+
+        self.autosave()
+
+    def save_draft(self):
+        '''Get the values for all the columns to be saved. If none are blank, ask for information to later identify the draft.
+           If user clicked 'Ok', save it as a new draft. Only that draft's file is written.'''
+
+        # Check to make sure data has been entered before saving
+        self.row_to_append_saves_test = self.snapshot_form()
+
+        if self.form_is_blank(self.row_to_append_saves_test):
+
+            tk.messagebox.showinfo(
+                'Nothing to Save', 'To save a draft, you must have entered data.')
+            return True
+
+        else:
+
+            self.identifier_answer = simpledialog.askstring(
+                'Identifying Information', 'Please enter a Patient ID or patient name:')
+
+            if self.identifier_answer is not None:
+
+                self.row_to_append_saves = dict(self.row_to_append_saves_test, Identifier=self.identifier_answer.strip())
+
+                self.draft_store.save(self.row_to_append_saves)
+
+            else:
+                return True
+
+    def flush_journal(self):
+        '''Let the background writer finish everything queued. If the last save failed, the entries stay in the journal and are
+           replayed the next time the tool is opened.'''
+
+        self.writer.stop()
+
+        outcome = 'committed'
+
+        while not self.writer.results.empty():
+            outcome = self.writer.results.get()[0]
+
+        if outcome == 'failed':
+            tk.messagebox.showinfo(
+                'Export Error', 'The Excel files could not be updated. The submitted entries are kept and will be saved the next time the tool is opened.')
+
+        replicator = self.master_store.replicator
+
+        if replicator is not None:
+            replicator.wait()
+
+            if replicator.is_stale():
+                tk.messagebox.showinfo(
+                    'Copy Error', 'The copy of the Master file could not be updated:\n\n' + str(replicator.error))
+
+    def poll_submission_results(self):
+        '''Check what the background writer has finished since the last poll, update the status line, and report a failed save
+           (once, until a save succeeds again). Then check again after SUBMISSION_POLL_MS.'''
+
+        while not self.writer.results.empty():
+            outcome, count, error, stages = self.writer.results.get()
+            self.submissions_pending = max(self.submissions_pending - count, 0)
+
+            if outcome == 'committed':
+                self.save_failed = False
+
+                if count:
+                    self.last_save_stages = stages
+
+            elif not self.save_failed:
+                self.save_failed = True
+                tk.messagebox.showinfo('Save Error', 'The entry was kept on this computer, but the Excel files could not be updated:\n\n' +
+                                       error + '\n\nIt will be saved automatically when the files are available.')
+
+        if self.submissions_pending > 0:
+            self.status_label.config(fg='grey', text='Saving ' + str(self.submissions_pending) +
+                                     (' entry...' if self.submissions_pending == 1 else ' entries...'))
+        elif self.save_failed:
+            self.status_label.config(fg='red', text='Entries are kept on this computer but not yet saved to the Excel files. Retrying...')
+        elif self.status_label.cget('text') != '':
+            self.status_label.config(fg='grey', text='All entries saved.' + self.describe_last_save())
+
+        replicator = self.master_store.replicator
+
+        if replicator is not None and replicator.status == 'failed':
+            self.replica_label.config(text='The copy of the Master file is out of date: ' + str(replicator.error))
+        elif replicator is not None and replicator.is_stale():
+            self.replica_label.config(text='Updating the copy of the Master file...')
+        else:
+            self.replica_label.config(text='')
+
+        self.after(SUBMISSION_POLL_MS, self.poll_submission_results)
+
+    def describe_last_save(self):
+        '''If SHOW_SUBMIT_TIMINGS is set, how long the last save took, and its slowest stage, for the status line.'''
+
+        if not SHOW_SUBMIT_TIMINGS or not self.last_save_stages:
+            return ''
+
+        slowest = max(self.last_save_stages, key=self.last_save_stages.get)
+
+        return (' Last save took ' + str(round(sum(self.last_save_stages.values()))) + ' ms (' + slowest + ': ' +
+                str(round(self.last_save_stages[slowest])) + ' ms).')
+
+    def reset_radio_buttons(self):
+
+        self.var.set('7:30 - 19:30')
+
+    def reset_checkboxes(self):
+        '''Uncheck all Checkboxes.'''
+
+        self.physical_intervention_checkbox.state(['!selected'])
+        self.restraint_used_checkbox.state(['!selected'])
+        self.police_involved_checkbox.state(['!selected'])
+        self.time_over_24_hours_checkbox.state(['!selected'])
+
+    def reset_entries(self):
+        '''Reset all widgets, and also reset their colors.'''
+
+        self.date_entry.delete(0, 'end')
+        self.date_entry.config({'background': 'White'})
+
+        self.call_received_entry.delete(0, 'end')
+        self.call_received_entry.config({'background': 'White'})
+
+        self.arrival_time_entry.delete(0, 'end')
+        self.arrival_time_entry.config({'background': 'White'})
+
+        self.completion_time_entry.delete(0, 'end')
+        self.completion_time_entry.config({'background': 'White'})
+
+        self.service_call_type_entry.delete(0, 'end')
+        self.service_call_type_entry.config({'background': 'White'})
+
+        self.requested_by_entry.delete(0, 'end')
+
+        self.contact_information_entry.delete(0, 'end')
+
+        self.notes_textbox.delete('1.0', 'end')
+
+    def on_submit_button(self):
+        '''Run validation functions on the Entry fields. If none have an error, get the checkbox answers, and run a function that
+           writes the currently entered values to the journal. Hand the row to the background writer, which saves the Excel files
+           and the text log without holding up the window. Reset all the widgets. If the record submitted was an imported draft, delete
+           that draft's file. Reset the draft id to None as was initialized. Draft id is only not None when Select button
+           function runs. Show a submission confirmation. How long validating and writing the journal took is handed to the
+           writer with the row, which records it in the submit timings file along with the stages it runs.'''
+
+        timer = StageTimer()
+
+        self.date_validation()
+        self.call_received_validation()
+        self.arrival_time_validation()
+        self.completion_time_validation()
+        self.service_call_type_validation()
+
+        timer.lap('validation')
+
+        if sum(self.errors.values()) == 0:
+
+            self.get_checkbox_answers()
+            self.append_row_to_df()
+            timer.lap('journal write')
+            self.writer.submit(self.row_to_append, timer.stages)
+            self.service_call_type_index.record_use(self.row_to_append['Service Call Type'])
+            self.submissions_pending += 1
+            self.status_label.config(fg='grey', text='Saving...')
+            self.reset_radio_buttons()
+            self.reset_checkboxes()
+            self.reset_entries()
+
+            if self.draft_opened_id is not None:
+                self.draft_store.delete(self.draft_opened_id)
+                self.draft_opened_id = None  # Reset so that nothing is deleted on next save
+
+            tk.messagebox.showinfo('Success', 'Entry Successfully Submitted!')
+
+    def on_save_button(self):
+        '''Run a function that saves the current entered values (and the 4 Checkboxes) as a draft if they are not all blank,
+           otherwise displays a Messagebox and returns True. Only if the former occurs, the program will terminate.'''
+
+        try:
+            check_if_empty = self.save_draft()
+        except:
+            tk.messagebox.showinfo('Save Error', 'The draft could not be saved to ' + PATH_DRAFT_FOLDER + '.')
+            return
+
+        if check_if_empty != True:
+            self.on_close()  # Close the app
+
+    def on_close(self):
+        '''Bring the Excel files up to date with the journal before closing the app. The app is closing normally (anything worth
+           keeping was submitted or saved as a draft), so delete the autosave.'''
+
+        self.flush_journal()
+        self.autosave_file.clear()
+        self.autosave_file.stop()
+        self.destroy()
+
+    def handle_topbox_listbox_creation(self):
+        '''Create a header string to display above the listbox, use it as text to a Label, create a Listbox, get the drafts,
+           and for each one, generate a fixed-width string of the values. Insert that string into the Listbox.'''
+
+        header_string = '      ' + \
+            'IDENTIFIER'.ljust(15) + 'DATE'.ljust(9) + \
+            'SHIFT'.ljust(15) + 'CALL RECEIVED'.ljust(15)
+        header_string += 'ARRIVAL'.ljust(10) + 'SERVICE CALL TYPE'.ljust(20)
+        header_string += 'PHYS. INTERV.'.ljust(
+            17) + 'RESTRAINT USED'.ljust(17) + 'POLICE INVOLVED'.ljust(17)
+        header_string += 'REQUESTED BY'.ljust(15) + 'CONTACT INFO.'
+
+        tk.Label(self.window, font=('Courier', 8), fg='blue',
+                 text=header_string).grid(row=1, padx=(0, 4))
+
+        self.top_lbox = tk.Listbox(self.window, font=(
+            'Courier', 8), width=170, height=10, activestyle='none')
+        self.top_lbox.grid(row=2, padx=(3, 0))
+
+        self.drafts = self.draft_store.list_drafts()
+
+        self.top_lbox.insert('end', *[format_draft_row(index_number, draft)
+                                      for index_number, (draft_id, draft) in enumerate(self.drafts, 1)])
+
+    def load_selected_draft(self):
+        '''Set all widgets according the the values of the draft list, and close the drafts window.'''
+
+        self.fill_form(self.row_to_insert)
+
+        self.window.destroy()
+
+    def fill_form(self, row_to_insert):
+        '''Set all widgets according to a list of values in the draft column order.'''
+
+        self.row_to_insert = row_to_insert
+
+        self.var.set(self.row_to_insert[2])  # Radio button
+
+        if self.row_to_insert[7] == 'Yes':
+            self.physical_intervention_checkbox.state(['selected'])
+        if self.row_to_insert[8] == 'Yes':
+            self.restraint_used_checkbox.state(['selected'])
+        if self.row_to_insert[9] == 'Yes':
+            self.police_involved_checkbox.state(['selected'])
+        if self.row_to_insert[13] == 'Yes':
+            self.time_over_24_hours_checkbox.state(['selected'])
+
+        # Drafts and the autosave are JSON, so the values are the text as it was typed. (The Excel clean-up of 'nan' and '.0' is
+        # done once, when drafts are moved out of the old workbook.)
+        self.row_to_insert = [str(x) for x in self.row_to_insert]
+
+        self.date_entry.insert('end', self.row_to_insert[1])
+        self.call_received_entry.insert('end', self.row_to_insert[3])
+        self.arrival_time_entry.insert('end', self.row_to_insert[4])
+        self.completion_time_entry.insert('end', self.row_to_insert[5])
+        self.service_call_type_entry.insert('end', self.row_to_insert[6])
+        self.requested_by_entry.insert('end', self.row_to_insert[10])
+        self.contact_information_entry.insert('end', self.row_to_insert[11])
+        self.notes_textbox.insert('end', self.row_to_insert[12])
+
+    def on_select_button(self):
+        '''If no row is selected, throw an error. Otherwise, get the selected draft, extract its values as a list in the draft
+           column order, store the id of the draft so it can be removed when submitted, reset the widgets, and fill with the list'''
+
+        try:
+            draft_id, draft = self.drafts[self.top_lbox.curselection()[0]]
+            self.row_to_insert = [draft.get(column, '') for column in DRAFT_COLUMNS]
+
+            # If submitted, this id will locate the draft to delete
+            self.draft_opened_id = draft_id
+
+            self.reset_radio_buttons()
+            self.reset_checkboxes()
+            self.reset_entries()
+            self.load_selected_draft()
+
+        except:
+            tk.messagebox.showinfo(
+                'Selection Error', 'Please select a draft.', parent=self.window)
+
+    def on_load_button(self):
+        '''See if there are any drafts (only the folder is listed). If not, FAIL. Otherwise, create a Toplevel window,
+           place the Select button, and run a function to create the listbox, which reads the drafts.'''
+
+        try:
+            if not self.draft_store.draft_ids():
+                fail = 1/0
+
+            if self.window is None or not self.window.winfo_exists():
+                self.window = tk.Toplevel()
+                self.window.wm_title('Saved Drafts')
+                self.window.wm_geometry('1200x224')
+                self.window.resizable(False, False)
+
+                self.select_button = tk.Button(self.window, font=(
+                    'Arial', 11, 'bold'), fg='blue', text='CLICK HERE to Import Selected Draft', command=self.on_select_button)
+                self.select_button.grid(
+                    row=0, padx=(3, 0), pady=10, sticky='we')
+
+                self.handle_topbox_listbox_creation()
+
+        except:
+            tk.messagebox.showinfo('No Drafts', 'There are no saved drafts.')
+
+
+    def on_search_button(self, event=None):
+        '''Open the incident search window, or bring it to the front if it's already open. Typing in any of the fields redoes
+           the search once typing pauses. The listbox only ever holds one page of SEARCH_PAGE_ROWS results; Previous and Next
+           read the page before or after it from the index.'''
+
+        if self.search_window is not None and self.search_window.winfo_exists():
+            self.search_window.lift()
+            return
+
+        self.search_window = tk.Toplevel()
+        self.search_window.wm_title('Search Past Incidents')
+        self.search_window.resizable(False, False)
+
+        self.incident_search_after_id = None
+        self.search_offset = 0
+        self.search_results = []
+
+        self.search_query_var = tk.StringVar()
+        self.search_from_var = tk.StringVar()
+        self.search_to_var = tk.StringVar()
+        self.search_shift_var = tk.StringVar()
+        self.search_shift_var.set('Both Shifts')
+
+        for variable in (self.search_query_var, self.search_from_var, self.search_to_var, self.search_shift_var):
+            variable.trace('w', self.update_incident_search)
+
+        filters = tk.Frame(self.search_window)
+        filters.grid(row=0, padx=3, pady=10, sticky='w')
+
+        tk.Label(filters, font=('Arial', 11), text='Search:').grid(row=0, column=0)
+        search_entry = tk.Entry(filters, textvariable=self.search_query_var, width=50)
+        search_entry.grid(row=0, column=1, padx=(5, 20))
+        tk.Label(filters, font=('Arial', 11), text='From (yyyy/mm/dd):').grid(row=0, column=2)
+        tk.Entry(filters, textvariable=self.search_from_var, width=12).grid(row=0, column=3, padx=(5, 10))
+        tk.Label(filters, font=('Arial', 11), text='To:').grid(row=0, column=4)
+        tk.Entry(filters, textvariable=self.search_to_var, width=12).grid(row=0, column=5, padx=(5, 20))
+        tk.OptionMenu(filters, self.search_shift_var, 'Both Shifts', '7:30 - 19:30', '19:30 - 7:30').grid(row=0, column=6)
+
+        header_string = '  ' + 'DATE'.ljust(12) + 'SHIFT'.ljust(15) + 'CALL RECEIVED'.ljust(15) + \
+            'SERVICE CALL TYPE'.ljust(30) + 'REQUESTED BY'.ljust(20) + 'CONTACT INFO.'.ljust(20) + 'NOTES'
+
+        tk.Label(self.search_window, font=('Courier', 8), fg='blue',
+                 text=header_string).grid(row=1, padx=(3, 0), sticky='w')
+
+        self.search_lbox = tk.Listbox(self.search_window, font=(
+            'Courier', 8), width=170, height=SEARCH_PAGE_ROWS // 2, activestyle='none')
+        self.search_lbox.grid(row=2, padx=(3, 0))
+        self.search_lbox.bind('<Double-Button-1>', self.show_search_result)
+
+        pages = tk.Frame(self.search_window)
+        pages.grid(row=3, pady=10)
+
+        self.search_previous_button = tk.Button(pages, font=('Arial', 11), fg='blue', text='< Previous',
+                                                command=lambda: self.on_search_page(-1))
+        self.search_previous_button.grid(row=0, column=0)
+        self.search_results_label = tk.Label(pages, font=('Calibri', 9), fg='grey', width=60, text='')
+        self.search_results_label.grid(row=0, column=1)
+        self.search_next_button = tk.Button(pages, font=('Arial', 11), fg='blue', text='Next >',
+                                            command=lambda: self.on_search_page(1))
+        self.search_next_button.grid(row=0, column=2)
+
+        search_entry.focus_set()
+        self.refresh_incident_search()
+
+    def update_incident_search(self, *args):
+        '''Go back to the first page, and redo the search once typing pauses.'''
+
+        self.search_offset = 0
+
+        if self.incident_search_after_id is not None:
+            self.search_window.after_cancel(self.incident_search_after_id)
+
+        self.incident_search_after_id = self.search_window.after(SEARCH_DEBOUNCE_MS, self.refresh_incident_search)
+
+    def refresh_incident_search(self):
+        '''Read the current page of results from the search index, and list them as fixed-width strings, newest first.'''
+
+        self.incident_search_after_id = None
+
+        start_date = self.search_from_var.get().strip() or '0000/00/00'
+        end_date = self.search_to_var.get().strip() or '9999/99/99'
+        shift = self.search_shift_var.get() if self.search_shift_var.get() != 'Both Shifts' else None
+
+        self.search_lbox.delete(0, 'end')
+        self.search_results = []
+
+        if not re.fullmatch(r'\d{4}/\d{2}/\d{2}', start_date) or not re.fullmatch(r'\d{4}/\d{2}/\d{2}', end_date):
+            self.search_results_label.config(text='Enter the dates as yyyy/mm/dd.')
+            total = 0
+
+        elif not os.path.exists(self.search_index.path):
+            self.search_results_label.config(text='The search index is still being built from the master file.')
+            total = 0
+
+        else:
+            started = time.perf_counter()
+
+            try:
+                total, self.search_results = self.search_index.search(
+                    self.search_query_var.get(), start_date, end_date, shift, SEARCH_PAGE_ROWS, self.search_offset)
+            except:
+                self.search_results_label.config(text='The search index could not be read.')
+                total = 0
+
+            else:
+                milliseconds = str(round((time.perf_counter() - started) * 1000))
+
+                if total:
+                    self.search_results_label.config(text='Incidents ' + str(self.search_offset + 1) + ' to ' + str(
+                        self.search_offset + len(self.search_results)) + ' of ' + str(total) + ' (' + milliseconds + ' ms)')
+                else:
+                    self.search_results_label.config(text='No incidents found (' + milliseconds + ' ms)')
+
+        for row in self.search_results:
+            row_string = '  ' + row['Date'].ljust(12) + row['Shift'].ljust(15) + row['Call Received Time'][:12].ljust(15)
+            row_string += row['Service Call Type'][:27].ljust(30) + row['Requested By'][:17].ljust(20)
+            row_string += row['Contact Information'][:17].ljust(20) + ' '.join(row['Notes'].split())[:60]
+
+            self.search_lbox.insert('end', row_string)
+
+        self.search_previous_button.config(state='normal' if self.search_offset > 0 else 'disabled')
+        self.search_next_button.config(state='normal' if self.search_offset + SEARCH_PAGE_ROWS < total else 'disabled')
+
+    def on_search_page(self, step):
+        '''Read the page before (step -1) or after (step 1) the one listed.'''
+
+        self.search_offset = max(0, self.search_offset + step * SEARCH_PAGE_ROWS)
+        self.refresh_incident_search()
+
+    def show_search_result(self, event=None):
+        '''Double-clicking a result shows the whole incident, as its receipt.'''
+
+        try:
+            row = self.search_results[self.search_lbox.curselection()[0]]
+            tk.messagebox.showinfo('Incident', format_receipt(row, row['Time Entered']), parent=self.search_window)
+        except:
+            pass
+
+
+##########################################################################################################
+# BULK IMPORT: incidents from old spreadsheets that never went through the entry window
+
+IMPORT_REQUIRED_COLUMNS = ['Date', 'Call Received Time', 'Arrival Time', 'Completion Time', 'Service Call Type']
+
+
+def read_import_file(path):
+    '''Read an old CSV or Excel incident log with every value as text, and blanks as ''.'''
+
+    if path.lower().endswith('.csv'):
+        dataframe = pd.read_csv(path, dtype=str, keep_default_na=False)
+    else:
+        dataframe = pd.read_excel(path, dtype=str, keep_default_na=False)
+
+    dataframe.columns = [str(column).strip() for column in dataframe.columns]
+
+    return dataframe
+
+
+def check_import_rows(file_name, first_line, records, default_year, time_entered):
+    '''Run a chunk of imported rows through the same checks as the entry window, and compute their durations as a Submit would.
+       Runs in an import process. Return the rows that passed, as incident rows, and the ones that didn't, with their problems.'''
+
+    accepted = []
+    # The call received, arrival and completion times of each accepted row, in minutes since midnight
+    accepted_times = []
+    over_24_hours = []
+    rejects = []
+
+    for line, record in enumerate(records, first_line):
+        record = {column: str(value).strip() for column, value in record.items()}
+        problems = []
+
+        date = parse_import_date(record.get('Date', ''), default_year)
+        if date is None:
+            problems.append('Date')
+
+        times = {}
+        for column in ('Call Received Time', 'Arrival Time', 'Completion Time'):
+            entered_time = record.get(column, '')
+            # Excel times are read as HH:MM:SS
+            if entered_time.count(':') == 2:
+                entered_time = entered_time[:-3]
+            minutes = parse_time_entry(entered_time)
+            if minutes is not None:
+                times[column] = minutes
+            else:
+                problems.append(column)
+
+        if not is_valid_service_call_type(record.get('Service Call Type', '')):
+            problems.append('Service Call Type')
+
+        # Rows from logs that didn't record it are given the time of the import
+        entered = parse_import_time_entered(record['Time Entered']) if record.get('Time Entered') else time_entered
+        if entered is None:
+            problems.append('Time Entered')
+
+        if problems:
+            rejects.append(dict(record, **{'File': file_name, 'Line': line, 'Problems': ', '.join(problems)}))
+            continue
+
+        row = {column: record.get(column, '') for column in INCIDENT_COLUMNS}
+        row.update({column: TIME_TEXT[minutes] for column, minutes in times.items()})
+        row['Date'] = date
+        row['Time Entered'] = entered
+
+        for column in ('Physical Intervention', 'Restraint Used', 'Police Involved'):
+            row[column] = 'Yes' if row[column].lower() in ('yes', 'y', 'true', '1') else 'No'
+
+        accepted.append(row)
+        accepted_times.append([times['Call Received Time'], times['Arrival Time'], times['Completion Time']])
+        over_24_hours.append(record.get('Time Over 24 Hours', '').lower() in ('yes', 'y', 'true', '1'))
+
+    if accepted:
+        accepted_df = pd.DataFrame(accepted, columns=INCIDENT_COLUMNS)
+        # Logs that never recorded the checkbox may still have a duration showing the call took over 24 hours
+        over_24_hours = np.array(over_24_hours) | infer_over_24_hours(accepted_df)
+        # The times were read into minutes when they were checked, so they aren't read again
+        accepted_times = np.array(accepted_times, dtype=float)
+        durations = compute_duration_columns(accepted_times[:, 0], accepted_times[:, 1], accepted_times[:, 2], over_24_hours)
+
+        for column, values in durations.items():
+            accepted_df[column] = values
+
+        accepted = accepted_df.to_dict('records')
+
+    return accepted, rejects
+
+
+def import_incidents(paths, master_store, shared_lock, default_year=CURRENT_YEAR, processes=None, path_rejects=None,
+                     dry_run=False, rollups=None, search_index=None):
+    '''Import old incident logs. The rows are checked in parallel, IMPORT_CHUNK_ROWS at a time, then written month by month: each
+       month's rows are added to the master store and its monthly file in one batch, and the master file is exported once at the
+       end. Rows that fail a check are written to path_rejects instead. Return the number of rows imported in each month (as
+       yyyy/mm, in order), or that would be if dry_run, and the number rejected.'''
+
+    time_entered = str(datetime.now())[0:16]
+    chunks = []
+
+    for path in paths:
+        dataframe = read_import_file(path)
+        missing = [column for column in IMPORT_REQUIRED_COLUMNS if column not in dataframe.columns]
+
+        if missing:
+            raise ValueError(path + ' is missing the column(s): ' + ', '.join(missing))
+
+        records = dataframe.to_dict('records')
+
+        # Line numbers as seen in Excel, below the header row
+        for start in range(0, len(records), IMPORT_CHUNK_ROWS):
+            chunks.append((os.path.basename(path), start + 2, records[start:start + IMPORT_CHUNK_ROWS], default_year, time_entered))
+
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        outcomes = pool.starmap(check_import_rows, chunks)
+
+    months = {}
+    rejects = []
+
+    for accepted, chunk_rejects in outcomes:
+        for row in accepted:
+            months.setdefault(row['Date'][:7], []).append(row)
+        rejects.extend(chunk_rejects)
+
+    if path_rejects is not None and rejects:
+        rejects_df = pd.DataFrame(rejects)
+        rejects_df = rejects_df[['File', 'Line', 'Problems'] + [column for column in rejects_df.columns
+                                                                  if column not in ('File', 'Line', 'Problems')]]
+        rejects_df.to_csv(path_rejects, index=False, encoding='utf-8')
+
+    imported = {month: len(months[month]) for month in sorted(months)}
+
+    if dry_run or not months:
+        return imported, len(rejects)
+
+    with shared_lock:
+        if not master_store.ensure_initialized():
+            raise FileNotFoundError('The Master file can not be found.')
+
+    # Only its monthly file merging and export retries are used here; there is no journal
+    compactor = JournalCompactor(None, master_store, shared_lock)
+
+    for month in sorted(months):
+        year, month_number = month[:4], month[5:7]
+
+        # Indexed under the same lock as the master, as the compactor does
+        with shared_lock:
+            master_store.append_rows(months[month])
+
+            if search_index is not None:
+                search_index.add_rows(months[month])
+
+        if rollups is not None:
+            rollups.add_rows(months[month])
+
+        if master_store.monthly_files_are_exports:
+            compactor.export_until_current(lambda: master_store.export_month(year, month_number))
+        else:
+            compactor.merge_into_monthly_file(monthly_file_path(year, MONTHS[str(int(month_number))]), months[month])
+
+    compactor.export_until_current(master_store.export_workbook)
+
+    return imported, len(rejects)
+
+
+##########################################################################################################
+# ANALYTICS: response time statistics for management
+
+def summarize_response_times(master_df, grouping):
+    '''Summarize the incidents in each group of the grouping column(s): the number of incidents, the given percentiles of the
+       three "(mins.)" columns (over the incidents that have them; they must already be numbers), and how many had each kind of
+       involvement (the involvement columns must already be booleans). Each statistic is a single groupby over the whole
+       dataframe; grouping on a category column only lists the values that occur.'''
+
+    keys = [master_df[column] for column in grouping]
+    groups = master_df[MINUTE_COLUMNS].groupby(keys, sort=True, observed=True)
+
+    summary = groups.size().to_frame('Incidents')
+
+    for column in MINUTE_COLUMNS:
+        name = column.replace(' (mins.)', '')
+        for percentile in REPORT_PERCENTILES:
+            summary[name + ' p' + str(percentile) + ' (mins.)'] = groups[column].quantile(percentile / 100).round(1)
+
+    involvement = master_df[INVOLVEMENT_COLUMNS].fillna(False).astype(int).groupby(keys, sort=True, observed=True).sum()
+
+    return summary.join(involvement).reset_index()
+
+
+def response_time_report(master_df):
+    '''The full report: one summary for all incidents, then by Service Call Type, by Shift and by month. The incidents are
+       typed once (if they weren't already), for all four; months are grouped as periods and only the groups are formatted.'''
+
+    master_df = typed_incident_dataframe(master_df, coerce=True)
+    master_df = master_df.assign(**{'All Incidents': 'All', 'Month': master_df['Date'].dt.to_period('M')},
+                                 **{column: master_df[column].astype(float) for column in MINUTE_COLUMNS})
+
+    by_month = summarize_response_times(master_df, ['Month'])
+    by_month['Month'] = by_month['Month'].dt.strftime('%Y/%m')
+
+    return {'Overall': summarize_response_times(master_df, ['All Incidents']),
+            'By Service Call Type': summarize_response_times(master_df, ['Service Call Type']),
+            'By Shift': summarize_response_times(master_df, ['Shift']),
+            'By Month': by_month}
+
+
+def write_report(sheets, path):
+    '''Write the report to a workbook with one worksheet per summary, or, for a .csv path, to one CSV file with the summaries
+       one after another and a column saying which summary each row is from.'''
+
+    if path.lower().endswith('.csv'):
+        combined = pd.concat([sheet.rename(columns={sheet.columns[0]: 'Group'}).assign(Summary=title)
+                              for title, sheet in sheets.items()], ignore_index=True)
+        combined = combined[['Summary'] + [column for column in combined.columns if column != 'Summary']]
+        write_file_atomically(path, combined.to_csv(index=False).encode('utf-8'))
+        return
+
+    workbook = openpyxl.Workbook(write_only=True)
+
+    for title, sheet in sheets.items():
+        worksheet = workbook.create_sheet(title)
+        worksheet.column_dimensions['A'].width = 40
+
+        for row in openpyxl_dataframe.dataframe_to_rows(sheet, index=False):
+            worksheet.append([None if pd.isna(value) else value for value in row])
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    write_file_atomically(path, buffer.getvalue())
+
+
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+
+def sketch_buckets(minutes):
+    '''Bucket of each time in a quantile sketch: 0 for zero minutes, otherwise i + 1 for times in (gamma^(i-1), gamma^i]. A
+       sketch is just the count in each bucket, so two sketches are merged by adding their counts.'''
+
+    minutes = np.asarray(minutes, dtype=float)
+
+    return np.where(minutes <= 0, 0,
+                    np.ceil(np.log(np.maximum(minutes, 1)) / np.log(SKETCH_GAMMA)).astype(np.int64) + 1)
+
+
+def sketch_quantile(sketch, fraction):
+    '''Approximate the quantile of the times counted in a sketch ({bucket: count}). None if the sketch is empty.'''
+
+    total = sum(sketch.values())
+
+    if total == 0:
+        return None
+
+    rank = fraction * (total - 1)
+    seen = 0
+
+    for bucket in sorted(sketch):
+        seen += sketch[bucket]
+        if seen > rank:
+            return 0.0 if bucket == 0 else round(2 * SKETCH_GAMMA ** (bucket - 1) / (SKETCH_GAMMA + 1), 1)
+
+
+class IncidentRollups:
+    '''Running totals of the incidents for each day, shift and service call type, in a small database next to the master. For
+       each group there is the number of incidents, the number with each kind of involvement, and for each "(mins.)" column the
+       count, sum and sum of squares of the times and a quantile sketch of them. Rows are added as they are saved, touching only
+       their own groups, so a summary reads the groups rather than every incident. rebuild() adds them up again from the master.'''
+
+    MEASURES = ['Incidents'] + MINUTE_COLUMNS + INVOLVEMENT_COLUMNS
+    GROUPINGS = {'day': 'day', 'month': 'substr(day, 1, 7)', 'shift': 'shift', 'service call type': 'service_call_type'}
+
+    def __init__(self, path):
+
+        self.path = path
+
+    def connect(self, path=None):
+
+        connection = sqlite3.connect(path or self.path, timeout=30)
+        connection.execute('CREATE TABLE IF NOT EXISTS rollups (day TEXT, shift TEXT, service_call_type TEXT, measure TEXT, '
+                           'count INTEGER, total REAL, sum_squares REAL, sketch TEXT, '
+                           'PRIMARY KEY (day, shift, service_call_type, measure))')
+        connection.execute(JOURNAL_SEQS_TABLE)
+        return connection
 
-        elif self.service_call_type_entry.get().strip() in self.service_call_type_list:
-            self.service_call_type_entry.config({"background": "#00cc2c"})
+    def aggregate(self, dataframe):
+        '''Add up rows into {(day, shift, service call type, measure): [count, sum, sum of squares, sketch]}, one groupby
+           per measure. The groups are keyed on the text the files hold, so typed rows are turned back into it first.'''
 
-        elif self.service_call_type_entry.get().strip() == '':
-            self.service_call_type_entry.config({"background": "White"})
+        dataframe = untyped_incident_dataframe(dataframe)
 
-        else:
-            self.service_call_type_entry.config({"background": "Red"})
+        keys = [dataframe['Date'].astype(str), dataframe['Shift'].astype(str), dataframe['Service Call Type'].astype(str)]
+        totals = {}
 
-#########################################################################################################
+        for key, count in dataframe.groupby(keys).size().items():
+            totals[key + ('Incidents',)] = [int(count), 0.0, 0.0, {}]
 
-    def date_validation(self, event=None):
-        '''See if the date can be parsed from the Entry field. If so, store it in a variable, and set the month for later.
-           Change the background color to green, and indicate that there is no error.
-           If the date can't be parsed, set the background color to red and leave the error marked in the dictionary.'''
+        for column in INVOLVEMENT_COLUMNS:
+            for key, count in (dataframe[column] == 'Yes').groupby(keys).sum().items():
+                if count:
+                    totals[key + (column,)] = [int(count), 0.0, 0.0, {}]
 
-        try:
-            datetime.strptime(self.date_entry.get().strip(), '%m/%d')
-            # Make sure the date is in the proper format
-            entered_date = datetime.strptime(
-                self.date_entry.get().strip(), '%m/%d')
-            global MONTH_ENTERED
-            MONTH_ENTERED = self.months[str(entered_date.month)]
+        for column in MINUTE_COLUMNS:
+            minutes = pd.to_numeric(dataframe[column], errors='coerce').astype(float)
+            timed = minutes.notna()
+            timed_keys = [key[timed] for key in keys]
+            minutes = minutes[timed]
 
-            self.date_entry.config({'background': '#00cc2c'})
-            self.errors['date'] = 0
-        except:
-            self.date_entry.config({'background': 'Red'})
-            self.errors['date'] = 1
+            sums = pd.DataFrame({'count': 1, 'total': minutes, 'sum_squares': minutes ** 2}).groupby(timed_keys).sum()
 
-    def call_received_validation(self, event=None):
-        '''If the time string length is less than 4, make the background color red and set an error. Otherwise, try to parse the time.
-           It doesn't matter if a colon was used. If valid, set the background color to green and set the errors dictionary value to 0.
-           If not valid, change the background color to red and set an error.'''
+            for key, count, total, sum_squares in zip(sums.index, sums['count'], sums['total'], sums['sum_squares']):
+                totals[key + (column,)] = [int(count), float(total), float(sum_squares), {}]
 
-        try:
-            if len(self.call_received_entry.get().strip()) < 4:
-                fail = 1/0
-            datetime.strptime(
-                self.call_received_entry.get().strip().replace(':', ''), '%H%M')
-            self.call_received_entry.config({'background': '#00cc2c'})
-            self.errors['call_received'] = 0
-        except:
-            self.call_received_entry.config({'background': 'Red'})
-            self.errors['call_received'] = 1
+            buckets = pd.Series(sketch_buckets(minutes), index=minutes.index)
+            bucket_counts = buckets.groupby(timed_keys + [buckets]).size()
 
-    def arrival_time_validation(self, event=None):
-        '''Same logic as above.'''
+            for (day, shift, service_call_type, bucket), count in bucket_counts.items():
+                totals[(day, shift, service_call_type, column)][3][int(bucket)] = int(count)
 
-        try:
-            if len(self.arrival_time_entry.get().strip()) < 4:
-                fail = 1/0
-            datetime.strptime(
-                self.arrival_time_entry.get().strip().replace(':', ''), '%H%M')
-            self.arrival_time_entry.config({'background': '#00cc2c'})
-            self.errors['arrival_time'] = 0
-        except:
-            self.arrival_time_entry.config({'background': 'Red'})
-            self.errors['arrival_time'] = 1
+        return totals
 
-    def completion_time_validation(self, event=None):
-        '''Same logic as above.'''
+    def add_rows(self, rows, journal_id=None, seq=None):
+        '''Add saved rows to the running totals of their groups, in one transaction. Workstations add their rows at the same time
+           without holding the shared lock, so the transaction takes the database for writing before it reads anything: another
+           workstation's additions wait for this one to commit, rather than reading the same totals and overwriting them. If the
+           rows are journal entries up to seq, that's recorded in the same transaction (see applied_through()).'''
+
+        if not rows:
+            return
+
+        connection = self.connect()
+        # The transaction is started and ended here, rather than by the sqlite3 module when the first row is written
+        connection.isolation_level = None
 
         try:
-            if len(self.completion_time_entry.get().strip()) < 4:
-                fail = 1/0
-            datetime.strptime(
-                self.completion_time_entry.get().strip().replace(':', ''), '%H%M')
-            self.completion_time_entry.config({'background': '#00cc2c'})
-            self.errors['completion_time'] = 0
-        except:
-            self.completion_time_entry.config({'background': 'Red'})
-            self.errors['completion_time'] = 1
+            connection.execute('BEGIN IMMEDIATE')
 
-    def service_call_type_validation(self, event=None):
-        '''If an item in the listbox is selected, insert it into the Entry field and set the background color to green. Clear the error.
-           Otherwise, if the entry field value matches an item in the service call type list, make the background green and clear the error.
-           Otherwise, make the background red and set an error.'''
+            try:
+                for key, (count, total, sum_squares, sketch) in self.aggregate(pd.DataFrame(rows)).items():
+                    # The counts and sums are added up by the upsert; the sketch buckets are merged here
+                    existing = connection.execute('SELECT sketch FROM rollups WHERE day = ? AND shift = ? AND '
+                                                  'service_call_type = ? AND measure = ?', key).fetchone()
+                    if existing is not None:
+                        for bucket, bucket_count in json.loads(existing[0]).items():
+                            sketch[int(bucket)] = sketch.get(int(bucket), 0) + bucket_count
 
-        if self.service_call_type_listbox.get('active').strip() in self.service_call_type_list:
-            # Because when you delete tray_entry text, the 'anchor' becomes ''
-            temp_string = self.service_call_type_listbox.get('active').strip()
-            self.service_call_type_entry.delete(
-                0, 'end')  # This resets the 'anchor' text
-            self.service_call_type_entry.insert('end', ' ' + temp_string)
-            self.service_call_type_entry.config({"background": "#00cc2c"})
-            self.errors['service_call_type'] = 0
+                    connection.execute('INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                                       'ON CONFLICT (day, shift, service_call_type, measure) DO UPDATE SET '
+                                       'count = count + excluded.count, total = total + excluded.total, '
+                                       'sum_squares = sum_squares + excluded.sum_squares, sketch = excluded.sketch',
+                                       key + (count, total, sum_squares, json.dumps(sketch)))
 
-        elif self.service_call_type_entry.get().strip() in self.service_call_type_list:
-            self.service_call_type_entry.config({"background": "#00cc2c"})
-            self.errors['service_call_type'] = 0
+                if journal_id is not None:
+                    record_journal_seq(connection, journal_id, seq)
 
-        else:
-            self.service_call_type_entry.config({"background": "Red"})
-            self.errors['service_call_type'] = 1
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        finally:
+            connection.close()
 
-##########################################################################################################
+    def applied_through(self, journal_id):
+        '''The last entry of a workstation's journal added to the running totals (see add_rows()).'''
 
-    def get_checkbox_answers(self):
-        '''Preset the answers to be 'No'. The Checkboxes' state returns a tuple. 'selected' can be in index 0 or 1.
-           It depends on whether it is in focus. So, check at both tuple indices.'''
+        return read_journal_seq(self.path, journal_id)
 
-        self.physical_intervention_answer = 'No'
-        self.restraint_used_answer = 'No'
-        self.police_involved_answer = 'No'
-        self.time_over_24_hours_answer = 'No'
+    def read_totals(self, path=None):
 
-        try:
-            # Output will be one of: (), ('focus'), ('selected'), or ('focus', 'selected')
-            if (self.physical_intervention_checkbox.state()[0] == 'selected' or self.physical_intervention_checkbox.state()[1] == 'selected'):
-                self.physical_intervention_answer = 'Yes'
-        except:
-            pass
+        connection = self.connect(path)
 
         try:
-            if (self.restraint_used_checkbox.state()[0] == 'selected' or self.restraint_used_checkbox.state()[1] == 'selected'):
-                self.restraint_used_answer = 'Yes'
-        except:
-            pass
+            return {tuple(row[:4]): [row[4], row[5], row[6], {int(bucket): bucket_count
+                                                              for bucket, bucket_count in json.loads(row[7]).items()}]
+                    for row in connection.execute('SELECT * FROM rollups')}
+        finally:
+            connection.close()
+
+    def rebuild(self, master_df):
+        '''Add up the running totals again from every row of the master, and replace them. Return the number of groups and the
+           number of them whose totals differed from the running totals (which should be 0).'''
+
+        rebuilt = self.aggregate(master_df)
+        existing = self.read_totals() if os.path.exists(self.path) else {}
+
+        differed = sum(1 for key in set(rebuilt) | set(existing) if key not in rebuilt or key not in existing or
+                       rebuilt[key][0] != existing[key][0] or rebuilt[key][3] != existing[key][3] or
+                       abs(rebuilt[key][1] - existing[key][1]) > 1e-6 or abs(rebuilt[key][2] - existing[key][2]) > 1e-6)
+
+        path_rebuilding = self.path + '.' + uuid.uuid4().hex[:8] + '.rebuilding'
+        connection = self.connect(path_rebuilding)
 
         try:
-            if (self.police_involved_checkbox.state()[0] == 'selected' or self.police_involved_checkbox.state()[1] == 'selected'):
-                self.police_involved_answer = 'Yes'
-        except:
-            pass
+            with connection:
+                connection.executemany('INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                       [key + (count, total, sum_squares, json.dumps(sketch))
+                                        for key, (count, total, sum_squares, sketch) in rebuilt.items()])
+        finally:
+            connection.close()
+
+        os.replace(path_rebuilding, self.path)
+
+        return len(rebuilt), differed
+
+    def summary(self, grouping, start_date='0000/00/00', end_date='9999/99/99'):
+        '''Summarize by 'day', 'month', 'shift' or 'service call type', between two dates (yyyy/mm/dd, inclusive), from the
+           running totals: the number of incidents, and for each "(mins.)" column the mean, standard deviation and the
+           REPORT_PERCENTILES, then the involvement counts. Reads each day's groups once, however many incidents there were.'''
+
+        connection = self.connect()
 
         try:
-            if (self.time_over_24_hours_checkbox.state()[0] == 'selected' or self.time_over_24_hours_checkbox.state()[1] == 'selected'):
-                self.time_over_24_hours_answer = 'Yes'
-        except:
-            pass
+            rows = connection.execute('SELECT ' + self.GROUPINGS[grouping] + ', measure, count, total, sum_squares, sketch '
+                                      'FROM rollups WHERE day BETWEEN ? AND ?', (start_date, end_date)).fetchall()
+        finally:
+            connection.close()
 
-    def format_date(self):
-        '''Ensures that the entered date has a '/' inside it.'''
+        merged = {}
 
-        month_substring, date_substring = self.date_entry.get().strip().split('/')
+        for group, measure, count, total, sum_squares, sketch in rows:
+            entry = merged.setdefault(group, {}).setdefault(measure, [0, 0.0, 0.0, {}])
+            entry[0] += count
+            entry[1] += total
+            entry[2] += sum_squares
+            for bucket, bucket_count in json.loads(sketch).items():
+                entry[3][int(bucket)] = entry[3].get(int(bucket), 0) + bucket_count
 
-        if len(month_substring) == 1:
-            month_substring = '0' + month_substring
+        summary_rows = []
 
-        if len(date_substring) == 1:
-            date_substring = '0' + date_substring
+        for group in sorted(merged):
+            measures = merged[group]
+            summary_row = {grouping.title(): group, 'Incidents': measures.get('Incidents', [0])[0]}
 
-        return (CURRENT_YEAR + '/' + month_substring + '/' + date_substring)
+            for column in MINUTE_COLUMNS:
+                count, total, sum_squares, sketch = measures.get(column, [0, 0.0, 0.0, {}])
+                name = column.replace(' (mins.)', '')
+                mean = total / count if count else None
+                summary_row[name + ' mean (mins.)'] = None if mean is None else round(mean, 1)
+                summary_row[name + ' std. dev. (mins.)'] = None if mean is None else round(
+                    max(sum_squares / count - mean ** 2, 0) ** 0.5, 1)
+                for percentile in REPORT_PERCENTILES:
+                    summary_row[name + ' p' + str(percentile) + ' (mins.)'] = sketch_quantile(sketch, percentile / 100)
 
-    def format_time(self, time):
-        '''Adds a colon to the entered time if not present.'''
+            for column in INVOLVEMENT_COLUMNS:
+                summary_row[column] = measures.get(column, [0])[0]
 
-        if ':' not in time:
-            time = time[:-2] + ':' + time[-2:]
+            summary_rows.append(summary_row)
 
-        return time
+        return pd.DataFrame(summary_rows)
 
-    def get_time_difference_numeric(self, time_1, time_2, unit, check_24=None):
-        '''Convert the strings to datetime objects and find the difference in seconds. Based on the unit specified, calculate the
-           time difference and return it.'''
 
-        time_1 = datetime.strptime(self.format_time(time_1.strip()), '%H:%M')
-        time_2 = datetime.strptime(self.format_time(time_2.strip()), '%H:%M')
+##########################################################################################################
+# INCIDENT SEARCH: full-text search over every incident, from the search window
 
-        seconds = (time_2 - time_1).seconds
+class IncidentSearchIndex:
+    '''Full-text index of every incident, in a small database next to the master. Each incident has a row in the narrow
+       incidents table (its date and shift, to filter on), its whole row as JSON in incident_rows (only read for the page
+       listed), and its Service Call Type, Requested By, Contact Information and Notes indexed in an SQLite FTS5 table. Rows
+       are added as they are saved, so the master is never read to search; rebuild() makes the index from the master when it
+       doesn't exist yet (or after the master was rewritten).'''
 
-        if unit == 'seconds':
-            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
-                return str(seconds) + 86400
-            else:
-                return str(seconds)
-        elif unit == 'minutes':
-            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
-                return str(round(seconds/60) + 1440)
-            else:
-                return str(round(seconds/60))
-        elif unit == 'hours':
-            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
-                return str(round(seconds/3600, 1) + 24)
-            else:
-                return str(round(seconds/3600, 1))
+    TEXT_COLUMNS = ['Service Call Type', 'Requested By', 'Contact Information', 'Notes']
 
-    def get_time_difference(self, time_1, time_2, check_24=None):
-        '''Convert the strings into Datetime objects. Subtract them to get the seconds. Calculate the minutes by dividing by 60 and
-           rounding, and hours by dividing by 3600 and taking the floor. If time difference is more than 60 minutes, recalculate minutes.
-           Possibly add 24 hours to the hours, create an hours string, and then return that string with minutes also. If time difference is
-           not more than 60 minutes, maybe add 24 hours, and then return the hours + minutes strings.'''
+    def __init__(self, path):
 
-        time_1 = datetime.strptime(self.format_time(time_1.strip()), '%H:%M')
-        time_2 = datetime.strptime(self.format_time(time_2.strip()), '%H:%M')
+        self.path = path
 
-        seconds = (time_2 - time_1).seconds
-        minutes = str(round(seconds/60))
-        hours = floor(seconds/60/60)
+    def connect(self, path=None):
 
-        hours_string = ''
+        connection = sqlite3.connect(path or self.path, timeout=30)
+        connection.execute('CREATE TABLE IF NOT EXISTS incidents (id INTEGER PRIMARY KEY, date TEXT, shift TEXT)')
+        connection.execute('CREATE INDEX IF NOT EXISTS incidents_date ON incidents (date)')
+        connection.execute('CREATE TABLE IF NOT EXISTS incident_rows (id INTEGER PRIMARY KEY, row TEXT)')
+        # Only the index is kept, not a second copy of the text: the rows are read from incident_rows
+        connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS incident_text USING fts5(service_call_type, requested_by, "
+                           "contact_information, notes, content='')")
+        connection.execute(JOURNAL_SEQS_TABLE)
+        return connection
 
-        if seconds/60 > 59:
-            # Minutes past the floored hour
-            minutes = str(round((seconds/60/60 - hours) * 60))
+    def insert_rows(self, connection, rows):
+        '''Insert rows into the incidents table and index their text, in the caller's transaction.'''
 
-            # check_24: time from call to arrival isn't increased by 24
-            if ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
-                hours = hours + 24
+        for row in rows:
+            row = {column: '' if row.get(column) is None else str(row.get(column)) for column in INCIDENT_COLUMNS}
 
-            hours_string = str(hours) + ' hours, '
-            return (hours_string + minutes + ' minutes').replace('1 hours', '1 hour').replace('1 minutes', '1 minute').replace(', 0 minutes', '')
+            incident_id = connection.execute('INSERT INTO incidents (date, shift) VALUES (?, ?)',
+                                             (row['Date'], row['Shift'])).lastrowid
+            connection.execute('INSERT INTO incident_rows VALUES (?, ?)', (incident_id, json.dumps(row)))
+            connection.execute('INSERT INTO incident_text (rowid, service_call_type, requested_by, contact_information, '
+                               'notes) VALUES (?, ?, ?, ?, ?)', (incident_id,) + tuple(row[column] for column in self.TEXT_COLUMNS))
 
-        elif ((self.time_over_24_hours_answer == 'Yes') and (check_24 == 'Yes')):
-            hours_string = '24 hours, '
+    def add_rows(self, rows, journal_id=None, seq=None):
+        '''Index saved rows, in one transaction. Until the index has been built from the master, there's nothing to add to: the
+           rows will be read from the master when it's built. The caller holds the shared lock, and has added the rows to the
+           master while holding it (see ensure_built). If the rows are journal entries up to seq, that's recorded in the same
+           transaction (see applied_through()).'''
 
-        return (hours_string + minutes + ' minutes').replace('1 hours', '1 hour').replace('1 minutes', '1 minute').replace(', 0 minutes', '')
+        if not rows or not os.path.exists(self.path):
+            return
 
-    def append_row_to_df(self):
-        '''Get validated entry values, and append to the imported monthly dataframe. Also append to the imported master dataframe.'''
+        connection = self.connect()
 
-        self.row_to_append = {
-            'Date': self.format_date(),
-            'Time Entered': str(datetime.now())[0:16],
-            'Shift': self.var.get(),
-            'Call Received Time': self.format_time(self.call_received_entry.get().strip()),
-            'Arrival Time': self.format_time(self.arrival_time_entry.get().strip()),
-            'Completion Time': self.format_time(self.completion_time_entry.get().strip()),
-            'Service Call Type': self.service_call_type_entry.get().strip(),
-            'Physical Intervention': self.physical_intervention_answer,
-            'Restraint Used': self.restraint_used_answer,
-            'Police Involved': self.police_involved_answer,
-            'Requested By': self.requested_by_entry.get().strip(),
-            'Contact Information': self.contact_information_entry.get().strip(),
-            'Notes': self.notes_textbox.get('1.0', 'end-1c'),
-            'Time Taken to Arrive': self.get_time_difference(self.call_received_entry.get(), self.arrival_time_entry.get()),
-            'Time Taken From Call to Completion': self.get_time_difference(self.call_received_entry.get(), self.completion_time_entry.get(), 'Yes'),
-            'Time Taken From Arrival to Completion': self.get_time_difference(self.arrival_time_entry.get(), self.completion_time_entry.get(), 'Yes'),
-            'Time Taken to Arrive (mins.)': self.get_time_difference_numeric(self.call_received_entry.get(), self.arrival_time_entry.get(), 'minutes'),
-            'Time Taken From Call to Completion (mins.)': self.get_time_difference_numeric(self.call_received_entry.get(), self.completion_time_entry.get(), 'minutes', 'Yes'),
-            'Time Taken From Arrival to Completion (mins.)': self.get_time_difference_numeric(self.arrival_time_entry.get(), self.completion_time_entry.get(), 'minutes', 'Yes')
-        }
+        try:
+            with connection:
+                self.insert_rows(connection, rows)
 
-        # THIS WILL APPEND TO THE MASTER DATAFRAME ALSO, TO SAVE DUPLICATING THIS FUNCTION
-        self.master_df = self.master_df.append(
-            self.row_to_append, ignore_index=True)
-        # This line nor any following lines/functions will run if the Master file is not found
-        self.df = self.df.append(self.row_to_append, ignore_index=True)
+                if journal_id is not None:
+                    record_journal_seq(connection, journal_id, seq)
+        finally:
+            connection.close()
 
-    def append_row_to_saves_df(self):
-        '''Get the values for all the columns to be saved. If none are blank, ask for information to later identify the draft.
-           If user clicked 'Ok', append to the dataframe.'''
+    def applied_through(self, journal_id):
+        '''The last entry of a workstation's journal added to the index (see add_rows()).'''
 
-        # Check to make sure data has been entered before saving
-        self.row_to_append_saves_test = {'Date': self.date_entry.get().strip(),
-                                         'Shift': self.var.get().strip(),
-                                         'Call Received Time': self.call_received_entry.get().strip(),
-                                         'Arrival Time': self.arrival_time_entry.get().strip(),
-                                         'Completion Time': self.completion_time_entry.get().strip(),
-                                         'Service Call Type': self.service_call_type_entry.get().strip(),
-                                         'Physical Intervention': self.physical_intervention_answer,
-                                         'Restraint Used': self.restraint_used_answer,
-                                         'Police Involved': self.police_involved_answer,
-                                         'Requested By': self.requested_by_entry.get().strip(),
-                                         'Contact Information': self.contact_information_entry.get().strip(),
-                                         'Notes': self.notes_textbox.get('1.0', 'end-1c'),
-                                         'Time Over 24 Hours': self.time_over_24_hours_answer
-                                         }
-
-        if ((self.row_to_append_saves_test['Date'] == '') and (self.row_to_append_saves_test['Call Received Time'] == '') and
-            (self.row_to_append_saves_test['Arrival Time'] == '') and (self.row_to_append_saves_test['Completion Time'] == '') and
-            (self.row_to_append_saves_test['Service Call Type'] == '') and (self.row_to_append_saves_test['Requested By'] == '') and
-                (self.row_to_append_saves_test['Contact Information'] == '') and (self.row_to_append_saves_test['Notes'] == '')):
+        return read_journal_seq(self.path, journal_id)
 
-            tk.messagebox.showinfo(
-                'Nothing to Save', 'To save a draft, you must have entered data.')
-            return True
+    def rebuild(self, master_df):
+        '''Index every row of the master in a new database, and replace the index with it. Return the number of rows.'''
 
-        else:
+        path_rebuilding = self.path + '.' + uuid.uuid4().hex[:8] + '.rebuilding'
+        connection = self.connect(path_rebuilding)
 
-            self.identifier_answer = simpledialog.askstring(
-                'Identifying Information', 'Please enter a Patient ID or patient name:')
+        try:
+            with connection:
+                self.insert_rows(connection, untyped_incident_dataframe(master_df).fillna('').to_dict('records'))
+        finally:
+            connection.close()
 
-            if self.identifier_answer is not None:
+        os.replace(path_rebuilding, self.path)
 
-                self.row_to_append_saves = {
-                    'Identifier': self.identifier_answer.strip(),
-                    'Date': self.date_entry.get().strip(),
-                    'Shift': self.var.get().strip(),
-                    'Call Received Time': self.call_received_entry.get().strip(),
-                    'Arrival Time': self.arrival_time_entry.get().strip(),
-                    'Completion Time': self.completion_time_entry.get().strip(),
-                    'Service Call Type': self.service_call_type_entry.get().strip(),
-                    'Physical Intervention': self.physical_intervention_answer,
-                    'Restraint Used': self.restraint_used_answer,
-                    'Police Involved': self.police_involved_answer,
-                    'Requested By': self.requested_by_entry.get().strip(),
-                    'Contact Information': self.contact_information_entry.get().strip(),
-                    'Notes': self.notes_textbox.get('1.0', 'end-1c'),
-                    'Time Over 24 Hours': self.time_over_24_hours_answer
-                }
+        return master_df.shape[0]
 
-                if self.saves_df.shape[0] == 10:
-                    # Drop the oldest draft
-                    self.saves_df.drop(0, axis=0, inplace=True)
+    def ensure_built(self, master_store, shared_lock):
+        '''Build the index from the master store if it doesn't exist yet. Return False if there's no master to build it from.
+           The master is read and the index put in place while holding the shared lock, which rows are added to the master and
+           the index under. So a row saved by any workstation while the index is built is either already in the master read,
+           or is added to the index once it's in place; none are skipped because the index didn't exist yet.'''
 
-                self.saves_df = self.saves_df.append(
-                    self.row_to_append_saves, ignore_index=True)  # Use index to pull in later?
+        if os.path.exists(self.path):
+            return True
 
-            else:
+        with shared_lock:
+            if os.path.exists(self.path):
                 return True
 
-    def save_text_file(self):
+            if not master_store.ensure_initialized():
+                return False
 
-        try:
-            with open(PATH_LOGS + str(datetime.now())[0:19].replace(':', '-') + ' Incident Report Entry.txt', 'w+') as file:
-
-                file.write('\n  Below is the information for the record submitted on: ' +
-                           str(datetime.now())[0:19] + '\n')
-
-                file.write('\n  Date: '.ljust(28) + self.row_to_append['Date'])
-                file.write('\n  Shift: '.ljust(28) +
-                           self.row_to_append['Shift'])
-                file.write('\n  Call Received Time: '.ljust(28) +
-                           self.row_to_append['Call Received Time'])
-                file.write('\n  Arrival Time: '.ljust(28) +
-                           self.row_to_append['Arrival Time'])
-                file.write('\n  Completion Time: '.ljust(28) +
-                           self.row_to_append['Completion Time'])
-                file.write('\n  Service Call Type: '.ljust(28) +
-                           self.row_to_append['Service Call Type'])
-                file.write('\n  Physical Intervention: '.ljust(
-                    28) + self.row_to_append['Physical Intervention'])
-                file.write('\n  Restraint Used: '.ljust(28) +
-                           self.row_to_append['Restraint Used'])
-                file.write('\n  Police Involved: '.ljust(28) +
-                           self.row_to_append['Police Involved'])
-                file.write('\n  Requested By: '.ljust(28) +
-                           self.row_to_append['Requested By'])
-                file.write('\n  Contact Information: '.ljust(28) +
-                           self.row_to_append['Contact Information'])
-                file.write('\n\n  Notes:'.ljust(28) + '\n\n   ' +
-                           self.row_to_append['Notes'].replace('\n', '\n   '))
-        except:
-            pass
+            self.rebuild(master_store.read_dataframe())
 
-    def clean_text_file_folder(self):
-
-        FILES = [f for f in listdir(PATH_LOGS) if isfile(join(PATH_LOGS, f))]
-
-        total_files = len(FILES)
-
-        if total_files > MAX_TEXT_FILES:
-            number_to_delete = (total_files - MAX_TEXT_FILES) + 30
-
-            for count in range(number_to_delete):
-                os.unlink(PATH_LOGS + '\\' + FILES[count])
-
-    def save_files(self):
-        '''FOR BOTH THE MONTHLY AND MASTER DATAFRAMES:
-           Create a workbook, select the 1st worksheet, and title it. Convert dataframe to format for OpenPyXL, and set
-           the column widths in advance. Loop through the new dataframe and insert the values into the Excel file, also specifying
-           alignment and to wrap text. Save the Excel file.'''
-
-        workbook = Workbook()
-        worksheet = workbook.worksheets[0]
-
-        rows = dataframe_to_rows(self.df, index=False)
-
-        worksheet.column_dimensions['A'].width = 15
-        worksheet.column_dimensions['B'].width = 17
-        worksheet.column_dimensions['C'].width = 16
-        worksheet.column_dimensions['D'].width = 21
-        worksheet.column_dimensions['E'].width = 16
-        worksheet.column_dimensions['F'].width = 21
-        worksheet.column_dimensions['G'].width = 40
-        worksheet.column_dimensions['H'].width = 24
-        worksheet.column_dimensions['I'].width = 18
-        worksheet.column_dimensions['J'].width = 19
-        worksheet.column_dimensions['K'].width = 25
-        worksheet.column_dimensions['L'].width = 25
-        worksheet.column_dimensions['M'].width = 44
-        worksheet.column_dimensions['N'].width = 30
-        worksheet.column_dimensions['O'].width = 43
-        worksheet.column_dimensions['P'].width = 43
-        worksheet.column_dimensions['Q'].width = 30
-        worksheet.column_dimensions['R'].width = 43
-        worksheet.column_dimensions['S'].width = 45
-
-        for row_index, row in enumerate(rows, 1):
-            for column_index, value in enumerate(row, 1):
-                worksheet.cell(row=row_index, column=column_index, value=value).alignment = Alignment(
-                    horizontal='center', vertical='center', wrapText=True)
-
-        workbook.save(PATH_MONTHLY + CURRENT_YEAR + '\\' + MONTH_ENTERED +
-                      '\\Incident Reports - ' + CURRENT_YEAR + ' ' + MONTH_ENTERED[5:] + '.xlsx')
-
-        # MASTER FILE ========================================================================================================
-        workbook_master = Workbook()
-        worksheet_master = workbook_master.worksheets[0]
-
-        master_rows = dataframe_to_rows(self.master_df, index=False)
-
-        worksheet_master.column_dimensions['A'].width = 15
-        worksheet_master.column_dimensions['B'].width = 17
-        worksheet_master.column_dimensions['C'].width = 16
-        worksheet_master.column_dimensions['D'].width = 21
-        worksheet_master.column_dimensions['E'].width = 16
-        worksheet_master.column_dimensions['F'].width = 21
-        worksheet_master.column_dimensions['G'].width = 40
-        worksheet_master.column_dimensions['H'].width = 24
-        worksheet_master.column_dimensions['I'].width = 18
-        worksheet_master.column_dimensions['J'].width = 19
-        worksheet_master.column_dimensions['K'].width = 25
-        worksheet_master.column_dimensions['L'].width = 25
-        worksheet_master.column_dimensions['M'].width = 44
-        worksheet_master.column_dimensions['N'].width = 30
-        worksheet_master.column_dimensions['O'].width = 43
-        worksheet_master.column_dimensions['P'].width = 43
-        worksheet_master.column_dimensions['Q'].width = 30
-        worksheet_master.column_dimensions['R'].width = 43
-        worksheet_master.column_dimensions['S'].width = 45
-
-        for row_index, row in enumerate(master_rows, 1):
-            for column_index, value in enumerate(row, 1):
-                worksheet_master.cell(row=row_index, column=column_index, value=value).alignment = Alignment(
-                    horizontal='center', vertical='center', wrapText=True)
-
-        workbook_master.save(PATH_MASTER)
+        return True
 
-        try:
-            workbook_master.save(PATH_MASTER_COPY)
-        except:
-            pass
+    @staticmethod
+    def match_expression(query):
+        '''Turn what was typed into an FTS5 query: every word has to appear, as the start of a word, in any of the columns.
+           Punctuation is dropped, so nothing typed can be read as FTS5 syntax.'''
 
-    def save_drafts_file(self):
-        '''Create a workbook, select the 1st worksheet, and title it. Convert drafts dataframe to format for OpenPyXL, and set
-           the column widths in advance. Loop through the new dataframe and insert the values into the Excel file, also specifying
-           alignment and to wrap text. Save the Excel file.'''
-
-        workbook = Workbook()
-        worksheet = workbook.worksheets[0]
-        worksheet.title = 'Drafts'
-
-        rows = dataframe_to_rows(self.saves_df, index=False)
-
-        worksheet.column_dimensions['A'].width = 20
-        worksheet.column_dimensions['B'].width = 15
-        worksheet.column_dimensions['C'].width = 16
-        worksheet.column_dimensions['D'].width = 21
-        worksheet.column_dimensions['E'].width = 16
-        worksheet.column_dimensions['F'].width = 21
-        worksheet.column_dimensions['G'].width = 40
-        worksheet.column_dimensions['H'].width = 24
-        worksheet.column_dimensions['I'].width = 18
-        worksheet.column_dimensions['J'].width = 19
-        worksheet.column_dimensions['K'].width = 25
-        worksheet.column_dimensions['L'].width = 23
-        worksheet.column_dimensions['M'].width = 44
-        worksheet.column_dimensions['N'].width = 30
-
-        for row_index, row in enumerate(rows, 1):
-            for column_index, value in enumerate(row, 1):
-                worksheet.cell(row=row_index, column=column_index, value=value).alignment = Alignment(
-                    horizontal='center', vertical='center', wrapText=True)
-
-        workbook.save(PATH_DRAFTS)
+        return ' '.join('"' + word + '"*' for word in re.findall(r'\w+', query))
 
-    def reset_radio_buttons(self):
+    def search(self, query='', start_date='0000/00/00', end_date='9999/99/99', shift=None, limit=SEARCH_PAGE_ROWS, offset=0):
+        '''Return the number of incidents matching the query, between two dates (yyyy/mm/dd, inclusive) and on the shift (or
+           either shift, if None), and the rows of the limit of them after offset, newest first. Without a query, every incident
+           in the date range matches. The ids of the matches are found in one pass, and only the page's rows are read.'''
 
-        self.var.set('7:30 - 19:30')
+        if not os.path.exists(self.path):
+            return 0, []
 
-    def reset_checkboxes(self):
-        '''Uncheck all Checkboxes.'''
+        where = 'WHERE date BETWEEN ? AND ?'
+        parameters = [start_date, end_date]
 
-        self.physical_intervention_checkbox.state(['!selected'])
-        self.restraint_used_checkbox.state(['!selected'])
-        self.police_involved_checkbox.state(['!selected'])
-        self.time_over_24_hours_checkbox.state(['!selected'])
+        if shift:
+            where += ' AND shift = ?'
+            parameters.append(shift)
 
-    def reset_entries(self):
-        '''Reset all widgets, and also reset their colors.'''
+        expression = self.match_expression(query)
 
-        self.date_entry.delete(0, 'end')
-        self.date_entry.config({'background': 'White'})
+        if expression:
+            where += ' AND id IN (SELECT rowid FROM incident_text WHERE incident_text MATCH ?)'
+            parameters.append(expression)
 
-        self.call_received_entry.delete(0, 'end')
-        self.call_received_entry.config({'background': 'White'})
+        connection = self.connect()
 
-        self.arrival_time_entry.delete(0, 'end')
-        self.arrival_time_entry.config({'background': 'White'})
+        try:
+            ids = [incident_id for incident_id, in connection.execute(
+                'SELECT id FROM incidents ' + where + ' ORDER BY date DESC, id DESC', parameters)]
+            page = ids[offset:offset + limit]
+            rows = dict(connection.execute('SELECT id, row FROM incident_rows WHERE id IN (' + ', '.join('?' * len(page)) + ')',
+                                           page).fetchall()) if page else {}
+        finally:
+            connection.close()
 
-        self.completion_time_entry.delete(0, 'end')
-        self.completion_time_entry.config({'background': 'White'})
+        return len(ids), [json.loads(rows[incident_id]) for incident_id in page]
 
-        self.service_call_type_entry.delete(0, 'end')
-        self.service_call_type_entry.config({'background': 'White'})
 
-        self.requested_by_entry.delete(0, 'end')
+##########################################################################################################
+# COMMAND LINE: maintenance tasks run without the entry window (the benchmarks are in incident_benchmarks.py)
 
-        self.contact_information_entry.delete(0, 'end')
+def repair_master_durations(master_store, shared_lock, dry_run=False):
+    '''Recompute the six "Time Taken" columns across the whole master in one pass, and write them back (unless dry_run) if the
+       store hasn't been added to in the meantime. Then export the master file. Return the number of rows that changed.'''
 
-        self.notes_textbox.delete('1.0', 'end')
+    if not master_store.ensure_initialized():
+        raise FileNotFoundError('The Master file can not be found.')
 
-    def on_submit_button(self):
-        '''Run validation functions on the Entry fields. If none have an error, get both the monthly and master dataframe, and the
-           checkbox answers, and run a function to append the currently entered values to each dataframe. Save both dataframes as
-           Excel files. Reset all the widgets. If the record submitted was an imported draft, delete that draft and update the
-           Excel file. Reset the draft index to None as was initialized. Draft index is only not None when Select button
-           function runs. Show a submission confirmation.'''
+    for attempt in range(CONFLICT_ATTEMPTS):
+        version = master_store.version()
+        repaired_df, changed = repair_duration_columns(master_store.read_dataframe())
 
-        self.date_validation()
-        self.call_received_validation()
-        self.arrival_time_validation()
-        self.completion_time_validation()
-        self.service_call_type_validation()
+        if dry_run or changed == 0:
+            return changed
 
-        if sum(self.errors.values()) == 0:
+        with shared_lock:
+            if master_store.version() == version:
+                master_store.rewrite(repaired_df)
+                break
 
-            self.get_dataframe()
-            self.get_master_dataframe()
-            self.get_checkbox_answers()
-            self.append_row_to_df()
-            self.save_files()
-            self.save_text_file()
-            self.clean_text_file_folder()
-            self.reset_radio_buttons()
-            self.reset_checkboxes()
-            self.reset_entries()
+        backoff(attempt)
 
-            if self.draft_opened_index is not None:
-                # Drop the draft from its dataframe
-                self.saves_df.drop(self.draft_opened_index,
-                                   axis=0, inplace=True)
-                self.save_drafts_file()
-                self.draft_opened_index = None  # Reset so that nothing is deleted on next save
+    else:
+        raise WriteConflictError('The master store kept being changed by other workstations while repairing it.')
 
-            tk.messagebox.showinfo('Success', 'Entry Successfully Submitted!')
+    master_store.export_workbook()
 
-    def on_save_button(self):
-        '''Get the drafts dataframe, and the values of the 4 Checkboxes. Run a function that updates the dataframe with current entered
-           values if they are not all blank, otherwise displays a Messagebox and returns True. Only if the former occurs, the updated
-           dataframe will be saved, and the program will terminate.'''
+    return changed
 
-        self.get_saves_dataframe()
-        self.get_checkbox_answers()  # Normally only called on Submit button
-        check_if_empty = self.append_row_to_saves_df()
 
-        if check_if_empty != True:
-            self.save_drafts_file()
-            self.destroy()  # Close the app
+def report_startup_timing():
+    '''Open the entry window, print how long each stage of starting up took, and close it. The heavy modules are meant to be
+       imported after the window is drawn, so they're reported as loaded or not at that point.'''
 
-    def handle_topbox_listbox_creation(self):
-        '''Create a header string to display above the listbox, use it as text to a Label, create a Listbox, get the drafts dataframe,
-           and for each row, generate a fixed-width string of the values. Insert that string into the Listbox.'''
+    imported = time.perf_counter()
 
-        header_string = '      ' + \
-            'IDENTIFIER'.ljust(15) + 'DATE'.ljust(9) + \
-            'SHIFT'.ljust(15) + 'CALL RECEIVED'.ljust(15)
-        header_string += 'ARRIVAL'.ljust(10) + 'SERVICE CALL TYPE'.ljust(20)
-        header_string += 'PHYS. INTERV.'.ljust(
-            17) + 'RESTRAINT USED'.ljust(17) + 'POLICE INVOLVED'.ljust(17)
-        header_string += 'REQUESTED BY'.ljust(15) + 'CONTACT INFO.'
+    app = App()
+    built = time.perf_counter()
 
-        tk.Label(self.window, font=('Courier', 8), fg='blue',
-                 text=header_string).grid(row=1, padx=(0, 4))
+    app.update()
+    painted = time.perf_counter()
+    loaded_before_paint = [module.module_name for module in HEAVY_MODULES if module.module_name in sys.modules]
 
-        self.top_lbox = tk.Listbox(self.window, font=(
-            'Courier', 8), width=170, height=10, activestyle='none')
-        self.top_lbox.grid(row=2, padx=(3, 0))
+    if app.warm_up_thread is not None:
+        app.warm_up_thread.join()
+    warmed_up = time.perf_counter()
 
-        self.get_saves_dataframe()
-
-        index_number = 1
-
-        for row in range(self.saves_df.shape[0]):
-            row_string = ('(' + str(index_number) + ')').rjust(4)
-            index_number += 1
-            # Identifying Information
-            row_string += '  ' + str(self.saves_df.iloc[row, 0])[:12].ljust(15)
-            # Date
-            row_string += str(self.saves_df.iloc[row, 1]
-                              )[:5].replace('nan', '').ljust(9)
-            row_string += self.saves_df.iloc[row, 2].ljust(15)  # Shift
-            # Call Received Time          USING STR() PREVENTS INTEGERS (11:00) FROM SHOWING AS FLOATS WITH DECIMALS IN THE LISTBOX
-            row_string += str(self.saves_df.iloc[row, 3]
-                              )[:10].replace('nan', '').ljust(15)
-            # Arrival Time
-            row_string += str(self.saves_df.iloc[row, 4]
-                              )[:7].replace('nan', '').ljust(10)
-            # Service Call Type
-            row_string += str(self.saves_df.iloc[row, 6]
-                              )[:17].replace('nan', '').ljust(20)
-            # Physical Intervention
-            row_string += self.saves_df.iloc[row, 7].ljust(17)
-            # Restraint Used
-            row_string += self.saves_df.iloc[row, 8].ljust(17)
-            # Police Involved
-            row_string += self.saves_df.iloc[row, 9].ljust(17)
-            # Requested By
-            row_string += str(self.saves_df.iloc[row, 10]
-                              )[:10].replace('nan', '').ljust(15)
-            # Contact Information
-            row_string += str(self.saves_df.iloc[row, 11]
-                              )[:13].replace('nan', '')
-#             row_string+= str(self.saves_df.iloc[row,11]).replace('\n', '     ').replace('nan', '')[:50].ljust(55) # Notes
-#             row_string+= self.saves_df.iloc[row,12].ljust(8) # Time Over 24 Hours
-
-            self.top_lbox.insert('end', row_string)
+    app.writer.stop()
+    app.destroy()
 
-    def load_selected_draft(self):
-        '''Set all widgets according the the values of the draft list.'''
+    print('Script imports:      ' + str(round((imported - STARTED) * 1000)).rjust(6) + ' ms')
+    print('Window built:        ' + str(round((built - STARTED) * 1000)).rjust(6) + ' ms')
+    print('First paint:         ' + str(round((painted - STARTED) * 1000)).rjust(6) + ' ms')
+    print('Warm-up finished:    ' + str(round((warmed_up - STARTED) * 1000)).rjust(6) + ' ms')
+    print('Imported before the first paint: ' + (', '.join(loaded_before_paint) if loaded_before_paint else 'none'))
 
-        self.var.set(self.row_to_insert[2])  # Radio button
+    return 0
 
-        if self.row_to_insert[7] == 'Yes':
-            self.physical_intervention_checkbox.state(['selected'])
-        if self.row_to_insert[8] == 'Yes':
-            self.restraint_used_checkbox.state(['selected'])
-        if self.row_to_insert[9] == 'Yes':
-            self.police_involved_checkbox.state(['selected'])
-        if self.row_to_insert[13] == 'Yes':
-            self.time_over_24_hours_checkbox.state(['selected'])
 
-        self.row_to_insert = [str(x).replace('nan', '')
-                              for x in self.row_to_insert]
-
-        self.date_entry.insert('end', str(self.row_to_insert[1]))
-        self.call_received_entry.insert('end', str(
-            self.row_to_insert[3]).replace('.0', ''))
-        self.arrival_time_entry.insert('end', str(
-            self.row_to_insert[4]).replace('.0', ''))
-        self.completion_time_entry.insert('end', str(
-            self.row_to_insert[5]).replace('.0', ''))
-        self.service_call_type_entry.insert('end', str(self.row_to_insert[6]))
-        self.requested_by_entry.insert('end', str(self.row_to_insert[10]))
-        self.contact_information_entry.insert(
-            'end', str(self.row_to_insert[11]).replace('.0', ''))
-        self.notes_textbox.insert('end', str(self.row_to_insert[12]))
+def print_receipts(submitted=None):
+    '''Print the receipt of each logged incident submitted at a time starting with submitted. Without it, list every incident
+       kept in the log, one per line.'''
 
-        self.window.destroy()
+    records = IncidentLog.read_folder(PATH_LOGS)
 
-    def on_select_button(self):
-        '''If no row is selected, throw an error. Otherwise, get the selected row, use it to extract the dataframe row as a list,
-           store the index of the draft so it can be removed when submitted, reset the widgets, and fill with the extracted row'''
+    if submitted is None:
+        for record_submitted, row in records:
+            print(record_submitted + '   ' + row['Date'].ljust(12) + row['Call Received Time'].ljust(7) +
+                  row['Service Call Type'][:30].ljust(32) + row['Requested By'])
+        return 0
 
-        try:
-            row_selected = self.top_lbox.curselection()[0]
-            self.row_to_insert = list(self.saves_df.iloc[row_selected, :])
+    matches = [record for record in records if record[0].startswith(submitted)]
 
-            # If submitted, this index will locate the draft to delete
-            self.draft_opened_index = row_selected
+    for record_submitted, row in matches:
+        print(format_receipt(row, record_submitted) + '\n')
 
-            self.reset_radio_buttons()
-            self.reset_checkboxes()
-            self.reset_entries()
-            self.load_selected_draft()
+    if not matches:
+        print('No incident submitted at ' + submitted + ' is in the log.')
+        return 1
 
-        except:
-            tk.messagebox.showinfo(
-                'Selection Error', 'Please select a draft.', parent=self.window)
+    return 0
 
-    def on_load_button(self):
-        '''Try to load in the Draft Entries file. If no file, OR file is empty, FAIL. Otherwise, create a Toplevel window,
-           place the Select button, and run a function to create the listbox.'''
 
-        try:
-            temp_df = pd.read_excel(PATH_DRAFTS)
+def report_replica(master_store):
+    '''Wait for the copy of the master file to be made, and print whether it's up to date.'''
 
-            if temp_df.shape[0] == 0:
-                fail = 1/0
+    if master_store.replicator is None:
+        return 0
 
-            if self.window is None or not self.window.winfo_exists():
-                self.window = tk.Toplevel()
-                self.window.wm_title('Saved Drafts')
-                self.window.wm_geometry('1200x224')
-                self.window.resizable(False, False)
+    master_store.replicator.wait()
 
-                self.select_button = tk.Button(self.window, font=(
-                    'Arial', 11, 'bold'), fg='blue', text='CLICK HERE to Import Selected Draft', command=self.on_select_button)
-                self.select_button.grid(
-                    row=0, padx=(3, 0), pady=10, sticky='we')
+    if master_store.replicator.is_stale():
+        print('The copy of the Master file is out of date: ' + str(master_store.replicator.error))
+        return 1
 
-                self.handle_topbox_listbox_creation()
+    return 0
 
-        except:
-            tk.messagebox.showinfo('No Drafts', 'There are no saved drafts.')
 
+def main(argv=None):
+    '''Without arguments, open the entry window. The subcommands run maintenance tasks without the GUI.'''
+
+    parser = argparse.ArgumentParser(description='Incident Entry Tool')
+    subparsers = parser.add_subparsers(dest='command')
 
-app = App()
-app.mainloop()
+    subparsers.add_parser(
+        'export-master', help='Produce the master workbook from the master store (or database).')
+    subparsers.add_parser(
+        'compact', help="Fold this computer's pending journal entries into the master store and the Excel files.")
+
+    repair_parser = subparsers.add_parser(
+        'repair-durations', help='Recompute the six "Time Taken" columns for every row of the master.')
+    repair_parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would change.')
+
+    import_parser = subparsers.add_parser(
+        'import', help='Check and add incidents from old CSV or Excel logs to the master and monthly files.')
+    import_parser.add_argument('paths', nargs='+')
+    import_parser.add_argument('--year', default=CURRENT_YEAR, help='Year of dates written as mm/dd.')
+    import_parser.add_argument('--processes', type=int, default=None, help='Defaults to the number of processors.')
+    import_parser.add_argument('--rejects', default='Import Rejects.csv', help='Where to list the rows that failed a check.')
+    import_parser.add_argument('--dry-run', action='store_true', help='Only check the rows, and list the ones that failed.')
+
+    subparsers.add_parser(
+        'export-drafts', help='Write every saved draft to the drafts workbook, as a view of them.')
+    subparsers.add_parser(
+        'startup-timing', help='Open the entry window, print how long starting up took, and close it.')
+
+    receipt_parser = subparsers.add_parser(
+        'receipt', help='Print the receipt of an incident kept in the incident log, or list the incidents kept.')
+    receipt_parser.add_argument('submitted', nargs='?', help='When it was submitted, e.g. "2020-01-05 13:08". Lists them if left out.')
+
+    analytics_parser = subparsers.add_parser(
+        'analytics', help='Report response time percentiles and involvement counts by call type, shift and month.')
+    analytics_parser.add_argument('--output', default='Response Time Report.xlsx', help='An .xlsx or .csv file.')
+    analytics_parser.add_argument('--from', dest='start_date', help='First date to include, as yyyy/mm/dd.')
+    analytics_parser.add_argument('--to', dest='end_date', help='Last date to include, as yyyy/mm/dd.')
+
+    rollups_parser = subparsers.add_parser(
+        'rollups', help='Summarize response times from the running totals, without reading the master.')
+    rollups_parser.add_argument('--by', choices=sorted(IncidentRollups.GROUPINGS), default='month')
+    rollups_parser.add_argument('--from', dest='start_date', default='0000/00/00', help='First date to include, as yyyy/mm/dd.')
+    rollups_parser.add_argument('--to', dest='end_date', default='9999/99/99', help='Last date to include, as yyyy/mm/dd.')
+    rollups_parser.add_argument('--output', help='Also write the summary to an .xlsx or .csv file.')
+
+    subparsers.add_parser(
+        'rebuild-rollups', help='Add up the running totals again from the master, and report any that were wrong.')
+
+    timings_parser = subparsers.add_parser(
+        'submit-timings', help="Report how long each stage of a Submit took on this computer (the median, 95th percentile and longest).")
+    timings_parser.add_argument('--last', type=int, default=100, help='Only the last this many Submits (and saves). 0 for all kept.')
+    timings_parser.add_argument('--file', default=PATH_SUBMIT_TIMINGS, help="Another computer's timings file, to report on it.")
+
+    subparsers.add_parser(
+        'rebuild-search-index', help='Index every incident in the master again, for the search window.')
+
+    subparsers.add_parser(
+        'verify-partitions', help="Check every monthly file against its checksum in the manifest ('partitioned' backend).")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'verify-partitions':
+        master_store = create_incident_store()
+        if not isinstance(master_store, PartitionedIncidentStore) or not master_store.ensure_initialized():
+            print("The monthly files are only checked with the 'partitioned' storage backend.")
+            return 1
+        mismatched = master_store.verify()
+        print(str(len(master_store.read_manifest())) + ' monthly files checked; ' + str(len(mismatched)) + " don't match: " +
+              ', '.join(mismatched))
+        return 0 if not mismatched else 1
+
+    if args.command == 'rollups':
+        summary = IncidentRollups(PATH_ROLLUPS).summary(args.by, args.start_date, args.end_date)
+        print(summary.to_string(index=False))
+        if args.output:
+            write_report({'By ' + args.by.title(): summary}, args.output)
+        return 0
+
+    if args.command == 'rebuild-rollups':
+        master_store = create_incident_store()
+        if not master_store.ensure_initialized():
+            print('The Master file can not be found.')
+            return 1
+        groups, differed = IncidentRollups(PATH_ROLLUPS).rebuild(master_store.read_dataframe())
+        print(str(groups) + ' running totals rebuilt; ' + str(differed) + ' differed from the ones kept up to date.')
+        return 0 if differed == 0 else 1
+
+    if args.command == 'submit-timings':
+        summary_rows = SubmitTimings(args.file).summary(args.last)
+        if not summary_rows:
+            print('No Submits have been timed in ' + args.file)
+            return 1
+        print('Stage'.ljust(18) + 'Count'.rjust(8) + 'p50 (ms)'.rjust(12) + 'p95 (ms)'.rjust(12) + 'Max (ms)'.rjust(12))
+        for summary_row in summary_rows:
+            print(summary_row['Stage'].ljust(18) + str(summary_row['Count']).rjust(8) + str(summary_row['p50 (ms)']).rjust(12) +
+                  str(summary_row['p95 (ms)']).rjust(12) + str(summary_row['Max (ms)']).rjust(12))
+        return 0
+
+    if args.command == 'rebuild-search-index':
+        master_store = create_incident_store()
+        if not master_store.ensure_initialized():
+            print('The Master file can not be found.')
+            return 1
+        with LeaseLock(PATH_SHARED_LOCK):
+            indexed = IncidentSearchIndex(PATH_SEARCH_INDEX).rebuild(master_store.read_dataframe())
+        print(str(indexed) + ' incidents indexed in ' + PATH_SEARCH_INDEX)
+        return 0
+
+    if args.command == 'analytics':
+        master_store = create_incident_store()
+        if not master_store.ensure_initialized():
+            print('The Master file can not be found.')
+            return 1
+        if args.start_date or args.end_date:
+            master_df = master_store.read_range(args.start_date or '0000/00/00', args.end_date or '9999/99/99')
+        else:
+            master_df = master_store.read_dataframe()
+        write_report(response_time_report(master_df), args.output)
+        print(str(master_df.shape[0]) + ' incidents summarized in ' + args.output)
+        return 0
+
+    if args.command == 'receipt':
+        return print_receipts(args.submitted)
+
+    if args.command == 'export-drafts':
+        draft_store = DraftStore(PATH_DRAFT_FOLDER, PATH_DRAFTS)
+        draft_store.export_workbook(PATH_DRAFTS)
+        print(str(len(draft_store.draft_ids())) + ' drafts exported to ' + PATH_DRAFTS)
+        return 0
+
+    if args.command == 'startup-timing':
+        return report_startup_timing()
+
+    if args.command == 'import':
+        master_store = create_incident_store()
+        imported, rejected = import_incidents(args.paths, master_store, LeaseLock(PATH_SHARED_LOCK), args.year,
+                                              args.processes, args.rejects, args.dry_run, IncidentRollups(PATH_ROLLUPS),
+                                              IncidentSearchIndex(PATH_SEARCH_INDEX))
+        for month, rows in imported.items():
+            print(month + ': ' + str(rows) + (' rows would be imported' if args.dry_run else ' rows imported'))
+        print(str(sum(imported.values())) + (' rows would be imported, ' if args.dry_run else ' rows imported, ') + str(rejected) +
+              ' rejected' + (' (see ' + args.rejects + ')' if rejected else '') + '.')
+        return 0 if args.dry_run else report_replica(master_store)
+
+    if args.command == 'repair-durations':
+        master_store = create_incident_store()
+        changed = repair_master_durations(master_store, LeaseLock(PATH_SHARED_LOCK), args.dry_run)
+        print(str(changed) + (' rows would be repaired.' if args.dry_run else ' rows repaired.'))
+        if changed and not args.dry_run:
+            # The running totals and the search index were made from the times before they were repaired
+            IncidentRollups(PATH_ROLLUPS).rebuild(master_store.read_dataframe())
+            # Read and indexed holding the lock, so rows another workstation saves meanwhile aren't left out of the index
+            with LeaseLock(PATH_SHARED_LOCK):
+                IncidentSearchIndex(PATH_SEARCH_INDEX).rebuild(master_store.read_dataframe())
+        return 0 if args.dry_run else report_replica(master_store)
+
+    if args.command == 'compact':
+        master_store = create_incident_store()
+        compacted = JournalCompactor(IncidentJournal(PATH_JOURNAL, PATH_JOURNAL_CHECKPOINT), master_store,
+                                     rollups=IncidentRollups(PATH_ROLLUPS),
+                                     search_index=IncidentSearchIndex(PATH_SEARCH_INDEX)).compact(export_master=True)
+        print(str(compacted) + ' journal entries compacted.')
+        return report_replica(master_store)
+
+    if args.command == 'export-master':
+        master_store = create_incident_store()
+        if not master_store.ensure_initialized():
+            print('The Master file can not be found.')
+            return 1
+        master_store.export_workbook()
+        print('Master file exported to ' + PATH_MASTER)
+        return report_replica(master_store)
+
+    app = App()
+    app.mainloop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,381 @@
+# Benchmarks and the concurrent-writer test for the Incident Reporting Tool. They're kept out of the tool's own script, which
+# is what's opened on the workstations, and run from the command line, e.g. python incident_benchmarks.py benchmark
+import time
+# The tool's script has spaces in its name, so it's imported from its path rather than by name
+import importlib.util
+from datetime import datetime, timedelta
+import os
+import sys
+import argparse
+import json
+# random makes the synthetic incidents, the same ones each run for the same seed
+import random
+# hashlib records which version of the tool's script was timed
+import hashlib
+import shutil
+import uuid
+# multiprocessing runs each simulated workstation in its own process
+import multiprocessing
+
+
+def load_tool(path=None):
+    '''Import the Incident Reporting Tool script (next to this file, unless path is given) as the module
+       incident_reporting_tool. If it's already been imported under that name, e.g. by the tests, that module is used, so its
+       settings (like PATH_MONTHLY) are shared.'''
+
+    if 'incident_reporting_tool' in sys.modules:
+        return sys.modules['incident_reporting_tool']
+
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Incident Reporting Tool.py')
+    spec = importlib.util.spec_from_file_location('incident_reporting_tool', path)
+    tool = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = tool
+    spec.loader.exec_module(tool)
+
+    return tool
+
+
+tool = load_tool()
+
+# The tool's modules, imported when first used
+pd = tool.pd
+openpyxl = tool.openpyxl
+
+
+##########################################################################################################
+# BENCHMARKS
+
+def synthetic_incident_rows(count, seed=0, years=1):
+    '''Generate incidents with the real columns and plausible values, for benchmarking. They are spread over the given number of
+       years up to the end of 2020. A few service call types make up most of the incidents, the shift is the one the call came
+       in on, and the times to arrive and to complete are skewed, as real response times are: mostly short, with a long tail.'''
+
+    generator = random.Random(seed)
+    rows = []
+
+    # The first types listed are the most common, the next half as common, and so on
+    service_call_types = tool.SERVICE_CALL_TYPES[1:]
+    weights = [1 / rank for rank in range(1, len(service_call_types) + 1)]
+    last_day = datetime(2020, 12, 31)
+
+    for number in range(count):
+        call_received = generator.randrange(1440)
+        to_arrive = min(max(int(generator.lognormvariate(1.8, 0.6)), 1), 120)
+        to_complete = to_arrive + min(max(int(generator.lognormvariate(3.3, 0.8)), 1), 600)
+
+        rows.append({'Date': (last_day - timedelta(days=generator.randrange(365 * years))).strftime('%Y/%m/%d'),
+                     'Time Entered': '2020-01-01 00:00',
+                     'Shift': '7:30 - 19:30' if 450 <= call_received < 1170 else '19:30 - 7:30',
+                     'Call Received Time': str(call_received // 60).zfill(2) + ':' + str(call_received % 60).zfill(2),
+                     'Arrival Time': str((call_received + to_arrive) // 60 % 24).zfill(2) + ':' + str((call_received + to_arrive) % 60).zfill(2),
+                     'Completion Time': str((call_received + to_complete) // 60 % 24).zfill(2) + ':' + str((call_received + to_complete) % 60).zfill(2),
+                     'Service Call Type': generator.choices(service_call_types, weights)[0],
+                     'Physical Intervention': 'Yes' if generator.random() < 0.05 else 'No',
+                     'Restraint Used': 'Yes' if generator.random() < 0.02 else 'No',
+                     'Police Involved': 'Yes' if generator.random() < 0.03 else 'No',
+                     'Requested By': 'Nurse ' + str(generator.randrange(200)),
+                     'Contact Information': 'x' + str(generator.randrange(1000, 9999)),
+                     'Notes': 'Incident ' + str(number) + '. Attended and resolved without further issue.',
+                     'Time Taken to Arrive': tool.format_duration(to_arrive),
+                     'Time Taken From Call to Completion': tool.format_duration(to_complete),
+                     'Time Taken From Arrival to Completion': tool.format_duration(to_complete - to_arrive),
+                     'Time Taken to Arrive (mins.)': str(to_arrive),
+                     'Time Taken From Call to Completion (mins.)': str(to_complete),
+                     'Time Taken From Arrival to Completion (mins.)': str(to_complete - to_arrive)})
+
+    return rows
+
+
+def save_incident_workbook_cell_by_cell(dataframe, path):
+    '''The exporter as it used to be: a normal workbook, with a new Alignment for every cell. Kept to benchmark against.'''
+
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.worksheets[0]
+
+    for column_letter, width in tool.INCIDENT_COLUMN_WIDTHS.items():
+        worksheet.column_dimensions[column_letter].width = width
+
+    for row_index, row in enumerate(tool.openpyxl_dataframe.dataframe_to_rows(dataframe, index=False), 1):
+        for column_index, value in enumerate(row, 1):
+            worksheet.cell(row=row_index, column=column_index, value=value).alignment = tool.openpyxl_styles.Alignment(
+                horizontal='center', vertical='center', wrapText=True)
+
+    workbook.save(path)
+
+
+def benchmark_export(row_count, folder):
+    '''Time the cell-by-cell exporter against the streaming one on a synthetic master of row_count rows.'''
+
+    master_df = pd.DataFrame(synthetic_incident_rows(row_count), columns=tool.INCIDENT_COLUMNS)
+    results = {}
+
+    for name, exporter in (('cell-by-cell', save_incident_workbook_cell_by_cell), ('streaming', tool.save_incident_workbook)):
+        path = os.path.join(folder, 'Benchmark Master - ' + name + '.xlsx')
+        start = time.perf_counter()
+        exporter(master_df, path)
+        results[name] = time.perf_counter() - start
+        os.remove(path)
+        print(name.ljust(15) + str(round(results[name], 2)).rjust(8) + ' s')
+
+    print('Speedup'.ljust(15) + str(round(results['cell-by-cell'] / results['streaming'], 2)).rjust(8) + ' x')
+
+    return results
+
+
+def time_median(function, repeats, setup=None):
+    '''Run function repeats times, calling setup (untimed) before each run, and return the median time in seconds.'''
+
+    times = []
+
+    for repeat in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return sorted(times)[len(times) // 2]
+
+
+def benchmark_suite(sizes, draft_counts, folder, backend='csv', repeats=3, path_results=None, path_baseline=None):
+    '''Time each step of saving and loading incidents, headlessly, against a synthetic master of each size in sizes (and the
+       saved drafts at each of draft_counts), in a scratch folder inside folder that is deleted afterwards. The entry window
+       needs a display, so the steps behind it are timed instead. They keep the names of the window's methods that did each
+       step when the first results were recorded (most no longer exist), so results can be compared with those:
+
+           append_row_to_df          writing a submitted row to the journal (all Submit does before the window is reset)
+           save_files                compacting that row into the master store and its monthly file (the master file is
+                                     only exported every MASTER_EXPORT_SECONDS)
+           get_dataframe             reading the current monthly file from disk
+           get_master_dataframe      reading the master store from disk, and again from the cache
+           save_drafts_file          saving one draft
+           draft list                listing the drafts and making the lines of the Saved Drafts window
+
+       Each is the median of repeats runs. The results are written to path_results as JSON, with a digest of this script so
+       results from different versions can be told apart, and compared with the results in path_baseline, if given.'''
+
+    path_monthly_before = tool.PATH_MONTHLY
+
+    scratch = os.path.join(folder, 'Benchmark ' + uuid.uuid4().hex[:8])
+    results = []
+
+    def record(stage, size, seconds, unit='rows'):
+        results.append({'stage': stage, 'size': size, 'unit': unit, 'seconds': round(seconds, 6)})
+        print(stage.ljust(40) + (str(size) + ' ' + unit).rjust(14) + str(round(seconds * 1000, 1)).rjust(12) + ' ms')
+
+    try:
+        for size in sizes:
+            size_folder = os.path.join(scratch, str(size) + ' rows')
+            tool.PATH_MONTHLY = os.path.join(size_folder, 'Monthly') + os.sep
+            os.makedirs(tool.PATH_MONTHLY)
+
+            path_workbook = os.path.join(size_folder, 'Master.xlsx')
+            tool.save_incident_workbook(pd.DataFrame(columns=tool.INCIDENT_COLUMNS), path_workbook)
+
+            if backend == 'sqlite':
+                master_store = tool.SQLiteIncidentStore(os.path.join(size_folder, 'Master.sqlite3'), path_workbook)
+            elif backend == 'partitioned':
+                master_store = tool.PartitionedIncidentStore(tool.PATH_MONTHLY + 'Manifest.json', path_workbook)
+            else:
+                master_store = tool.MasterStore(os.path.join(size_folder, 'Master - Store.csv'), path_workbook)
+
+            # About five years of incidents, however many there are
+            master_df = pd.DataFrame(synthetic_incident_rows(size, years=5), columns=tool.INCIDENT_COLUMNS)
+            master_store.ensure_initialized()
+            master_store.rewrite(master_df)
+            master_store.export_workbook()
+
+            if not master_store.monthly_files_are_exports:
+                tool.save_incident_workbook(master_df[master_df['Date'].str.startswith('2020/12')],
+                                            tool.monthly_file_path('2020', tool.MONTHS['12']))
+
+            journal = tool.IncidentJournal(os.path.join(size_folder, 'Incident Journal.jsonl'),
+                                           os.path.join(size_folder, 'Incident Journal Checkpoint.json'))
+            compactor = tool.JournalCompactor(journal, master_store,
+                                              tool.LeaseLock(os.path.join(size_folder, 'Master.lock')))
+            submitted = dict(synthetic_incident_rows(1, seed=size)[0], Date='2020/12/31')
+
+            record('append_row_to_df', size, time_median(lambda: journal.append(submitted), repeats, compactor.compact))
+            compactor.compact()
+            record('save_files', size, time_median(compactor.compact, repeats, lambda: journal.append(submitted)))
+            record('get_dataframe', size, time_median(lambda: master_store.read_month('2020', '12'), repeats,
+                                                      tool.MONTHLY_CACHE.clear))
+            record('get_master_dataframe (from disk)', size, time_median(master_store.read_dataframe, repeats,
+                                                                         tool.MASTER_CACHE.clear))
+            record('get_master_dataframe (cached)', size, time_median(master_store.read_dataframe, repeats))
+
+        for draft_count in draft_counts:
+            draft_store = tool.DraftStore(os.path.join(scratch, str(draft_count) + ' Drafts'))
+            drafts = synthetic_incident_rows(draft_count + repeats, seed=draft_count)
+
+            for draft in drafts[:draft_count]:
+                draft_store.save(dict(draft, Identifier='Patient ' + draft['Contact Information']))
+
+            saving = iter(drafts[draft_count:])
+
+            record('save_drafts_file', draft_count, time_median(lambda: draft_store.save(next(saving)), repeats), 'drafts')
+            record('draft list', draft_count, time_median(
+                lambda: [tool.format_draft_row(number, draft)
+                         for number, (draft_id, draft) in enumerate(draft_store.list_drafts(), 1)],
+                repeats), 'drafts')
+
+    finally:
+        tool.PATH_MONTHLY = path_monthly_before
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    # The tool's script, as that's what's being timed
+    with open(tool.__file__, 'rb') as file:
+        script_digest = hashlib.sha256(file.read()).hexdigest()[:12]
+
+    report = {'script': script_digest, 'run': str(datetime.now())[0:16], 'backend': backend, 'repeats': repeats,
+              'python': sys.version.split()[0], 'pandas': pd.__version__, 'openpyxl': openpyxl.__version__,
+              'results': results}
+
+    if path_results is not None:
+        tool.write_file_atomically(path_results, json.dumps(report, indent=1).encode('utf-8'))
+
+    if path_baseline is not None:
+        with open(path_baseline, 'r', encoding='utf-8') as file:
+            baseline = {(result['stage'], result['size']): result['seconds'] for result in json.load(file)['results']}
+
+        print('\nCompared with ' + path_baseline + ' (above 1 is slower now):')
+
+        for result in results:
+            before = baseline.get((result['stage'], result['size']))
+            if before:
+                print(result['stage'].ljust(40) + (str(result['size']) + ' ' + result['unit']).rjust(14) +
+                      str(round(result['seconds'] / before, 2)).rjust(12) + ' x')
+
+    return report
+
+
+##########################################################################################################
+# CONCURRENT WRITER TEST
+
+def simulate_writer(writer_number, folder, row_count, backend):
+    '''One simulated workstation: its own journal, the shared store and files in folder, submitting row_count rows and compacting
+       after each one, as quickly as it can. Runs in its own process. Returns the number of conflicts and lock waits.'''
+
+    tool.PATH_MONTHLY = os.path.join(folder, 'Monthly') + os.sep
+
+    if backend == 'sqlite':
+        master_store = tool.SQLiteIncidentStore(os.path.join(folder, 'Master.sqlite3'), os.path.join(folder, 'Master.xlsx'))
+    elif backend == 'partitioned':
+        master_store = tool.PartitionedIncidentStore(tool.PATH_MONTHLY + 'Manifest.json',
+                                                     os.path.join(folder, 'Master.xlsx'))
+    else:
+        master_store = tool.MasterStore(os.path.join(folder, 'Master - Store.csv'), os.path.join(folder, 'Master.xlsx'))
+
+    local_folder = os.path.join(folder, 'Workstation ' + str(writer_number))
+    journal = tool.IncidentJournal(os.path.join(local_folder, 'Incident Journal.jsonl'),
+                                   os.path.join(local_folder, 'Incident Journal Checkpoint.json'))
+    shared_lock = tool.LeaseLock(os.path.join(folder, 'Master.lock'))
+    compactor = tool.JournalCompactor(journal, master_store, shared_lock)
+
+    for row_number, row in enumerate(synthetic_incident_rows(row_count, seed=writer_number)):
+        # Only two months, so the workstations fight over the same monthly files
+        row['Date'] = '2020/0' + str(1 + row_number % 2) + '/15'
+        row['Notes'] = 'Workstation ' + str(writer_number) + ' row ' + str(row_number)
+        journal.append(row)
+        compactor.compact()
+
+    # As the tool does when it's closed
+    compactor.compact(export_master=True)
+
+    return compactor.conflicts, shared_lock.waits
+
+
+def simulate_concurrent_writers(writer_count, row_count, folder, backend):
+    '''Run writer_count simulated workstations at once against one set of shared files, then check that every row submitted is
+       in the master store, the monthly files and the exported master file exactly once. Return True if nothing was lost.'''
+
+    os.makedirs(folder, exist_ok=True)
+    tool.save_incident_workbook(pd.DataFrame(columns=tool.INCIDENT_COLUMNS), os.path.join(folder, 'Master.xlsx'))
+
+    start = time.perf_counter()
+
+    with multiprocessing.get_context('spawn').Pool(writer_count) as pool:
+        outcomes = pool.starmap(simulate_writer, [(number, folder, row_count, backend) for number in range(writer_count)])
+
+    elapsed = time.perf_counter() - start
+
+    expected = sorted('Workstation ' + str(writer) + ' row ' + str(row) for writer in range(writer_count) for row in range(row_count))
+
+    tool.PATH_MONTHLY = os.path.join(folder, 'Monthly') + os.sep
+
+    if backend == 'sqlite':
+        stored = tool.SQLiteIncidentStore(os.path.join(folder, 'Master.sqlite3'),
+                                          os.path.join(folder, 'Master.xlsx')).read_dataframe()
+    elif backend == 'partitioned':
+        # The master file is only exported on request with this backend
+        partitioned_store = tool.PartitionedIncidentStore(tool.PATH_MONTHLY + 'Manifest.json',
+                                                          os.path.join(folder, 'Master.xlsx'))
+        partitioned_store.export_workbook()
+        stored = partitioned_store.read_range('2020/01/01', '2020/02/29')
+    else:
+        stored = pd.read_csv(os.path.join(folder, 'Master - Store.csv'), dtype=str, keep_default_na=False)
+
+    monthly = pd.concat([pd.read_excel(tool.monthly_file_path('2020', tool.MONTHS[month])) for month in ('1', '2')])
+    exported = pd.read_excel(os.path.join(folder, 'Master.xlsx'))
+
+    print(str(writer_count) + ' workstations x ' + str(row_count) + ' rows in ' + str(round(elapsed, 1)) + ' s (' +
+          str(round(writer_count * row_count / elapsed, 1)) + ' rows/s), ' + str(sum(outcome[0] for outcome in outcomes)) +
+          ' conflicts merged, ' + str(sum(outcome[1] for outcome in outcomes)) + ' lock waits')
+
+    passed = True
+
+    for name, dataframe in (('Master store', stored), ('Monthly files', monthly), ('Master file', exported)):
+        found = sorted(dataframe['Notes'].astype(str))
+        lost = len(set(expected) - set(found))
+        duplicated = len(found) - len(set(found))
+        print(name.ljust(15) + str(len(found)).rjust(7) + ' rows, ' + str(lost) + ' lost, ' + str(duplicated) + ' duplicated')
+        passed = passed and found == expected
+
+    return passed
+
+
+##########################################################################################################
+# COMMAND LINE
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Incident Reporting Tool benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    benchmark_parser = subparsers.add_parser(
+        'benchmark-export', help='Compare the old and new Excel exporters on a synthetic master file.')
+    benchmark_parser.add_argument('--rows', type=int, default=100000)
+    benchmark_parser.add_argument('--folder', default='.')
+
+    suite_parser = subparsers.add_parser(
+        'benchmark', help='Time saving and loading incidents and drafts against synthetic data of increasing size.')
+    suite_parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Rows in the master, e.g. 10000 1000000.')
+    suite_parser.add_argument('--drafts', type=int, nargs='+', default=[10, 100, tool.MAX_DRAFTS], help='Numbers of saved drafts.')
+    suite_parser.add_argument('--backend', choices=['csv', 'sqlite', 'partitioned'], default=tool.STORAGE_BACKEND)
+    suite_parser.add_argument('--repeats', type=int, default=3)
+    suite_parser.add_argument('--folder', default='.')
+    suite_parser.add_argument('--output', default='Benchmark Results.json', help='Where to write the results, as JSON.')
+    suite_parser.add_argument('--baseline', help='Results of an earlier run (its --output) to compare with.')
+
+    simulate_parser = subparsers.add_parser(
+        'simulate-writers', help='Check that workstations submitting at the same time never lose a row.')
+    simulate_parser.add_argument('--writers', type=int, default=4)
+    simulate_parser.add_argument('--rows', type=int, default=25)
+    simulate_parser.add_argument('--folder', default='Concurrent Writer Test')
+    simulate_parser.add_argument('--backend', choices=['csv', 'sqlite', 'partitioned'], default='csv')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'simulate-writers':
+        return 0 if simulate_concurrent_writers(args.writers, args.rows, args.folder, args.backend) else 1
+
+    if args.command == 'benchmark':
+        benchmark_suite(args.sizes, args.drafts, args.folder, args.backend, args.repeats, args.output, args.baseline)
+        return 0
+
+    benchmark_export(args.rows, args.folder)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# The tool's script has spaces in its name, so it's imported from its path, by incident_benchmarks, which also makes the
+# synthetic incidents the tests use
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import incident_benchmarks
+
+
+@pytest.fixture(scope='session')
+def tool():
+
+    return incident_benchmarks.tool
+
+
+@pytest.fixture
+def incident_rows(tool):
+    '''Make count incidents a few days apart through 2020, with every column filled in as the entry window would.'''
+
+    def make(count, seed=0):
+        rows = []
+
+        for number in range(count):
+            day = (seed * 7 + number * 3) % 360
+            date = '2020/' + str(1 + day // 30).zfill(2) + '/' + str(1 + day % 28).zfill(2)
+            arrive, complete = 2 + (number * 7 + seed) % 9, 10 + (number * 13 + seed) % 40
+
+            rows.append(dict(zip(tool.INCIDENT_COLUMNS, [
+                date, date.replace('/', '-') + ' 10:' + str(number % 60).zfill(2), ['Day', 'Night'][number % 2],
+                '09:00', '09:' + str(arrive).zfill(2), '09:' + str(arrive + complete), ['Alarm', 'Fire Drill', 'Lockout', 'Alarm'][number % 4],
+                ['No', 'Yes'][number % 5 == 0], 'No', ['No', 'Yes'][number % 7 == 0], 'Front Desk', '555-01' + str(number % 100).zfill(2),
+                'Incident ' + str(seed) + '-' + str(number), str(arrive) + ' minutes', str(arrive + complete) + ' minutes',
+                str(complete) + ' minutes', str(arrive), str(arrive + complete), str(complete)])))
+
+        return rows
+
+    return make
+
+
+@pytest.fixture
+def synthetic_rows():
+    '''The benchmarks' synthetic incidents: random times through the day, with durations worked out as the entry window would.'''
+
+    return incident_benchmarks.synthetic_incident_rows
+
+
+@pytest.fixture
+def folder(tool, tmp_path, monkeypatch):
+    '''A scratch folder for the shared files, with the monthly files in it, and nothing cached from another test.'''
+
+    monkeypatch.setattr(tool, 'PATH_MONTHLY', str(tmp_path / 'Monthly') + os.sep)
+    tool.MONTHLY_CACHE.clear()
+    tool.MASTER_CACHE.clear()
+
+    return tmp_path
+
+
+def pytest_configure(config):
+
+    config.addinivalue_line('markers', 'slow: runs several processes at once (deselect with -m "not slow")')
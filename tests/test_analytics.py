@@ -0,0 +1,33 @@
+import pandas as pd
+
+
+def test_report_summarizes_response_times_by_group(tool, incident_rows):
+
+    rows = pd.DataFrame(incident_rows(40), columns=tool.INCIDENT_COLUMNS)
+    rows.loc[0, 'Time Taken to Arrive (mins.)'] = ''
+
+    report = tool.response_time_report(rows)
+
+    assert list(report) == ['Overall', 'By Service Call Type', 'By Shift', 'By Month']
+
+    overall = report['Overall'].iloc[0]
+    arrive = pd.to_numeric(rows['Time Taken to Arrive (mins.)'], errors='coerce')
+    assert overall['Incidents'] == 40
+    # Rows without a time are left out of its percentiles
+    assert overall['Time Taken to Arrive p50 (mins.)'] == round(arrive.quantile(0.5), 1)
+    assert overall['Police Involved'] == (rows['Police Involved'] == 'Yes').sum()
+
+    by_type = report['By Service Call Type'].set_index('Service Call Type')
+    assert by_type['Incidents'].to_dict() == rows['Service Call Type'].value_counts().to_dict()
+    assert report['By Month']['Incidents'].sum() == 40
+
+
+def test_report_is_written_to_one_workbook(tool, tmp_path, incident_rows):
+
+    report = tool.response_time_report(pd.DataFrame(incident_rows(10), columns=tool.INCIDENT_COLUMNS))
+    tool.write_report(report, str(tmp_path / 'Report.xlsx'))
+
+    sheets = pd.read_excel(str(tmp_path / 'Report.xlsx'), sheet_name=None)
+
+    assert list(sheets) == list(report)
+    assert list(sheets['By Shift']['Shift']) == ['Day', 'Night']
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+import incident_benchmarks
+
+
+def test_synthetic_incidents_are_spread_over_the_years(synthetic_rows):
+
+    rows = synthetic_rows(500, years=3)
+
+    assert min(row['Date'] for row in rows) >= '2018/01/01'
+    assert max(row['Date'] for row in rows) <= '2020/12/31'
+    assert synthetic_rows(20, seed=4) == synthetic_rows(20, seed=4)
+
+
+def test_benchmark_suite_times_every_stage_and_cleans_up(tool, folder):
+
+    path_results = str(folder / 'Benchmark Results.json')
+    path_monthly = tool.PATH_MONTHLY
+
+    report = incident_benchmarks.benchmark_suite([50], [3], str(folder), repeats=1, path_results=path_results)
+
+    stages = [result['stage'] for result in report['results']]
+    assert stages == ['append_row_to_df', 'save_files', 'get_dataframe', 'get_master_dataframe (from disk)',
+                      'get_master_dataframe (cached)', 'save_drafts_file', 'draft list']
+
+    with open(path_results, 'r', encoding='utf-8') as file:
+        assert json.load(file)['results'] == report['results']
+
+    # The scratch folder is gone and the tool's settings are as they were
+    assert sorted(path.name for path in folder.iterdir()) == ['Benchmark Results.json']
+    assert tool.PATH_MONTHLY == path_monthly
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('backend', ['csv', 'sqlite', 'partitioned'])
+def test_concurrent_writers_lose_and_duplicate_nothing(tool, folder, backend):
+
+    # Each workstation runs in a process of its own, against the same shared files
+    assert incident_benchmarks.simulate_concurrent_writers(3, 4, str(folder / 'Shared'), backend)
@@ -0,0 +1,70 @@
+import pandas as pd
+
+
+def test_cache_reads_a_file_again_only_once_it_changes(tool, tmp_path):
+
+    path = str(tmp_path / 'Incident Reports.xlsx')
+    pd.DataFrame({'Notes': ['first']}).to_excel(path, index=False)
+
+    cache = tool.DataFrameCache(2)
+    reads = []
+
+    def loader(path):
+        reads.append(path)
+        return pd.read_excel(path)
+
+    assert list(cache.get(path, loader)['Notes']) == ['first']
+    assert list(cache.get(path, loader)['Notes']) == ['first']
+    assert len(reads) == 1
+
+    # Another workstation saved the file
+    pd.DataFrame({'Notes': ['first', 'second']}).to_excel(path, index=False)
+
+    assert list(cache.get(path, loader)['Notes']) == ['first', 'second']
+    assert len(reads) == 2
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'cached': 1}
+
+
+def test_cache_drops_the_least_recently_used_file(tool, tmp_path):
+
+    cache = tool.DataFrameCache(2)
+    paths = []
+
+    for month in ('01', '02', '03'):
+        paths.append(str(tmp_path / (month + '.xlsx')))
+        pd.DataFrame({'Notes': [month]}).to_excel(paths[-1], index=False)
+
+    cache.get(paths[0], pd.read_excel)
+    cache.get(paths[1], pd.read_excel)
+    cache.get(paths[0], pd.read_excel)
+    cache.get(paths[2], pd.read_excel)
+
+    assert list(cache.entries) == [paths[0], paths[2]]
+
+
+def test_master_store_keeps_its_own_appends_cached(tool, folder, incident_rows):
+
+    pd.DataFrame(columns=tool.INCIDENT_COLUMNS).to_excel(str(folder / 'Master.xlsx'), index=False)
+    store = tool.MasterStore(str(folder / 'Master - Store.csv'), str(folder / 'Master.xlsx'))
+    assert store.ensure_initialized()
+
+    store.read_dataframe()
+    misses = tool.MASTER_CACHE.stats()['misses']
+
+    store.append_rows(incident_rows(3))
+
+    assert len(store.read_dataframe()) == 3
+    assert tool.MASTER_CACHE.stats()['misses'] == misses
+
+
+def test_cache_clear_reads_every_file_again(tool, tmp_path):
+
+    path = str(tmp_path / 'Incident Reports.xlsx')
+    pd.DataFrame({'Notes': ['first']}).to_excel(path, index=False)
+
+    cache = tool.DataFrameCache(2)
+    cache.get(path, pd.read_excel)
+    cache.clear()
+    cache.get(path, pd.read_excel)
+
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'cached': 1}
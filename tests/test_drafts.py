@@ -0,0 +1,71 @@
+import pandas as pd
+
+
+def test_drafts_from_the_old_workbook_are_moved_into_the_folder(tool, tmp_path):
+
+    old_drafts = pd.DataFrame([{'Date': '2020/01/0' + str(number), 'Notes': 'Draft ' + str(number)} for number in range(1, 4)],
+                              columns=tool.DRAFT_COLUMNS)
+    old_drafts.to_excel(str(tmp_path / 'Drafts.xlsx'), index=False)
+
+    store = tool.DraftStore(str(tmp_path / 'Drafts - Drafts'), str(tmp_path / 'Drafts.xlsx'))
+    draft_id = store.save({'Date': '2020/02/01', 'Notes': 'New draft'})
+
+    assert [draft['Notes'] for draft_id, draft in store.list_drafts()] == ['Draft 1', 'Draft 2', 'Draft 3', 'New draft']
+
+    store.delete(draft_id)
+    store.delete(draft_id)
+
+    assert len(store.draft_ids()) == 3
+
+
+def test_saving_beyond_the_cap_deletes_the_oldest_drafts(tool, tmp_path, monkeypatch):
+
+    monkeypatch.setattr(tool, 'MAX_DRAFTS', 3)
+    store = tool.DraftStore(str(tmp_path / 'Drafts - Drafts'))
+
+    for number in range(5):
+        store.save({'Notes': str(number)})
+
+    assert [draft['Notes'] for draft_id, draft in store.list_drafts()] == ['2', '3', '4']
+
+
+def test_drafts_are_exported_to_one_workbook(tool, tmp_path):
+
+    store = tool.DraftStore(str(tmp_path / 'Drafts - Drafts'))
+
+    for number in range(3):
+        store.save({'Date': '2020/01/0' + str(number + 1), 'Notes': 'Draft ' + str(number)})
+
+    store.export_workbook(str(tmp_path / 'Drafts.xlsx'))
+
+    exported = pd.read_excel(str(tmp_path / 'Drafts.xlsx'), dtype=str)
+    assert list(exported.columns) == tool.DRAFT_COLUMNS
+    assert list(exported['Notes']) == ['Draft 0', 'Draft 1', 'Draft 2']
+
+
+def test_numbers_read_back_as_floats_are_cleaned_up_when_drafts_are_moved(tool, tmp_path):
+
+    pd.DataFrame([{'Call Received Time': 930.0, 'Contact Information': 5550123.0, 'Service Call Type': 'Facility Maintenance',
+                   'Notes': 'Back at 10.0'}], columns=tool.DRAFT_COLUMNS).to_excel(str(tmp_path / 'Drafts.xlsx'), index=False)
+
+    draft = tool.DraftStore(str(tmp_path / 'Drafts - Drafts'), str(tmp_path / 'Drafts.xlsx')).list_drafts()[0][1]
+
+    assert (draft['Call Received Time'], draft['Contact Information']) == ('930', '5550123')
+    # Text is kept as it was typed
+    assert (draft['Service Call Type'], draft['Notes'], draft['Arrival Time']) == ('Facility Maintenance', 'Back at 10.0', '')
+
+
+def test_autosave_keeps_the_newest_snapshot_until_cleared(tool, tmp_path):
+
+    autosave = tool.AutosaveFile(str(tmp_path / 'Autosave.json'))
+
+    for number in range(20):
+        autosave.save(('{"Notes": "' + str(number) + '"}').encode('utf-8'))
+    autosave.stop()
+
+    assert autosave.load() == {'Notes': '19'}
+
+    autosave.clear()
+    autosave.stop()
+
+    assert autosave.load() is None
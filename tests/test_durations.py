@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+
+def test_parse_time_entry_reads_the_usual_forms(tool):
+
+    assert tool.parse_time_entry('0930') == 570
+    assert tool.parse_time_entry('09:30') == 570
+    assert tool.parse_time_entry('9:30') == 570
+    assert tool.parse_time_entry(' 23:59 ') == 1439
+    assert tool.parse_time_entry('0000') == 0
+
+
+def test_parse_time_entry_rejects_invalid_times(tool):
+
+    for entered_time in ('', '930', '2400', '1260', 'abcd', '12345', '9:3'):
+        assert tool.parse_time_entry(entered_time) is None
+
+
+def test_parse_time_entry_caches_a_bounded_number_of_unusual_entries(tool):
+
+    tool.parse_unusual_time_entry.cache_clear()
+
+    for number in range(tool.UNUSUAL_TIME_ENTRIES_CACHED + 100):
+        tool.parse_time_entry('x' + str(number).zfill(4))
+
+    assert tool.parse_unusual_time_entry.cache_info().currsize == tool.UNUSUAL_TIME_ENTRIES_CACHED
+
+
+def test_compute_duration_columns(tool):
+
+    columns = tool.compute_duration_columns(['09:00', '23:50', '10:00', 'xx'], ['09:05', '00:10', '10:01', '10:00'],
+                                            ['10:30', '01:00', '09:59', '10:30'], np.array([False, False, True, False]))
+
+    assert list(columns['Time Taken to Arrive (mins.)']) == ['5', '20', '1', '']
+    # Past midnight wraps around; over 24 hours adds a day to the two durations that end at completion
+    assert list(columns['Time Taken From Call to Completion (mins.)']) == ['90', '70', str(1439 + 1440), '']
+    assert list(columns['Time Taken From Arrival to Completion (mins.)']) == ['85', '50', str(1438 + 1440), '30']
+    assert list(columns['Time Taken to Arrive']) == ['5 minutes', '20 minutes', '1 minute', '']
+    assert columns['Time Taken From Call to Completion'][0] == '1 hour, 30 minutes'
+
+
+def test_compute_duration_columns_matches_format_duration(tool, synthetic_rows):
+
+    rows = pd.DataFrame(synthetic_rows(200), columns=tool.INCIDENT_COLUMNS)
+    columns = tool.compute_duration_columns(rows['Call Received Time'], rows['Arrival Time'], rows['Completion Time'],
+                                            np.zeros(len(rows), dtype=bool))
+
+    for column in tool.DURATION_COLUMNS:
+        assert list(columns[column]) == list(rows[column])
+
+
+def test_repair_duration_columns_fixes_wrong_durations(tool, synthetic_rows):
+
+    rows = pd.DataFrame(synthetic_rows(50), columns=tool.INCIDENT_COLUMNS)
+    broken = rows.copy()
+    broken.loc[:9, 'Time Taken to Arrive'] = 'wrong'
+    broken.loc[5:14, 'Time Taken From Arrival to Completion (mins.)'] = '-1'
+
+    repaired, changed = tool.repair_duration_columns(broken)
+
+    assert changed == 15
+    assert repaired[tool.DURATION_COLUMNS].equals(rows[tool.DURATION_COLUMNS])
+
+
+def test_repair_duration_columns_keeps_durations_whose_times_cant_be_read(tool, synthetic_rows):
+
+    rows = pd.DataFrame(synthetic_rows(3), columns=tool.INCIDENT_COLUMNS)
+    rows.loc[0, 'Completion Time'] = ''
+    rows.loc[0, 'Time Taken to Arrive'] = 'wrong'
+    rows.loc[1, 'Call Received Time'] = 'xx'
+
+    repaired, changed = tool.repair_duration_columns(rows)
+
+    assert changed == 1
+    # The time to arrive only needs the call received and arrival times, so it's still repaired
+    assert repaired.loc[0, 'Time Taken to Arrive'] == tool.format_duration(int(rows.loc[0, 'Time Taken to Arrive (mins.)']))
+
+    # Each duration that needs an unreadable time is left as it was
+    for row, columns in ((0, tool.DURATION_COLUMNS[1:3] + tool.DURATION_COLUMNS[4:]),
+                         (1, tool.DURATION_COLUMNS[:2] + tool.DURATION_COLUMNS[3:5])):
+        for column in columns:
+            assert repaired.loc[row, column] == rows.loc[row, column]
+
+
+def test_repair_duration_columns_accepts_typed_rows(tool, synthetic_rows):
+
+    rows = pd.DataFrame(synthetic_rows(20), columns=tool.INCIDENT_COLUMNS)
+
+    repaired, changed = tool.repair_duration_columns(tool.typed_incident_dataframe(rows))
+
+    assert changed == 0
+    assert repaired.equals(rows)
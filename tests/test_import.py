@@ -0,0 +1,53 @@
+def old_log_record(**values):
+
+    record = {'Date': '03/14', 'Call Received Time': '0930', 'Arrival Time': '09:41:00', 'Completion Time': '1015',
+              'Service Call Type': 'Alarm', 'Physical Intervention': 'y', 'Restraint Used': '', 'Police Involved': 'No',
+              'Requested By': 'Front Desk', 'Contact Information': '', 'Notes': 'Imported'}
+    record.update(values)
+
+    return record
+
+
+def test_parse_import_date_reads_the_usual_forms(tool):
+
+    assert tool.parse_import_date('03/14', '2019') == '2019/03/14'
+    assert tool.parse_import_date('2018/03/14', '2019') == '2018/03/14'
+    assert tool.parse_import_date('2018-03-14 00:00:00', '2019') == '2018/03/14'
+    assert tool.parse_import_date('14/03', '2019') is None
+
+
+def test_check_import_rows_accepts_rows_as_a_submit_would(tool):
+
+    accepted, rejects = tool.check_import_rows('Old Log.csv', 2, [old_log_record()], '2019', '2020-01-01 08:00')
+
+    assert rejects == []
+    assert len(accepted) == 1
+
+    row = accepted[0]
+    assert (row['Date'], row['Arrival Time'], row['Physical Intervention'], row['Restraint Used']) == ('2019/03/14', '09:41', 'Yes', 'No')
+    assert row['Time Entered'] == '2020-01-01 08:00'
+    assert (row['Time Taken to Arrive'], row['Time Taken From Call to Completion (mins.)']) == ('11 minutes', '45')
+
+
+def test_check_import_rows_rejects_rows_that_fail_a_check(tool):
+
+    records = [old_log_record(), old_log_record(**{'Date': '13/45', 'Completion Time': '2515'}),
+               old_log_record(**{'Service Call Type': 'Not a type'})]
+
+    accepted, rejects = tool.check_import_rows('Old Log.csv', 2, records, '2019', '2020-01-01 08:00')
+
+    assert len(accepted) == 1
+    assert [(reject['Line'], reject['Problems']) for reject in rejects] == [(3, 'Date, Completion Time'), (4, 'Service Call Type')]
+
+
+def test_check_import_rows_saves_time_entered_as_the_entry_window_does(tool):
+
+    records = [old_log_record(**{'Time Entered': '2018-03-14 10:05:33'}), old_log_record(**{'Time Entered': '2018/03/14 10:05'}),
+               old_log_record(**{'Time Entered': '03/14/2018 10:05'}), old_log_record(**{'Time Entered': ''}),
+               old_log_record(**{'Time Entered': 'the next morning'})]
+
+    accepted, rejects = tool.check_import_rows('Old Log.csv', 2, records, '2019', '2020-01-01 08:00')
+
+    assert [row['Time Entered'] for row in accepted] == ['2018-03-14 10:05', '2018-03-14 10:05', '2018-03-14 10:05',
+                                                         '2020-01-01 08:00']
+    assert [(reject['Line'], reject['Problems']) for reject in rejects] == [(6, 'Time Entered')]
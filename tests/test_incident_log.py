@@ -0,0 +1,76 @@
+import os
+
+
+def test_log_is_compressed_into_segments_and_keeps_the_newest_rows(tool, tmp_path, incident_rows):
+
+    log = tool.IncidentLog(str(tmp_path / 'Logs' / 'Incident Log - DESK1'), segment_records=4, keep_records=10)
+    rows = incident_rows(25)
+
+    for row in rows:
+        log.append(row)
+
+    # 6 full segments and 1 row in the current file; 3 segments are enough to keep 10 rows
+    assert sorted(os.listdir(str(tmp_path / 'Logs'))) == ['Incident Log - DESK1.000004.jsonl.gz', 'Incident Log - DESK1.000005.jsonl.gz',
+                                                         'Incident Log - DESK1.000006.jsonl.gz', 'Incident Log - DESK1.jsonl']
+
+    records = tool.IncidentLog.read_folder(str(tmp_path / 'Logs'))
+
+    assert [row['Notes'] for submitted, row in records] == [row['Notes'] for row in rows[12:]]
+
+
+def test_log_carries_on_from_the_last_segment_after_a_restart(tool, tmp_path, incident_rows):
+
+    path_prefix = str(tmp_path / 'Incident Log - DESK1')
+
+    for row in incident_rows(6):
+        tool.IncidentLog(path_prefix, segment_records=4, keep_records=100).append(row)
+
+    log = tool.IncidentLog(path_prefix, segment_records=4, keep_records=100)
+    for row in incident_rows(2, seed=1):
+        log.append(row)
+
+    assert log.last_segment == 2
+    assert len(tool.IncidentLog.read_folder(str(tmp_path))) == 8
+
+
+def test_receipt_lists_every_field(tool, incident_rows):
+
+    row = incident_rows(1)[0]
+    receipt = tool.format_receipt(row, '2020-01-01 09:30:00')
+
+    assert '2020-01-01 09:30:00' in receipt
+    assert all(row[column] in receipt for column in ('Date', 'Service Call Type', 'Requested By', 'Notes'))
+
+
+def test_receipt_is_read_back_into_the_row(tool, incident_rows):
+
+    row = incident_rows(1)[0]
+    row['Notes'] = 'First line\nSecond line'
+
+    submitted, parsed = tool.parse_receipt(tool.format_receipt(row, '2020-01-01 09:30:00'))
+
+    assert submitted == '2020-01-01 09:30:00'
+    assert all(parsed[column] == row[column] for column in tool.RECEIPT_COLUMNS + ['Notes'])
+    assert tool.parse_receipt('Not a receipt') is None
+
+
+def test_text_files_are_moved_into_a_new_log(tool, tmp_path, incident_rows):
+
+    rows = incident_rows(3)
+
+    # As the tool used to write them, one per incident
+    for number, row in enumerate(rows):
+        submitted = '2020-01-0' + str(number + 1) + ' 09:30:00'
+        with open(str(tmp_path / (submitted.replace(':', '-') + ' Incident Report Entry.txt')), 'w') as file:
+            file.write(tool.format_receipt(row, submitted))
+    (tmp_path / 'Notes to self.txt').write_text('Not a receipt')
+
+    log = tool.IncidentLog(str(tmp_path / 'Incident Log - DESK1'))
+    log.append(incident_rows(1, seed=1)[0])
+
+    assert sorted(os.listdir(str(tmp_path))) == ['Incident Log - DESK1.jsonl', 'Notes to self.txt']
+
+    records = tool.IncidentLog.read_folder(str(tmp_path))
+    assert [submitted for submitted, row in records[:3]] == ['2020-01-01 09:30:00', '2020-01-02 09:30:00', '2020-01-03 09:30:00']
+    assert [row['Notes'] for submitted, row in records] == [row['Notes'] for row in rows] + ['Incident 1-0']
+    assert log.current_records == 4
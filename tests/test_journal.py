@@ -0,0 +1,290 @@
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def workstation(tool, folder):
+    '''A journal and compactor for one workstation, compacting into a CSV master store seeded from an empty master file.'''
+
+    pd.DataFrame(columns=tool.INCIDENT_COLUMNS).to_excel(str(folder / 'Master.xlsx'), index=False)
+
+    journal = tool.IncidentJournal(str(folder / 'Incident Journal.jsonl'), str(folder / 'Incident Journal Checkpoint.json'))
+    master_store = tool.MasterStore(str(folder / 'Master - Store.csv'), str(folder / 'Master.xlsx'))
+    compactor = tool.JournalCompactor(journal, master_store, tool.LeaseLock(str(folder / 'Master.lock')))
+
+    return journal, master_store, compactor
+
+
+def two_month_rows(incident_rows, count):
+
+    rows = incident_rows(count)
+
+    for row_number, row in enumerate(rows):
+        row['Date'] = '2020/0' + str(1 + row_number % 2) + '/15'
+        row['Notes'] = 'row ' + str(row_number)
+
+    return rows
+
+
+def stored_notes(tool, dataframe):
+
+    return sorted(tool.untyped_incident_dataframe(dataframe)['Notes'])
+
+
+def test_journal_skips_a_partly_written_last_line(tool, folder):
+
+    journal = tool.IncidentJournal(str(folder / 'Incident Journal.jsonl'), str(folder / 'Incident Journal Checkpoint.json'))
+
+    assert journal.append({'Notes': 'first'}) == 1
+    assert journal.append({'Notes': 'second'}) == 2
+
+    # The computer lost power while the next entry was being written
+    with open(journal.path_journal, 'a', encoding='utf-8') as file:
+        file.write('{"seq": 3, "row": {"No')
+
+    assert [entry['row']['Notes'] for entry in journal.read_entries()] == ['first', 'second']
+
+    # A fresh journal (after a restart) carries on from the last entry, on a line of its own
+    journal = tool.IncidentJournal(journal.path_journal, journal.path_checkpoint)
+
+    assert journal.append({'Notes': 'third'}) == 3
+    assert [entry['seq'] for entry in journal.read_entries()] == [1, 2, 3]
+
+
+def test_journal_discard_keeps_later_entries(tool, folder):
+
+    journal = tool.IncidentJournal(str(folder / 'Incident Journal.jsonl'), str(folder / 'Incident Journal Checkpoint.json'))
+
+    for number in range(5):
+        journal.append({'Notes': str(number)})
+
+    journal.discard_through(3)
+
+    assert [entry['seq'] for entry in journal.read_entries()] == [4, 5]
+    assert journal.read_checkpoint()['last_seq'] == 3
+    # Sequence numbers are never reused, even once the journal is empty
+    journal.discard_through(5)
+    assert tool.IncidentJournal(journal.path_journal, journal.path_checkpoint).append({'Notes': '5'}) == 6
+
+
+def test_compact_applies_every_entry_once(tool, folder, incident_rows, workstation):
+
+    journal, master_store, compactor = workstation
+    rows = two_month_rows(incident_rows, 10)
+
+    for row in rows:
+        journal.append(row)
+
+    assert compactor.compact(export_master=True) == 10
+    assert journal.read_entries() == []
+    assert compactor.compact() == 0
+
+    assert stored_notes(tool, master_store.read_dataframe()) == sorted(row['Notes'] for row in rows)
+    assert not master_store.workbook_is_stale()
+
+    january = tool.load_incident_dataframe(tool.monthly_file_path_for_date('2020/01/15'))
+    assert stored_notes(tool, january) == sorted(row['Notes'] for row in rows[::2])
+
+    # The stored rows are the ones submitted, not just the same notes
+    stored = tool.untyped_incident_dataframe(master_store.read_dataframe())
+    stored = stored.sort_values('Notes', key=lambda notes: notes.str[4:].astype(int)).reset_index(drop=True)
+    assert stored.equals(pd.DataFrame(rows, columns=tool.INCIDENT_COLUMNS))
+
+
+def test_compact_after_a_crash_does_not_add_rows_twice(tool, folder, incident_rows, workstation):
+
+    journal, master_store, compactor = workstation
+    rows = two_month_rows(incident_rows, 6)
+
+    for row in rows:
+        journal.append(row)
+
+    # The tool stopped after adding the rows to the master store, before the monthly files were written
+    assert master_store.ensure_initialized()
+    master_store.append_rows(rows)
+    checkpoint = journal.read_checkpoint()
+    checkpoint['master'] = 6
+    journal.write_checkpoint(checkpoint)
+
+    assert tool.JournalCompactor(journal, master_store, compactor.shared_lock).compact() == 6
+
+    assert stored_notes(tool, master_store.read_dataframe()) == sorted(row['Notes'] for row in rows)
+
+    for date in ('2020/01/15', '2020/02/15'):
+        monthly = tool.load_incident_dataframe(tool.monthly_file_path_for_date(date))
+        assert stored_notes(tool, monthly) == sorted(row['Notes'] for row in rows if row['Date'] == date)
+
+
+def test_compact_adds_rows_to_the_search_index_and_rollups(tool, folder, incident_rows, workstation):
+
+    journal, master_store, compactor = workstation
+    compactor.search_index = tool.IncidentSearchIndex(str(folder / 'Master - Search.sqlite3'))
+    compactor.rollups = tool.IncidentRollups(str(folder / 'Master - Rollups.sqlite3'))
+    rows = two_month_rows(incident_rows, 8)
+    rows[5]['Notes'] += ' sprinkler leak'
+
+    for row in rows[:4]:
+        journal.append(row)
+    compactor.compact()
+
+    # The index is built from the master the first time it's used, then rows are added to it as they're compacted
+    assert compactor.search_index.ensure_built(master_store, compactor.shared_lock)
+
+    for row in rows[4:]:
+        journal.append(row)
+    compactor.compact()
+
+    total, found = compactor.search_index.search(limit=len(rows))
+    assert total == len(rows)
+    assert sorted(row['Notes'] for row in found) == sorted(row['Notes'] for row in rows)
+    assert [row['Notes'] for row in compactor.search_index.search('sprinkler')[1]] == ['row 5 sprinkler leak']
+
+    # The running totals added up as rows were compacted are the same as adding them up again from the master
+    groups, differed = compactor.rollups.rebuild(master_store.read_dataframe())
+    assert groups > 0
+    assert differed == 0
+
+
+def test_compact_puts_off_exporting_the_master_file(tool, folder, incident_rows, workstation):
+
+    journal, master_store, compactor = workstation
+    rows = two_month_rows(incident_rows, 4)
+
+    journal.append(rows[0])
+    compactor.compact()
+
+    # The store and the monthly file have the row, but the master file is only exported once it's due
+    assert master_store.workbook_is_stale()
+    assert 0 < compactor.export_due_in() <= tool.MASTER_EXPORT_SECONDS
+
+    compactor.last_export -= tool.MASTER_EXPORT_SECONDS
+    journal.append(rows[1])
+    compactor.compact()
+
+    assert not master_store.workbook_is_stale()
+    assert compactor.export_due_in() is None
+    assert pd.read_excel(master_store.path_workbook, dtype=str).shape[0] == 2
+
+
+def test_writer_saves_in_the_background_and_exports_before_stopping(tool, folder, incident_rows, workstation):
+
+    journal, master_store, compactor = workstation
+    logged = []
+    writer = tool.SubmissionWriter(compactor, lambda row, timer: logged.append(row))
+    writer.start()
+
+    for row in two_month_rows(incident_rows, 5):
+        journal.append(row)
+        writer.submit(row)
+
+    writer.stop()
+
+    outcomes = []
+    while not writer.results.empty():
+        outcomes.append(writer.results.get())
+
+    assert all(outcome[0] == 'committed' for outcome in outcomes)
+    assert sum(outcome[1] for outcome in outcomes) == 5
+    assert len(logged) == 5
+    assert journal.read_entries() == []
+    assert not master_store.workbook_is_stale()
+
+
+def stop_after(monkeypatch, target, name):
+    '''Make target.name do its work and then fail, as if the tool stopped before it could save its checkpoint.'''
+
+    method = getattr(target, name)
+
+    def stopped(*args, **kwargs):
+        method(*args, **kwargs)
+        raise KeyboardInterrupt(name)
+
+    monkeypatch.setattr(target, name, stopped)
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite', 'partitioned'])
+def test_stopping_after_adding_to_the_master_store_does_not_add_rows_twice(tool, folder, incident_rows, monkeypatch, backend):
+
+    pd.DataFrame(columns=tool.INCIDENT_COLUMNS).to_excel(str(folder / 'Master.xlsx'), index=False)
+
+    if backend == 'sqlite':
+        master_store = tool.SQLiteIncidentStore(str(folder / 'Master.sqlite3'), str(folder / 'Master.xlsx'))
+    elif backend == 'partitioned':
+        master_store = tool.PartitionedIncidentStore(tool.PATH_MONTHLY + 'Manifest.json', str(folder / 'Master.xlsx'))
+    else:
+        master_store = tool.MasterStore(str(folder / 'Master - Store.csv'), str(folder / 'Master.xlsx'))
+
+    journal = tool.IncidentJournal(str(folder / 'Incident Journal.jsonl'), str(folder / 'Incident Journal Checkpoint.json'))
+    shared_lock = tool.LeaseLock(str(folder / 'Master.lock'))
+    rows = two_month_rows(incident_rows, 6)
+
+    for row in rows[:2]:
+        journal.append(row)
+    tool.JournalCompactor(journal, master_store, shared_lock).compact()
+
+    for row in rows[2:]:
+        journal.append(row)
+
+    with monkeypatch.context() as patch:
+        stop_after(patch, master_store, 'append_rows')
+        with pytest.raises(KeyboardInterrupt):
+            tool.JournalCompactor(journal, master_store, shared_lock).compact()
+
+    assert tool.JournalCompactor(journal, master_store, shared_lock).compact() == 4
+    assert journal.read_entries() == []
+
+    assert stored_notes(tool, master_store.read_dataframe()) == sorted(row['Notes'] for row in rows)
+
+    for date in ('2020/01/15', '2020/02/15'):
+        monthly = tool.load_incident_dataframe(tool.monthly_file_path_for_date(date))
+        assert stored_notes(tool, monthly) == sorted(row['Notes'] for row in rows if row['Date'] == date)
+
+
+def test_stopping_after_writing_a_monthly_file_does_not_add_rows_twice(tool, folder, incident_rows, monkeypatch, workstation):
+
+    journal, master_store, compactor = workstation
+    rows = two_month_rows(incident_rows, 6)
+
+    for row in rows:
+        journal.append(row)
+
+    # The tool stopped after writing January, before recording it
+    with monkeypatch.context() as patch:
+        stop_after(patch, tool, 'write_file_atomically')
+        with pytest.raises(KeyboardInterrupt):
+            compactor.compact()
+
+    assert tool.JournalCompactor(journal, master_store, compactor.shared_lock).compact() == 6
+
+    for date in ('2020/01/15', '2020/02/15'):
+        monthly = tool.load_incident_dataframe(tool.monthly_file_path_for_date(date))
+        assert stored_notes(tool, monthly) == sorted(row['Notes'] for row in rows if row['Date'] == date)
+
+
+def test_stopping_after_adding_to_the_rollups_and_index_does_not_add_rows_twice(tool, folder, incident_rows, monkeypatch,
+                                                                                   workstation):
+
+    journal, master_store, compactor = workstation
+    search_index = tool.IncidentSearchIndex(str(folder / 'Master - Search.sqlite3'))
+    rollups = tool.IncidentRollups(str(folder / 'Master - Rollups.sqlite3'))
+    rows = two_month_rows(incident_rows, 6)
+
+    journal.append(rows[0])
+    compactor.compact()
+    assert search_index.ensure_built(master_store, compactor.shared_lock)
+
+    for row in rows[1:]:
+        journal.append(row)
+
+    for target, name in ((search_index, 'add_rows'), (rollups, 'add_rows')):
+        with monkeypatch.context() as patch:
+            stop_after(patch, target, name)
+            with pytest.raises(KeyboardInterrupt):
+                tool.JournalCompactor(journal, master_store, compactor.shared_lock, rollups, search_index).compact()
+
+    assert tool.JournalCompactor(journal, master_store, compactor.shared_lock, rollups, search_index).compact() == 5
+
+    assert search_index.search(limit=len(rows))[0] == len(rows)
+    # The first row was compacted before the rollups were kept, so they're added up again from the master to compare
+    groups, differed = rollups.rebuild(master_store.read_dataframe().iloc[1:])
+    assert differed == 0
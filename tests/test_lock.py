@@ -0,0 +1,45 @@
+import os
+import time
+
+import pytest
+
+
+def test_lock_is_held_by_one_workstation_at_a_time(tool, tmp_path):
+
+    first = tool.LeaseLock(str(tmp_path / 'Master.lock'))
+    second = tool.LeaseLock(str(tmp_path / 'Master.lock'), attempts=2)
+
+    with first:
+        with pytest.raises(tool.WriteConflictError):
+            second.acquire()
+
+    assert second.waits == 2
+
+    with second:
+        assert second.read_token(second.path) == second.token
+
+    assert not os.path.exists(second.path)
+
+
+def test_lock_left_by_a_crashed_workstation_expires(tool, tmp_path):
+
+    crashed = tool.LeaseLock(str(tmp_path / 'Master.lock'))
+    assert crashed.try_acquire()
+
+    expired = time.time() - tool.LOCK_LEASE_SECONDS - 1
+    os.utime(crashed.path, (expired, expired))
+
+    with tool.LeaseLock(crashed.path, attempts=2) as lock:
+        assert lock.read_token(lock.path) == lock.token != crashed.token
+
+
+def test_lock_held_longer_than_its_lease_is_renewed(tool, tmp_path):
+
+    holder = tool.LeaseLock(str(tmp_path / 'Master.lock'), lease_seconds=0.3)
+    waiting = tool.LeaseLock(holder.path, lease_seconds=0.3, attempts=1)
+
+    with holder:
+        time.sleep(0.6)
+        waiting.break_if_expired()
+
+        assert holder.read_token(holder.path) == holder.token
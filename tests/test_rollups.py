@@ -0,0 +1,88 @@
+import threading
+
+import pandas as pd
+
+
+def test_add_rows_counts_each_group(tool, tmp_path, synthetic_rows):
+
+    rollups = tool.IncidentRollups(str(tmp_path / 'Master - Rollups.sqlite3'))
+    rows = synthetic_rows(3)
+
+    for row in rows:
+        row.update({'Date': '2020/05/01', 'Shift': 'Day', 'Service Call Type': 'Alarm', 'Police Involved': 'No'})
+    rows[0]['Police Involved'] = 'Yes'
+    rows[2]['Time Taken to Arrive (mins.)'] = ''
+
+    rollups.add_rows(rows[:2])
+    rollups.add_rows(rows[2:])
+
+    totals = rollups.read_totals()
+    group = ('2020/05/01', 'Day', 'Alarm')
+    minutes = [int(row['Time Taken to Arrive (mins.)']) for row in rows[:2]]
+
+    assert totals[group + ('Incidents',)][0] == 3
+    assert totals[group + ('Police Involved',)][0] == 1
+    # The row without a time isn't counted in the times
+    assert totals[group + ('Time Taken to Arrive (mins.)',)][:3] == [2, sum(minutes), sum(minute ** 2 for minute in minutes)]
+    assert sum(totals[group + ('Time Taken to Arrive (mins.)',)][3].values()) == 2
+
+
+def test_running_totals_match_a_rebuild(tool, tmp_path, synthetic_rows):
+
+    rollups = tool.IncidentRollups(str(tmp_path / 'Master - Rollups.sqlite3'))
+    rows = synthetic_rows(500)
+
+    for start in range(0, len(rows), 37):
+        rollups.add_rows(rows[start:start + 37])
+
+    groups, differed = rollups.rebuild(pd.DataFrame(rows, columns=tool.INCIDENT_COLUMNS))
+
+    assert groups == len(rollups.read_totals())
+    assert differed == 0
+
+
+def test_summary_adds_up_every_incident(tool, tmp_path, synthetic_rows):
+
+    rollups = tool.IncidentRollups(str(tmp_path / 'Master - Rollups.sqlite3'))
+    rows = pd.DataFrame(synthetic_rows(400), columns=tool.INCIDENT_COLUMNS)
+    rollups.add_rows(rows.to_dict('records'))
+
+    by_shift = rollups.summary('shift').set_index('Shift')
+    assert by_shift['Incidents'].to_dict() == rows['Shift'].value_counts().to_dict()
+
+    by_type = rollups.summary('service call type').set_index('Service Call Type')
+    assert by_type['Incidents'].to_dict() == rows['Service Call Type'].value_counts().to_dict()
+    assert by_type['Police Involved'].sum() == (rows['Police Involved'] == 'Yes').sum()
+
+    minutes = pd.to_numeric(rows['Time Taken to Arrive (mins.)'])
+    by_month = rollups.summary('month')
+    assert by_month['Incidents'].sum() == len(rows)
+
+    assert abs((by_shift['Time Taken to Arrive mean (mins.)'] * by_shift['Incidents']).sum() / len(rows) - minutes.mean()) < 0.5
+
+    # Only the days in the range are read
+    first_month = rows[rows['Date'] < '2020/02/01']
+    assert rollups.summary('day', '2020/01/01', '2020/01/31')['Incidents'].sum() == len(first_month)
+
+
+def test_add_rows_from_several_workstations_at_once(tool, tmp_path, synthetic_rows):
+
+    rollups = tool.IncidentRollups(str(tmp_path / 'Master - Rollups.sqlite3'))
+    rows = synthetic_rows(40)
+
+    for row in rows:
+        row.update({'Date': '2020/05/01', 'Shift': 'Day', 'Service Call Type': 'Alarm'})
+
+    def add_one_at_a_time():
+        for row in rows:
+            tool.IncidentRollups(rollups.path).add_rows([row])
+
+    threads = [threading.Thread(target=add_one_at_a_time) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = rollups.read_totals()
+    assert totals[('2020/05/01', 'Day', 'Alarm', 'Incidents')][0] == 4 * len(rows)
+    assert sum(totals[('2020/05/01', 'Day', 'Alarm', 'Time Taken to Arrive (mins.)')][3].values()) == 4 * len(rows)
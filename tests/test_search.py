@@ -0,0 +1,17 @@
+def test_service_call_types_starting_with_the_query_come_first(tool):
+
+    index = tool.ServiceCallTypeIndex(['Fire Alarm', 'Alarm Response', 'Door Alarm Check', 'Lockout', 'False Alarm'])
+
+    assert index.search('alarm') == ['Alarm Response', 'Fire Alarm', 'Door Alarm Check', 'False Alarm']
+    assert index.search('al ch') == ['Door Alarm Check']
+    # Only found inside a word
+    assert index.search('ock') == ['Lockout']
+    assert index.search('') == index.service_call_types
+
+
+def test_service_call_types_used_most_come_first_within_a_group(tool):
+
+    index = tool.ServiceCallTypeIndex(['Fire Alarm', 'Door Alarm Check', 'False Alarm'], {'False Alarm': 3})
+    index.record_use('Door Alarm Check')
+
+    assert index.search('alarm') == ['False Alarm', 'Door Alarm Check', 'Fire Alarm']
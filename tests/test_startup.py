@@ -0,0 +1,18 @@
+import subprocess
+import sys
+
+
+def test_loading_the_tool_does_not_import_the_heavy_modules(tool):
+
+    # In a fresh interpreter, since the other tests have imported them already
+    script = ('import importlib.util, sys\n'
+              'spec = importlib.util.spec_from_file_location("incident_reporting_tool", sys.argv[1])\n'
+              'tool = importlib.util.module_from_spec(spec)\n'
+              'spec.loader.exec_module(tool)\n'
+              'print(sorted(name for name in ("pandas", "numpy", "openpyxl") if name in sys.modules))\n'
+              'tool.import_heavy_modules()\n'
+              'print(sorted(name for name in ("pandas", "numpy", "openpyxl") if name in sys.modules))\n')
+
+    output = subprocess.run([sys.executable, '-c', script, tool.__file__], capture_output=True, text=True, check=True).stdout
+
+    assert output.splitlines() == ['[]', "['numpy', 'openpyxl', 'pandas']"]
@@ -0,0 +1,208 @@
+import pandas as pd
+import pytest
+
+
+BACKENDS = ['csv', 'sqlite', 'partitioned']
+
+
+def make_store(tool, folder, backend):
+    '''The master store for a backend, with its files in folder, as simulate_writer in incident_benchmarks makes it.'''
+
+    if backend == 'sqlite':
+        return tool.SQLiteIncidentStore(str(folder / 'Master.sqlite3'), str(folder / 'Master.xlsx'))
+
+    if backend == 'partitioned':
+        return tool.PartitionedIncidentStore(tool.PATH_MONTHLY + 'Manifest.json', str(folder / 'Master.xlsx'))
+
+    return tool.MasterStore(str(folder / 'Master - Store.csv'), str(folder / 'Master.xlsx'))
+
+
+def as_text(tool, dataframe):
+    '''Rows as the text the Excel files hold, in the order they were entered, to compare with the rows submitted.'''
+
+    return tool.untyped_incident_dataframe(dataframe).astype(str).reset_index(drop=True)
+
+
+@pytest.fixture
+def seeded(tool, folder, incident_rows):
+    '''A master workbook with a year of incidents to seed the store from, and the rows it holds. They're in date order, as the
+       partitioned store reads them back month by month.'''
+
+    rows = pd.DataFrame(incident_rows(120), columns=tool.INCIDENT_COLUMNS)
+    rows = rows.sort_values('Date', kind='stable', ignore_index=True)
+    rows.to_excel(str(folder / 'Master.xlsx'), index=False)
+
+    return rows
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_store_seeds_from_the_master_file_and_appends(tool, folder, seeded, incident_rows, backend):
+
+    store = make_store(tool, folder, backend)
+
+    assert store.ensure_initialized()
+    assert as_text(tool, store.read_dataframe()).equals(seeded)
+
+    added = incident_rows(5, seed=1)
+    for row in added:
+        row['Date'] = '2020/12/31'
+    store.append_rows(added)
+
+    expected = pd.concat([seeded, pd.DataFrame(added, columns=tool.INCIDENT_COLUMNS)], ignore_index=True)
+    assert as_text(tool, make_store(tool, folder, backend).read_dataframe()).equals(expected)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_store_without_a_master_file(tool, folder, backend):
+
+    assert not make_store(tool, folder, backend).ensure_initialized()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_store_exports_the_master_file(tool, folder, seeded, incident_rows, backend):
+
+    store = make_store(tool, folder, backend)
+    assert store.ensure_initialized()
+    store.append_rows(incident_rows(1, seed=2))
+    # The partitioned store's master file is only exported on request
+    assert store.workbook_is_stale() == (backend != 'partitioned')
+
+    store.export_workbook()
+
+    exported = pd.read_excel(str(folder / 'Master.xlsx'), dtype=str).fillna('')
+
+    assert exported.reindex(columns=tool.INCIDENT_COLUMNS).equals(as_text(tool, store.read_dataframe()))
+    assert not store.workbook_is_stale()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_store_reads_a_date_range(tool, folder, seeded, backend):
+
+    store = make_store(tool, folder, backend)
+    assert store.ensure_initialized()
+
+    in_range = seeded[(seeded['Date'] >= '2020/03/10') & (seeded['Date'] <= '2020/06/20')]
+
+    assert as_text(tool, store.read_range('2020/03/10', '2020/06/20')).equals(in_range.reset_index(drop=True))
+    assert store.service_call_type_counts() == seeded['Service Call Type'].value_counts().to_dict()
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_store_rewrite_replaces_every_row(tool, folder, seeded, backend):
+
+    store = make_store(tool, folder, backend)
+    assert store.ensure_initialized()
+
+    repaired = seeded.copy()
+    repaired['Notes'] = 'repaired'
+    store.rewrite(repaired)
+
+    assert as_text(tool, store.read_dataframe()).equals(repaired)
+    assert as_text(tool, make_store(tool, folder, backend).read_dataframe()).equals(repaired)
+
+
+@pytest.mark.parametrize('backend', ['csv', 'partitioned'])
+def test_cached_rows_are_typed(tool, folder, seeded, incident_rows, backend):
+
+    store = make_store(tool, folder, backend)
+    assert store.ensure_initialized()
+    store.read_dataframe()
+    store.append_rows(incident_rows(3, seed=2))
+
+    # The rows added to the cache are typed along with the rows read from the file
+    cached = store.read_dataframe()
+    typed = tool.typed_incident_dataframe(tool.untyped_incident_dataframe(cached))
+
+    assert len(cached) == len(seeded) + 3
+    assert cached.dtypes.equals(typed.dtypes)
+    assert cached['Date'].dtype.kind == 'M'
+    assert cached['Time Taken to Arrive (mins.)'].dtype == 'Int32'
+
+
+def test_partitions_are_checked_against_the_manifest(tool, folder, seeded):
+
+    store = make_store(tool, folder, 'partitioned')
+    assert store.ensure_initialized()
+    assert store.verify() == []
+
+    path = tool.monthly_file_path('2020', tool.MONTHS['3'])
+    tool.save_incident_workbook(seeded.iloc[:1], path)
+
+    assert store.verify() == ['2020/03']
+
+
+def test_database_commits_are_journaled_and_synced(tool, folder, seeded):
+
+    store = make_store(tool, folder, 'sqlite')
+    assert store.ensure_initialized()
+
+    # WAL mode isn't safe on the shared drive
+    assert store.connect().execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    assert store.connect().execute('PRAGMA synchronous').fetchone()[0] == 2
+
+
+def messy_rows(tool, incident_rows):
+    '''Rows as they turn up in old files: dates and times entered other ways, flags in other cases, minutes with decimals.'''
+
+    rows = incident_rows(6, seed=3)
+    messy = [('Time Entered', ['2020-01-01 10:05:33', 'yesterday', '', '2020-01-01 10:05', '1/1/2020 10:05', ' ']),
+             ('Physical Intervention', ['yes', 'Y', ' No', '', 'Yes', 'N/A']),
+             ('Time Taken to Arrive (mins.)', ['12.5', '12.0', '-', ' 7', '99999999999', '']),
+             ('Time Taken From Call to Completion (mins.)', ['', '3', '1e3', '4', '5', '6'])]
+
+    for column, values in messy:
+        for row, value in zip(rows, values):
+            row[column] = value
+
+    return rows
+
+
+def test_typing_keeps_values_that_dont_parse(tool, incident_rows):
+
+    rows = pd.DataFrame(messy_rows(tool, incident_rows), columns=tool.INCIDENT_COLUMNS)
+    rows.loc[0, 'Date'] = '3/4/2020'
+    rows.loc[1, 'Date'] = '2020/1/5'
+
+    typed = tool.typed_incident_dataframe(rows)
+
+    assert tool.untyped_incident_dataframe(typed).equals(rows)
+    # Columns every value of which can be read are still typed
+    assert typed['Police Involved'].dtype == 'boolean'
+    assert typed['Time Taken From Arrival to Completion (mins.)'].dtype == 'Int32'
+
+    # Added to rows whose columns could all be typed, nothing is lost either
+    clean = tool.typed_incident_dataframe(pd.DataFrame(incident_rows(4), columns=tool.INCIDENT_COLUMNS))
+    combined = tool.concat_typed_incident_dataframes([clean, typed])
+    expected = pd.concat([tool.untyped_incident_dataframe(clean), rows], ignore_index=True)
+
+    assert tool.untyped_incident_dataframe(combined).equals(expected)
+
+    # The statistics want the values that can be read, and blanks for the rest
+    coerced = tool.typed_incident_dataframe(rows, coerce=True)
+    assert coerced['Date'].dtype.kind == 'M'
+    assert list(coerced['Time Taken to Arrive (mins.)'].isna()) == [False, False, True, False, True, True]
+
+
+# The database holds the minute columns as integers, so it isn't checked here
+@pytest.mark.parametrize('backend', ['csv', 'partitioned'])
+def test_store_saves_values_that_dont_parse_as_they_were(tool, folder, seeded, incident_rows, backend):
+
+    store = make_store(tool, folder, backend)
+    assert store.ensure_initialized()
+    store.read_dataframe()
+
+    added = messy_rows(tool, incident_rows)
+    for row in added:
+        row['Date'] = '2020/12/31'
+    store.append_rows(added)
+    store.export_workbook()
+
+    expected = pd.concat([seeded, pd.DataFrame(added, columns=tool.INCIDENT_COLUMNS)], ignore_index=True)
+    exported = pd.read_excel(str(folder / 'Master.xlsx'), dtype=str, keep_default_na=False)
+
+    assert as_text(tool, store.read_dataframe()).equals(expected)
+    assert exported.reindex(columns=tool.INCIDENT_COLUMNS).equals(expected)
+
+    tool.MONTHLY_CACHE.clear()
+    tool.MASTER_CACHE.clear()
+    assert as_text(tool, make_store(tool, folder, backend).read_dataframe()).equals(expected)
@@ -0,0 +1,65 @@
+def test_timings_file_is_trimmed_to_the_newest_records(tool, tmp_path):
+
+    timings = tool.SubmitTimings(str(tmp_path / 'Timings' / 'Submit Timings.jsonl'), keep_records=3)
+
+    for number in range(5):
+        timings.append('submit', {'validation': number, 'journal write': 1})
+
+    assert len(timings.read()) == 5
+
+    # Trimmed back to the newest 3 once there are twice as many
+    timings.append('submit', {'validation': 5, 'journal write': 1})
+
+    assert [record['stages']['validation'] for record in timings.read()] == [3, 4, 5]
+
+
+def test_timing_percentiles_per_stage(tool, tmp_path):
+
+    timings = tool.SubmitTimings(str(tmp_path / 'Submit Timings.jsonl'))
+
+    for milliseconds in range(1, 21):
+        timings.append('save', {'master store': milliseconds, 'monthly file': 2 * milliseconds})
+    timings.append('submit', {'validation': 1.5})
+
+    summary = {row['Stage']: row for row in timings.summary()}
+
+    # In the order the stages run
+    assert [row['Stage'] for row in timings.summary()] == ['validation', 'master store', 'monthly file']
+    assert (summary['master store']['Count'], summary['master store']['p50 (ms)'], summary['master store']['p95 (ms)'],
+            summary['master store']['Max (ms)']) == (20, 10, 19, 20)
+    assert summary['validation']['p95 (ms)'] == 1.5
+    # Only the last records of each kind
+    assert {row['Stage']: row['Count'] for row in timings.summary(last=5)} == {'validation': 1, 'master store': 5,
+                                                                              'monthly file': 5}
+
+
+def test_writer_records_how_long_each_stage_of_a_submit_and_save_took(tool, folder, incident_rows):
+
+    pd = tool.pd
+    pd.DataFrame(columns=tool.INCIDENT_COLUMNS).to_excel(str(folder / 'Master.xlsx'), index=False)
+
+    journal = tool.IncidentJournal(str(folder / 'Incident Journal.jsonl'), str(folder / 'Incident Journal Checkpoint.json'))
+    master_store = tool.MasterStore(str(folder / 'Master - Store.csv'), str(folder / 'Master.xlsx'))
+    compactor = tool.JournalCompactor(journal, master_store, tool.LeaseLock(str(folder / 'Master.lock')))
+    timings = tool.SubmitTimings(str(folder / 'Submit Timings.jsonl'))
+
+    writer = tool.SubmissionWriter(compactor, timings=timings)
+    writer.start()
+
+    for row in incident_rows(3):
+        journal.append(row)
+        writer.submit(row, {'validation': 1.5, 'journal write': 2})
+
+    writer.stop()
+
+    # The window's stages of each Submit are recorded by the writer, off the window's thread
+    submits = [record for record in timings.read() if record['kind'] == 'submit']
+    assert [record['stages'] for record in submits] == [{'validation': 1.5, 'journal write': 2}] * 3
+
+    saves = [record for record in timings.read() if record['kind'] != 'submit']
+    assert saves and all(record['kind'] == 'save' and record['outcome'] == 'saved' for record in saves)
+    assert sum(record['rows'] for record in saves) == 3
+    assert {'journal read', 'master store', 'monthly file', 'journal cleanup'} <= set().union(
+        *(record['stages'] for record in saves))
+    # The master file is exported before the writer stops
+    assert 'master file' in saves[-1]['stages']
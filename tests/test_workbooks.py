@@ -0,0 +1,101 @@
+import os
+
+import openpyxl
+import pandas as pd
+import pytest
+
+
+def test_saved_workbook_holds_the_rows(tool, tmp_path, incident_rows):
+
+    rows = pd.DataFrame(incident_rows(30), columns=tool.INCIDENT_COLUMNS)
+    path = str(tmp_path / 'Incident Reports.xlsx')
+
+    tool.save_incident_workbook(rows, path)
+
+    assert pd.read_excel(path, dtype=str).fillna('').equals(rows)
+
+
+def test_saved_workbook_is_formatted_like_the_old_one(tool, tmp_path, incident_rows):
+
+    path = str(tmp_path / 'Incident Reports.xlsx')
+    tool.save_incident_workbook(pd.DataFrame(incident_rows(3), columns=tool.INCIDENT_COLUMNS), path)
+
+    worksheet = openpyxl.load_workbook(path).worksheets[0]
+
+    for column_letter, width in tool.INCIDENT_COLUMN_WIDTHS.items():
+        assert worksheet.column_dimensions[column_letter].width == width
+
+    for row in worksheet.iter_rows():
+        for cell in row:
+            assert cell.alignment.horizontal == 'center'
+            assert cell.alignment.vertical == 'center'
+            assert cell.alignment.wrap_text
+
+
+def test_master_copy_is_made_from_the_same_bytes(tool, tmp_path, incident_rows):
+
+    rows = pd.DataFrame(incident_rows(20), columns=tool.INCIDENT_COLUMNS)
+    rows.to_excel(str(tmp_path / 'Master.xlsx'), index=False)
+
+    replicator = tool.MasterReplicator(str(tmp_path / 'Master - Copy.xlsx'))
+    store = tool.MasterStore(str(tmp_path / 'Master - Store.csv'), str(tmp_path / 'Master.xlsx'), replicator)
+    assert store.ensure_initialized()
+
+    store.export_workbook()
+    replicator.wait()
+
+    assert not replicator.is_stale()
+    assert (tmp_path / 'Master - Copy.xlsx').read_bytes() == (tmp_path / 'Master.xlsx').read_bytes()
+
+    # Exporting the same content again leaves the copy alone
+    assert not replicator.copy((tmp_path / 'Master.xlsx').read_bytes(), replicator.read_recorded_checksum()['content'])
+
+
+def test_accumulated_rows_are_saved_without_building_a_dataframe(tool, tmp_path, incident_rows):
+
+    rows = incident_rows(12)
+    accumulator = tool.RowAccumulator(tool.INCIDENT_COLUMNS, pd.DataFrame(rows[:5], columns=tool.INCIDENT_COLUMNS))
+    accumulator.extend(rows[5:])
+
+    assert len(accumulator) == 12
+    assert accumulator.buffered == 7
+
+    path = str(tmp_path / 'Incident Reports.xlsx')
+    tool.save_incident_workbook(accumulator, path)
+
+    assert pd.read_excel(path, dtype=str).fillna('').equals(pd.DataFrame(rows, columns=tool.INCIDENT_COLUMNS))
+    assert accumulator.to_frame().equals(pd.DataFrame(rows, columns=tool.INCIDENT_COLUMNS))
+    assert accumulator.buffered == 0
+
+
+def test_master_is_loaded_typed_from_the_master_file(tool, tmp_path, incident_rows):
+
+    rows = pd.DataFrame(incident_rows(10), columns=tool.INCIDENT_COLUMNS)
+    tool.save_incident_workbook(rows, str(tmp_path / 'Master.xlsx'))
+
+    # There's no mirror, so the master file is read
+    master_df = tool.load_master(str(tmp_path / 'Master.xlsx'), str(tmp_path / 'Master.parquet'))
+
+    assert master_df['Date'].dtype.kind == 'M'
+    assert tool.untyped_incident_dataframe(master_df).equals(rows)
+
+
+def test_master_is_loaded_from_the_mirror_unless_the_master_file_is_newer(tool, tmp_path, incident_rows):
+
+    pytest.importorskip('pyarrow')
+
+    rows = pd.DataFrame(incident_rows(10), columns=tool.INCIDENT_COLUMNS)
+    path_workbook, path_mirror = str(tmp_path / 'Master.xlsx'), str(tmp_path / 'Master.parquet')
+    tool.save_incident_workbook(rows, path_workbook)
+
+    # Told apart from the master file by a note only the mirror has
+    mirrored = rows.copy()
+    mirrored.loc[0, 'Notes'] = 'from the mirror'
+    assert tool.write_master_mirror(mirrored, path_mirror)
+
+    master_df = tool.load_master(path_workbook, path_mirror)
+    assert master_df['Date'].dtype.kind == 'M'
+    assert tool.untyped_incident_dataframe(master_df).equals(mirrored)
+
+    os.utime(path_workbook, (os.path.getmtime(path_mirror) + 10,) * 2)
+    assert tool.untyped_incident_dataframe(tool.load_master(path_workbook, path_mirror)).equals(rows)